@@ -18,11 +18,12 @@ import logging
 
 from lavaclient import _version
 from lavaclient.client import Lava
+from lavaclient.pool import LavaPool
 from lavaclient.log import NullHandler
 from lavaclient.error import (
     LavaError, InvalidError, AuthenticationError, AuthorizationError,
     RequestError, ApiError, FailedError, TimeoutError, NotFoundError,
-    ProxyError)
+    ProxyError, QuotaError, CircuitOpenError)
 
 
 __version_info__ = _version.__version_info__
@@ -33,6 +34,7 @@ LOG = logging.getLogger(__name__)
 LOG.addHandler(NullHandler())
 
 
-__all__ = ['Lava', 'LavaError', 'InvalidError', 'AuthenticationError',
-           'AuthorizationError', 'RequestError', 'ApiError', 'FailedError',
-           'TimeoutError', 'NotFoundError', 'ProxyError']
+__all__ = ['Lava', 'LavaPool', 'LavaError', 'InvalidError',
+           'AuthenticationError', 'AuthorizationError', 'RequestError',
+           'ApiError', 'FailedError', 'TimeoutError', 'NotFoundError',
+           'ProxyError', 'QuotaError', 'CircuitOpenError']
@@ -14,7 +14,6 @@
 Create, destroy, and otherwise interact with Rackspace CloudBigData clusters
 """
 
-import itertools
 import argparse
 import re
 import six
@@ -29,10 +28,13 @@ from figgis import Config, ListField, Field, PropertyError, ValidationError
 
 from lavaclient.api import resource
 from lavaclient.api.response import Cluster, ClusterDetail, Node, ReprMixin
-from lavaclient import error
+from lavaclient import deadlines, error, quota
+from lavaclient.concurrency import background, map_bounded
+from lavaclient.inventory import ClusterInventory, ClusterTopology
 from lavaclient.validators import Length, Range, List
 from lavaclient.util import (CommandLine, argument, command, display_table,
-                             coroutine, create_socks_proxy, expand, confirm)
+                             display, coroutine, create_socks_proxy, expand,
+                             confirm, read_spec, print_table, field_list)
 from lavaclient.log import NullHandler
 
 
@@ -43,6 +45,9 @@ LOG.addHandler(NullHandler())
 WAIT_INTERVAL = 30
 MIN_INTERVAL = 10
 
+# Maximum number of concurrent requests made by bulk operations
+DEFAULT_PARALLELISM = 10
+
 IN_PROGRESS_STATES = frozenset([
     'BUILDING', 'BUILD', 'CONFIGURING', 'CONFIGURED', 'UPDATING', 'REBOOTING',
     'RESIZING', 'WAITING'])
@@ -62,6 +67,82 @@ def natural_number(value):
     return intval
 
 
+def positive_integer(value):
+    """Argparse type to force a positive integer value"""
+    intval = int(value)
+    if intval < 1:
+        raise argparse.ArgumentTypeError('Must be a positive integer')
+
+    return intval
+
+
+class BatchResult(object):
+
+    """
+    Outcome of a bulk operation, e.g. :meth:`Resource.create_many`. Failures
+    do not stop the rest of the batch.
+
+    :ivar succeeded: List of `(item, result)` pairs
+    :ivar failed: List of `(item, exception)` pairs
+    """
+
+    def __init__(self, succeeded=None, failed=None):
+        self.succeeded = succeeded or []
+        self.failed = failed or []
+
+    def __repr__(self):
+        return 'BatchResult(succeeded={0}, failed={1})'.format(
+            len(self.succeeded), len(self.failed))
+
+    @property
+    def ok(self):
+        """`True` if every item succeeded"""
+        return not self.failed
+
+    def _record_item(self, item):
+        return item
+
+    def records(self):
+        """
+        Iterate over one `dict` per item, with keys `item`, `outcome`
+        (`'succeeded'` or `'failed'`), `result`, and `error` (the exception
+        message), e.g. for machine-readable output
+        """
+        for item, result in self.succeeded:
+            yield {'item': self._record_item(item), 'outcome': 'succeeded',
+                   'result': result, 'error': None}
+
+        for item, exc in self.failed:
+            yield {'item': self._record_item(item), 'outcome': 'failed',
+                   'result': None, 'error': six.text_type(exc)}
+
+
+def _batch_label(item):
+    if isinstance(item, dict):
+        return item.get('name') or item.get('cluster_id')
+
+    return item
+
+
+def display_batch(result):
+    """Print the successes and failures of a :class:`BatchResult`"""
+    if result.succeeded:
+        print_table(
+            [[_batch_label(item),
+              '' if cluster is None else cluster.id,
+              '' if cluster is None else cluster.status]
+             for item, cluster in result.succeeded],
+            ['Item', 'ID', 'Status'],
+            title='Succeeded')
+
+    if result.failed:
+        print_table(
+            [[_batch_label(item), six.text_type(exc)]
+             for item, exc in result.failed],
+            ['Item', 'Error'],
+            title='Failed')
+
+
 ######################################################################
 # API Responses
 ######################################################################
@@ -191,6 +272,19 @@ def elapsed_minutes(start):
     return (datetime.now() - start).total_seconds() / 60
 
 
+def timeout_date(start, timeout):
+    """Time at which a wait that began at `start` must end, given a timeout
+    in minutes (or `None`) and the current deadline, if any"""
+    delta = timedelta(minutes=timeout) if timeout else timedelta(days=365)
+    end = start + delta
+
+    left = deadlines.remaining()
+    if left is not None:
+        end = min(end, datetime.now() + timedelta(seconds=left))
+
+    return end
+
+
 def parse_connector(value):
     """Parse command-line connector string, e.g. `cloud_files=my_files`"""
     match = re.match(r'([A-Za-z]\w*)=([A-Za-z]\w*)$', value)
@@ -210,36 +304,175 @@ class Resource(resource.Resource):
         parser_options=dict(
             description='List all existing clusters',
         ),
+        fields=argument(
+            type=field_list,
+            help='Comma-separated list of fields to display, e.g. id,status'),
     )
     @display_table(Cluster)
-    def list(self):
+    def list(self, fields=None):
         """
         List clusters that belong to the tenant specified in the client
 
+        :param fields: If given, only parse these fields of each cluster; see
+                       :func:`~lavaclient.util.project`
         :returns: List of :class:`~lavaclient.api.response.Cluster` objects
         """
-        return self._parse_response(
+        clusters = self._parse_response(
             self._client._get('clusters'),
             ClustersResponse,
-            wrapper='clusters')
+            wrapper='clusters',
+            fields=fields)
+        if not fields:
+            self._client.catalog.update_clusters(clusters)
+
+        return clusters
+
+    def iter(self, page_size=None, fields=None):
+        """
+        Iterate over clusters that belong to the tenant specified in the
+        client. Unlike :meth:`list`, the response is parsed as it is
+        received, so that memory use does not grow with the number of
+        clusters.
+
+        :param page_size: If given, request clusters this many at a time,
+                          fetching the next page while the current one is
+                          being consumed
+        :param fields: If given, only parse these fields of each cluster; see
+                       :func:`~lavaclient.util.project`
+        :returns: Iterator of :class:`~lavaclient.api.response.Cluster`
+                  objects
+        """
+        if page_size is not None:
+            # Pagination requires the ID of each cluster
+            fields = fields and list(fields) + ['id']
+            return self._paginate(
+                'clusters',
+                lambda data: self._parse_response(data, ClustersResponse,
+                                                  wrapper='clusters',
+                                                  fields=fields),
+                page_size)
+
+        return self._iter_response(
+            self._client._get('clusters', stream=True),
+            ClustersResponse,
+            wrapper='clusters',
+            fields=fields)
+
+    def inventory(self):
+        """
+        Build an indexed inventory of the tenant's clusters, which can be
+        queried without scanning every cluster and refreshed in place. See
+        :mod:`lavaclient.inventory`.
+
+        :returns: :class:`~lavaclient.inventory.ClusterInventory`
+        """
+        return ClusterInventory(self.list(), loader=self.list)
 
     @command(
         parser_options=dict(
             description='Display an existing cluster in detail',
         ),
+        fields=argument(
+            type=field_list,
+            help='Comma-separated list of fields to display, e.g. '
+                 'id,status,node_groups'),
     )
     @display_table(ClusterDetail)
-    def get(self, cluster_id):
+    def get(self, cluster_id, fields=None):
         """
         Get the cluster corresponding to the cluster ID
 
         :param cluster_id: Cluster ID
+        :param fields: If given, only parse these fields of the cluster; see
+                       :func:`~lavaclient.util.project`
         :returns: :class:`~lavaclient.api.response.ClusterDetail`
         """
-        return self._parse_response(
+        cluster = self._parse_response(
             self._client._get('clusters/' + six.text_type(cluster_id)),
             ClusterResponse,
-            wrapper='cluster')
+            wrapper='cluster',
+            fields=fields)
+        if not fields:
+            self._client.catalog.update_clusters([cluster])
+
+        return cluster
+
+    def _check_stack_constraints(self, stack_id, node_groups, partial):
+        """
+        Validate node groups against the resource limits of the stack. Only
+        stacks and flavors in the client's catalog are used, so that no
+        requests are made; if the stack is not cached, nothing is checked.
+
+        :param partial: If `False`, node groups not given are created with the
+                        stack's default count
+        """
+        catalog = self._client.catalog
+        stack = catalog.cached_stack(stack_id) if stack_id else None
+        if stack is None:
+            return
+
+        flavors = catalog.cached_flavors()
+        requested = dict((group['id'], group) for group in node_groups or [])
+        stack_groups = dict((group.id, group) for group in stack.node_groups)
+
+        invalid = sorted(set(requested) - set(stack_groups))
+        if invalid:
+            raise error.InvalidError(
+                'Invalid node groups for stack {0}: {1}; valid node groups '
+                'are {2}'.format(stack_id, ', '.join(invalid),
+                                 ', '.join(sorted(stack_groups))))
+
+        for group_id, group in six.iteritems(stack_groups):
+            spec = requested.get(group_id)
+            if spec is None and partial:
+                continue
+
+            spec = spec or {}
+            limits = group.resource_limits
+
+            count = int(spec.get('count', group.count))
+            if not limits.min_count <= count <= limits.max_count:
+                raise error.InvalidError(
+                    'Node group {0} count must be between {1} and {2}, but '
+                    'is {3}'.format(group_id, limits.min_count,
+                                    limits.max_count, count))
+
+            flavor_id = spec.get('flavor_id')
+            if flavor_id is None or flavors is None:
+                continue
+
+            flavor = flavors.get(flavor_id)
+            if flavor is None:
+                raise error.InvalidError(
+                    'Invalid flavor for node group {0}: {1}'.format(
+                        group_id, flavor_id))
+            elif flavor.ram < limits.min_ram:
+                raise error.InvalidError(
+                    'Node group {0} requires a flavor with at least {1} MB of '
+                    'RAM, but {2} has {3} MB'.format(
+                        group_id, limits.min_ram, flavor_id, flavor.ram))
+
+    def _marshal_request(self, data, request_class, wrapper=None,
+                         stack_id=None):
+        """
+        Same as :meth:`~lavaclient.api.resource.Resource._marshal_request`,
+        but additionally validate the node groups of create and resize
+        requests against the stack; see :meth:`_check_stack_constraints`. The
+        stack ID of a resize request must be given separately.
+        """
+        marshaled = super(Resource, self)._marshal_request(
+            data, request_class, wrapper=wrapper)
+
+        if request_class is ClusterCreateRequest:
+            self._check_stack_constraints(data['stack_id'],
+                                          data.get('node_groups'),
+                                          partial=False)
+        elif request_class is ClusterUpdateRequest:
+            self._check_stack_constraints(stack_id,
+                                          data['cluster'].get('node_groups'),
+                                          partial=True)
+
+        return marshaled
 
     def _gather_node_groups(self, node_groups):
         """Transform node_groups into a list of dicts"""
@@ -255,7 +488,7 @@ class Resource(resource.Resource):
 
     def create(self, name, stack_id, username=None, ssh_keys=None,
                user_scripts=None, node_groups=None, connectors=None,
-               wait=False):
+               wait=False, check_quota=None):
         """
         Create a cluster
 
@@ -276,6 +509,11 @@ class Resource(resource.Resource):
                            must be a dictionary of `(type, name)` pairs
         :param wait: If `True`, wait for the cluster to become active before
                      returning
+        :param check_quota: If `'error'`, raise
+                            :class:`~lavaclient.error.QuotaError` without
+                            sending the request if the cluster would exceed
+                            the tenant's remaining quota; if `'warn'`, only
+                            warn. See :mod:`lavaclient.quota`.
         :returns: :class:`~lavaclient.api.response.ClusterDetail`
         """
         if ssh_keys is None:
@@ -306,6 +544,11 @@ class Resource(resource.Resource):
         request_data = self._marshal_request(
             data, ClusterCreateRequest, wrapper='cluster')
 
+        if check_quota:
+            checker = quota.QuotaChecker(self._client)
+            self._check_quota(checker, checker.create_usage(
+                stack_id, data.get('node_groups')), check_quota)
+
         cluster = self._parse_response(
             self._client._post('clusters', json=request_data),
             ClusterResponse,
@@ -331,9 +574,14 @@ class Resource(resource.Resource):
             action='store_true',
             help='Wait for the cluster to become active'
         ),
+        check_quota=argument(
+            choices=sorted(quota.MODES),
+            help="Check the tenant's remaining quota before sending the "
+                 "request, and either warn or fail if it would be exceeded"),
     )
     @display_table(ClusterDetail)
-    def resize(self, cluster_id, node_groups=None, wait=False):
+    def resize(self, cluster_id, node_groups=None, wait=False,
+               check_quota=None):
         """
         Resize a cluster
 
@@ -343,6 +591,11 @@ class Resource(resource.Resource):
                             Instead of a `dict`, you may give a `list` of
                             `dicts`, each containing the `id` key. Currently
                             supported attributes are `flavor_id` and `count`
+        :param check_quota: If `'error'`, raise
+                            :class:`~lavaclient.error.QuotaError` without
+                            sending the request if the resized cluster would
+                            exceed the tenant's remaining quota; if `'warn'`,
+                            only warn. See :mod:`lavaclient.quota`.
         :returns: :class:`~lavaclient.api.response.ClusterDetail`
         """
         if not node_groups:
@@ -361,7 +614,14 @@ class Resource(resource.Resource):
             )
         )
 
-        request_data = self._marshal_request(data, ClusterUpdateRequest)
+        request_data = self._marshal_request(
+            data, ClusterUpdateRequest,
+            stack_id=self._client.catalog.cluster_stack(cluster_id))
+
+        if check_quota:
+            checker = quota.QuotaChecker(self._client)
+            self._check_quota(checker, checker.resize_usage(
+                cluster_id, gathered), check_quota)
 
         cluster = self._parse_response(
             self._client._put('clusters/{0}'.format(cluster_id),
@@ -369,6 +629,10 @@ class Resource(resource.Resource):
             ClusterResponse,
             wrapper='cluster')
 
+        # Only once the resize has been accepted, so that a concurrent lookup
+        # can not cache the old nodes again
+        self._client.catalog.invalidate_topology(cluster_id)
+
         if wait:
             return self.wait(cluster.id)
 
@@ -433,11 +697,15 @@ class Resource(resource.Resource):
             action='store_true',
             help='Wait for the cluster to become active'
         ),
+        check_quota=argument(
+            choices=sorted(quota.MODES),
+            help="Check the tenant's remaining quota before sending the "
+                 "request, and either warn or fail if it would be exceeded"),
     )
     @display_table(ClusterDetail)
     def _create(self, name, stack_id, username=None, ssh_keys=None,
                 user_scripts=None, node_groups=None, connectors=None,
-                wait=False):
+                wait=False, check_quota=None):
         """
         CLI-only; cluster create command
         """
@@ -446,7 +714,8 @@ class Resource(resource.Resource):
 
         try:
             return self.create(name, stack_id, username, ssh_keys,
-                               user_scripts, node_groups, connectors, wait)
+                               user_scripts, node_groups, connectors, wait,
+                               check_quota=check_quota)
         except error.RequestError as exc:
             if self._args.headless or not (
                     ssh_keys == [DEFAULT_SSH_KEY] and (
@@ -460,7 +729,8 @@ class Resource(resource.Resource):
         self._create_default_ssh_credential()
 
         return self.create(name, stack_id, username, ssh_keys,
-                           user_scripts, node_groups, connectors, wait)
+                           user_scripts, node_groups, connectors, wait,
+                           check_quota=check_quota)
 
     @command(
         parser_options=dict(
@@ -475,6 +745,270 @@ class Resource(resource.Resource):
         :returns: :class:`~lavaclient.api.response.ClusterDetail`
         """
         self._client._delete('clusters/' + six.text_type(cluster_id))
+        self._client.catalog.remove_cluster(cluster_id)
+
+    def _check_quota(self, checker, usage, mode):
+        """Check usage against the remaining quota, printing any warnings in
+        the CLI"""
+        for message in checker.check(usage, mode=mode):
+            if self._command_line:
+                six.print_('Warning: quota exceeded: {0}'.format(message),
+                           file=sys.stderr)
+
+    ######################################################################
+    # Bulk operations
+    ######################################################################
+
+    def _run_batch(self, func, items, parallelism=None):
+        """Call func(item) for each item concurrently, collecting the results
+        into a :class:`BatchResult`"""
+        if parallelism is None:
+            parallelism = DEFAULT_PARALLELISM
+
+        items = list(items)
+        result = BatchResult()
+        for item, future in zip(items,
+                                map_bounded(func, items, parallelism)):
+            try:
+                result.succeeded.append((item, future.result()))
+            except Exception as exc:
+                LOG.error('Bulk operation failed for %s', _batch_label(item),
+                          exc_info=exc)
+                result.failed.append((item, exc))
+
+        return result
+
+    def _wait_batch(self, result, timeout=None, interval=None):
+        """Wait for the clusters in a successful batch to become active,
+        moving any that fail or time out into the failures"""
+        waited = self.wait_many(
+            [cluster.id for _, cluster in result.succeeded],
+            timeout=timeout, interval=interval)
+
+        outcomes = dict(waited.succeeded)
+        outcomes.update(waited.failed)
+
+        final = BatchResult(failed=list(result.failed))
+        for item, cluster in result.succeeded:
+            outcome = outcomes[cluster.id]
+            if isinstance(outcome, Exception):
+                final.failed.append((item, outcome))
+            else:
+                final.succeeded.append((item, outcome))
+
+        return final
+
+    def _check_specs(self, specs, required, optional=()):
+        """Validate the keys of bulk operation specs before sending any
+        requests"""
+        allowed = frozenset(required).union(optional)
+        for spec in specs:
+            if not isinstance(spec, dict):
+                raise error.InvalidError(
+                    'Invalid spec: {0!r}; must be a dictionary'.format(spec))
+
+            missing = [key for key in required if key not in spec]
+            unknown = sorted(set(spec) - allowed)
+            if missing or unknown:
+                raise error.InvalidError(
+                    'Invalid spec: {0!r}; missing keys: {1}; unknown keys: '
+                    '{2}'.format(spec, ', '.join(missing) or 'none',
+                                 ', '.join(unknown) or 'none'))
+
+    def _check_resize_groups(self, spec):
+        """Validate the node groups of a resize spec, each of which requires
+        an id and an integer count"""
+        def valid(group):
+            try:
+                int(group['count'])
+                return 'id' in group
+            except (KeyError, TypeError, ValueError):
+                return False
+
+        groups = self._gather_node_groups(spec['node_groups'])
+        if not groups or not all(isinstance(group, dict) and valid(group)
+                                 for group in groups):
+            raise error.InvalidError(
+                'Invalid spec: {0!r}; each node group requires an id and an '
+                'integer count'.format(spec))
+
+    def create_many(self, specs, parallelism=None, wait=False, timeout=None,
+                    interval=None, check_quota=None):
+        """
+        Create several clusters concurrently. A failure to create one cluster
+        does not prevent the others from being created.
+
+        :param specs: List of `dicts`, each containing the keyword arguments
+                      to :meth:`create` (except for `wait`)
+        :param parallelism: Maximum number of concurrent requests (default:
+                            10)
+        :param wait: If `True`, wait for all created clusters to become active
+                     before returning; see :meth:`wait_many`
+        :param timeout: Wait timeout in minutes (default: no timeout)
+        :param interval: Wait poll interval in seconds
+        :param check_quota: If `'error'`, raise
+                            :class:`~lavaclient.error.QuotaError` without
+                            sending any requests if the batch as a whole
+                            would exceed the tenant's remaining quota; if
+                            `'warn'`, only warn
+        :returns: :class:`BatchResult` of `(spec,`
+                  :class:`~lavaclient.api.response.ClusterDetail` `)` pairs,
+                  or :class:`~lavaclient.api.response.Cluster` objects if
+                  `wait` is `True`
+        """
+        specs = list(specs)
+        self._check_specs(specs, ('name', 'stack_id'),
+                          ('username', 'ssh_keys', 'user_scripts',
+                           'node_groups', 'connectors'))
+
+        if check_quota:
+            checker = quota.QuotaChecker(self._client)
+            self._check_quota(checker, [
+                checker.create_usage(spec['stack_id'],
+                                     spec.get('node_groups'))
+                for spec in specs], check_quota)
+
+        result = self._run_batch(lambda spec: self.create(**spec), specs,
+                                 parallelism)
+        if wait:
+            return self._wait_batch(result, timeout=timeout,
+                                    interval=interval)
+
+        return result
+
+    def resize_many(self, specs, parallelism=None, wait=False, timeout=None,
+                    interval=None, check_quota=None):
+        """
+        Resize several clusters concurrently. A failure to resize one cluster
+        does not prevent the others from being resized.
+
+        :param specs: List of `dicts`, each containing the `cluster_id` and
+                      `node_groups` arguments to :meth:`resize`
+        :param parallelism: Maximum number of concurrent requests (default:
+                            10)
+        :param wait: If `True`, wait for all resized clusters to become active
+                     before returning; see :meth:`wait_many`
+        :param timeout: Wait timeout in minutes (default: no timeout)
+        :param interval: Wait poll interval in seconds
+        :param check_quota: If `'error'`, raise
+                            :class:`~lavaclient.error.QuotaError` without
+                            sending any requests if the batch as a whole
+                            would exceed the tenant's remaining quota; if
+                            `'warn'`, only warn
+        :returns: :class:`BatchResult` of `(spec,`
+                  :class:`~lavaclient.api.response.ClusterDetail` `)` pairs,
+                  or :class:`~lavaclient.api.response.Cluster` objects if
+                  `wait` is `True`
+        """
+        specs = list(specs)
+        self._check_specs(specs, ('cluster_id', 'node_groups'))
+        for spec in specs:
+            self._check_resize_groups(spec)
+
+        if check_quota:
+            checker = quota.QuotaChecker(self._client)
+            self._check_quota(checker, [
+                checker.resize_usage(spec['cluster_id'], spec['node_groups'])
+                for spec in specs], check_quota)
+
+        result = self._run_batch(lambda spec: self.resize(**spec), specs,
+                                 parallelism)
+        if wait:
+            return self._wait_batch(result, timeout=timeout,
+                                    interval=interval)
+
+        return result
+
+    def delete_many(self, cluster_ids, parallelism=None):
+        """
+        Delete several clusters concurrently. A failure to delete one cluster
+        does not prevent the others from being deleted.
+
+        :param cluster_ids: List of cluster IDs
+        :param parallelism: Maximum number of concurrent requests (default:
+                            10)
+        :returns: :class:`BatchResult` of `(cluster_id, None)` pairs
+        """
+        return self._run_batch(self.delete, cluster_ids, parallelism)
+
+    @command(
+        parser_options=dict(
+            description='Create several clusters concurrently',
+        ),
+        spec_file=argument(
+            help='JSON or YAML file (or string) containing a list of '
+                 'clusters to create. Each item takes the same keys as the '
+                 'arguments to `lava clusters create`, e.g. name, stack_id, '
+                 'node_groups'),
+        parallelism=argument(type=positive_integer,
+                             help='Maximum number of concurrent requests '
+                                  '(default: {0})'.format(
+                                      DEFAULT_PARALLELISM)),
+        wait=argument(action='store_true',
+                      help='Wait for the clusters to become active'),
+        check_quota=argument(
+            choices=sorted(quota.MODES),
+            help="Check the tenant's remaining quota before sending the "
+                 "request, and either warn or fail if it would be exceeded"),
+    )
+    @display(display_batch)
+    def _create_many(self, spec_file, parallelism=None, wait=False,
+                     check_quota=None):
+        """
+        CLI-only; bulk cluster create command
+        """
+        return self.create_many(read_spec(spec_file), parallelism=parallelism,
+                                wait=wait, check_quota=check_quota)
+
+    @command(
+        parser_options=dict(
+            description='Resize several clusters concurrently',
+        ),
+        spec_file=argument(
+            help='JSON or YAML file (or string) containing a list of '
+                 'resizes, each with cluster_id and node_groups keys'),
+        parallelism=argument(type=positive_integer,
+                             help='Maximum number of concurrent requests '
+                                  '(default: {0})'.format(
+                                      DEFAULT_PARALLELISM)),
+        wait=argument(action='store_true',
+                      help='Wait for the clusters to become active'),
+        check_quota=argument(
+            choices=sorted(quota.MODES),
+            help="Check the tenant's remaining quota before sending the "
+                 "request, and either warn or fail if it would be exceeded"),
+    )
+    @display(display_batch)
+    def _resize_many(self, spec_file, parallelism=None, wait=False,
+                     check_quota=None):
+        """
+        CLI-only; bulk cluster resize command
+        """
+        return self.resize_many(read_spec(spec_file), parallelism=parallelism,
+                                wait=wait, check_quota=check_quota)
+
+    @command(
+        parser_options=dict(
+            description='Delete several clusters concurrently',
+        ),
+        spec_file=argument(
+            help='JSON or YAML file (or string) containing a list of cluster '
+                 'IDs'),
+        parallelism=argument(type=positive_integer,
+                             help='Maximum number of concurrent requests '
+                                  '(default: {0})'.format(
+                                      DEFAULT_PARALLELISM)),
+    )
+    @display(display_batch)
+    def _delete_many(self, spec_file, parallelism=None):
+        """
+        CLI-only; bulk cluster delete command
+        """
+        cluster_ids = read_spec(spec_file)
+        if not isinstance(cluster_ids, list):
+            raise error.InvalidError('Expected a list of cluster IDs')
+
+        return self.delete_many(cluster_ids, parallelism=parallelism)
 
     @coroutine
     def _cli_wait_printer(self, start):
@@ -525,15 +1059,17 @@ class Resource(resource.Resource):
 
         interval = max(MIN_INTERVAL, interval)
 
-        delta = timedelta(minutes=timeout) if timeout else timedelta(days=365)
-
         start = datetime.now()
-        timeout_date = start + delta
+        end = timeout_date(start, timeout)
 
         printer = self._cli_wait_printer(start)
 
-        while datetime.now() < timeout_date:
-            cluster = self.get(cluster_id)
+        while datetime.now() < end:
+            cluster = self._parse_response(
+                self._client._get('clusters/' + six.text_type(cluster_id),
+                                  use_store=False),
+                ClusterResponse,
+                wrapper='cluster')
             printer.send(cluster)
 
             if cluster.status == 'ACTIVE':
@@ -542,7 +1078,7 @@ class Resource(resource.Resource):
                 raise error.FailedError(
                     'Cluster status is {0}'.format(cluster.status))
 
-            if datetime.now() + timedelta(seconds=interval) >= timeout_date:
+            if datetime.now() + timedelta(seconds=interval) >= end:
                 break
 
             time.sleep(interval)
@@ -550,6 +1086,75 @@ class Resource(resource.Resource):
         raise error.TimeoutError(
             'Cluster did not become active before timeout')
 
+    def wait_many(self, cluster_ids, timeout=None, interval=None):
+        """
+        Wait (blocking) for several clusters to either become active or fail.
+        Instead of polling each cluster, the cluster list is polled once per
+        interval.
+
+        :param cluster_ids: List of cluster IDs
+        :param timeout: Wait timeout in minutes (default: no timeout)
+        :param interval: Poll interval in seconds
+        :returns: :class:`BatchResult` of `(cluster_id,`
+                  :class:`~lavaclient.api.response.Cluster` `)` pairs.
+                  Clusters that failed, disappeared, or did not become
+                  active before the timeout are included in the failures.
+        """
+        if interval is None:
+            interval = WAIT_INTERVAL
+
+        interval = max(MIN_INTERVAL, interval)
+
+        end = timeout_date(datetime.now(), timeout)
+
+        cluster_ids = list(cluster_ids)
+        outcomes = {}
+        if not cluster_ids:
+            return BatchResult()
+
+        while True:
+            clusters = dict(
+                (cluster.id, cluster) for cluster in self._parse_response(
+                    self._client._get('clusters', use_store=False),
+                    ClustersResponse,
+                    wrapper='clusters'))
+
+            for cluster_id in cluster_ids:
+                if cluster_id in outcomes:
+                    continue
+
+                cluster = clusters.get(cluster_id)
+                if cluster is None:
+                    outcomes[cluster_id] = error.NotFoundError(
+                        'Cluster {0} does not exist'.format(cluster_id))
+                elif cluster.status == 'ACTIVE':
+                    outcomes[cluster_id] = cluster
+                elif cluster.status not in IN_PROGRESS_STATES:
+                    outcomes[cluster_id] = error.FailedError(
+                        'Cluster status is {0}'.format(cluster.status))
+
+            pending = len(cluster_ids) - len(outcomes)
+            LOG.debug('Waiting for %d of %d clusters', pending,
+                      len(cluster_ids))
+
+            if not pending or (datetime.now() + timedelta(seconds=interval) >=
+                               end):
+                break
+
+            time.sleep(interval)
+
+        result = BatchResult()
+        for cluster_id in cluster_ids:
+            outcome = outcomes.get(cluster_id, error.TimeoutError(
+                'Cluster did not become active before timeout'))
+
+            if isinstance(outcome, Exception):
+                result.failed.append((cluster_id, outcome))
+            else:
+                result.succeeded.append((cluster_id, outcome))
+
+        return result
+
     @command(parser_options=dict(
         description='List all nodes in the cluster'
     ))
@@ -563,32 +1168,28 @@ class Resource(resource.Resource):
         """
         return self._client.nodes.list(cluster_id)
 
-    def _get_named_node(self, nodes, node_name=None):
-        if node_name is None:
-            return nodes[0]
-
-        try:
-            ssh_node = six.next(node for node in nodes
-                                if node.name.lower() == node_name.lower())
-        except StopIteration:
-            raise error.InvalidError(
-                'Invalid node: {0}; available nodes are {1}'.format(
-                    node_name, ', '.join(node.name for node in nodes)))
-
-        if ssh_node.status.upper() != 'ACTIVE':
-            raise error.InvalidError(
-                'Node {0} must be ACTIVE, but is {1} instead'.format(
-                    node_name, ssh_node.status))
+    def topology(self, cluster_id, wait=False):
+        """
+        Get the cluster and its nodes, indexed by node name, node group,
+        component, and component URI. If the cluster is not ACTIVE/ERROR and
+        wait is `True`, block until it becomes active; otherwise, raise
+        :class:`~lavaclient.error.InvalidError`.
 
-        return ssh_node
+        The cluster and its nodes are fetched concurrently, and cached in the
+        client's catalog for a short time (until the cluster is resized or
+        deleted); see :meth:`~lavaclient.catalog.Catalog.cached_topology`.
 
-    def _cluster_nodes(self, cluster_id, wait=False):
-        """
-        Return `(cluster, nodes)`, where `nodes` is a list of all nodes in the
-        cluster. If the cluster is not ACTIVE/ERROR and wait is `True`, the
-        function will block until it becomes active; otherwise, an exception
-        is thrown.
+        :param cluster_id: Cluster ID
+        :param wait: If `True`, wait for the cluster to become active
+        :returns: :class:`~lavaclient.inventory.ClusterTopology`
         """
+        catalog = self._client.catalog
+        topology = catalog.cached_topology(cluster_id)
+        if topology is not None:
+            LOG.debug('Using cached nodes of cluster %s', cluster_id)
+            return topology
+
+        nodes = background(self._client.nodes.list, cluster_id)
         cluster = self.get(cluster_id)
         status = cluster.status.upper()
         if status not in FINAL_STATES:
@@ -600,9 +1201,13 @@ class Resource(resource.Resource):
             elif not wait:
                 raise error.InvalidError('Cluster is not yet active')
 
-            self.wait(cluster_id)
+            # Nodes may change while the cluster is being built
+            cluster = self.wait(cluster_id)
+            nodes = background(self._client.nodes.list, cluster_id)
 
-        return cluster, self.nodes(cluster_id)
+        topology = ClusterTopology(cluster, nodes.result())
+        catalog.update_topology(topology)
+        return topology
 
     @command(
         parser_options=dict(
@@ -638,15 +1243,12 @@ class Resource(resource.Resource):
         if port is None:
             port = 12345
 
-        cluster, nodes = self._cluster_nodes(cluster_id, wait=wait)
-        ssh_node = self._get_named_node(nodes, node_name=node_name)
+        topology = self.topology(cluster_id, wait=wait)
+        cluster = topology.cluster
+        ssh_node = topology.node(node_name)
 
         # Get a URL to test the proxy against
-        all_urls = itertools.chain.from_iterable(
-            [component['uri'] for component in node.components
-             if 'uri' in component and component['uri'].startswith('http')]
-            for node in nodes)
-        test_url = six.next(all_urls, None)
+        test_url = next(iter(topology.uris('http')), None)
 
         printer = self._cli_printer(LOG)
         printer('Starting SOCKS proxy via node {0} ({1})'.format(
@@ -695,10 +1297,10 @@ class Resource(resource.Resource):
 
     def _execute_ssh(self, cluster_id, node_name=None, ssh_command=None,
                      wait=False, command=None):
-        cluster, nodes = self._cluster_nodes(cluster_id, wait=wait)
-        node = self._get_named_node(nodes, node_name=node_name)
+        topology = self.topology(cluster_id, wait=wait)
+        node = topology.node(node_name)
 
-        return node._ssh(cluster.username, command=command,
+        return node._ssh(topology.cluster.username, command=command,
                          ssh_command=ssh_command)
 
     def ssh_execute(self, cluster_id, node_name, command, ssh_command=None,
@@ -22,6 +22,7 @@ from lavaclient.api import resource
 from lavaclient.api.response import (Credentials, CloudFilesCredential, SSHKey,
                                      S3Credential, CredentialType)
 from lavaclient.validators import Length
+from lavaclient import error
 from lavaclient.util import (CommandLine, argument, command, display_table,
                              file_or_string)
 from lavaclient.log import NullHandler
@@ -105,6 +106,30 @@ class Resource(resource.Resource):
 
         return getattr(resp, type) if type else resp
 
+    def iter(self, type, page_size=None):
+        """
+        Iterate over credentials of a single type belonging to the tenant
+
+        :param type: One of `ssh_keys`, `cloud_files`, or `s3`
+        :param page_size: If given, request credentials this many at a time,
+                          fetching the next page while the current one is
+                          being consumed
+        :returns: Iterator of :class:`SSHKey`, :class:`CloudFilesCredential`,
+                  or :class:`S3Credential` objects
+        """
+        if type not in Credentials._fields:
+            raise error.InvalidError('Invalid credential type: {0}'.format(
+                type))
+
+        if page_size is None:
+            return iter(self._list(type=type))
+
+        return self._paginate(
+            'credentials/' + type,
+            lambda data: getattr(self._parse_response(
+                data, CredentialsResponse, wrapper='credentials'), type),
+            page_size)
+
     @command(parser_options=dict(
         description='List all existing credentials',
     ))
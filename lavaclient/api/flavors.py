@@ -52,7 +52,10 @@ class Resource(resource.Resource):
 
         :returns: List of :class:`~lavaclient.api.response.Flavor` objects
         """
-        return self._parse_response(
+        flavors = self._parse_response(
             self._client._get('/flavors'),
             FlavorsResponse,
             wrapper='flavors')
+        self._client.catalog.update_flavors(flavors)
+
+        return flavors
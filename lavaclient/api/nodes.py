@@ -5,7 +5,9 @@ from figgis import Config, ListField
 from lavaclient.api import resource
 from lavaclient import constants
 from lavaclient.api.response import Node
-from lavaclient.util import command, display_table, CommandLine
+from lavaclient.inventory import NodeInventory
+from lavaclient.util import (command, argument, display_table, field_list,
+                             CommandLine)
 
 LOG = logging.getLogger(constants.LOGGER_NAME)
 
@@ -29,17 +31,75 @@ class NodesResponse(Config):
 class Resource(resource.Resource):
 
     """Nodes API methods"""
-    @command(parser_options=dict(
-        description='List all nodes in a cluster'
-    ))
+    @command(
+        parser_options=dict(
+            description='List all nodes in a cluster'
+        ),
+        fields=argument(
+            type=field_list,
+            help='Comma-separated list of fields to display, e.g. '
+                 'name,public_ip'),
+    )
     @display_table(Node)
-    def list(self, cluster_id):
+    def list(self, cluster_id, fields=None):
         """
         List nodes belonging to the cluster.
 
+        :param fields: If given, only parse these fields of each node; see
+                       :func:`~lavaclient.util.project`
         :returns: List of :class:`~lavaclient.api.response.Node` objects
         """
         return self._parse_response(
             self._client._get('clusters/{0}/nodes'.format(cluster_id)),
             NodesResponse,
-            wrapper='nodes')
+            wrapper='nodes',
+            fields=fields)
+
+    def iter(self, cluster_id, page_size=None, fields=None):
+        """
+        Iterate over nodes belonging to the cluster. Unlike :meth:`list`,
+        the response is parsed as it is received, so that memory use does not
+        grow with the number of nodes.
+
+        :param page_size: If given, request nodes this many at a time,
+                          fetching the next page while the current one is
+                          being consumed
+        :param fields: If given, only parse these fields of each node; see
+                       :func:`~lavaclient.util.project`
+        :returns: Iterator of :class:`~lavaclient.api.response.Node` objects
+        """
+        if page_size is not None:
+            # Pagination requires the ID of each node
+            fields = fields and list(fields) + ['id']
+            return self._paginate(
+                'clusters/{0}/nodes'.format(cluster_id),
+                lambda data: self._parse_response(data, NodesResponse,
+                                                  wrapper='nodes',
+                                                  fields=fields),
+                page_size)
+
+        return self._iter_response(
+            self._client._get('clusters/{0}/nodes'.format(cluster_id),
+                              stream=True),
+            NodesResponse,
+            wrapper='nodes',
+            fields=fields)
+
+    def inventory(self, cluster_ids=None):
+        """
+        Build an indexed inventory of nodes across one or more clusters,
+        which can be queried without scanning every node and refreshed in
+        place. See :mod:`lavaclient.inventory`.
+
+        :param cluster_ids: List of cluster IDs; defaults to all of the
+                            tenant's clusters
+        :returns: :class:`~lavaclient.inventory.NodeInventory`
+        """
+        def loader():
+            ids = cluster_ids
+            if ids is None:
+                ids = [cluster.id for cluster in self._client.clusters.list()]
+
+            return [(cluster_id, self.list(cluster_id)) for cluster_id in ids]
+
+        return NodeInventory(loader=loader).refresh()
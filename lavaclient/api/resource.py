@@ -13,16 +13,24 @@
 import logging
 import figgis
 import six
+import time
 
-from lavaclient import error
+from lavaclient import error, tracing
+from lavaclient.concurrency import background
+from lavaclient.hooks import AFTER_PARSE, ON_ERROR
 from lavaclient.log import NullHandler
-from lavaclient.util import inject_client
+from lavaclient.util import (inject_client, iter_json_list, mark_stale,
+                             project, StaleData)
 
 
 LOG = logging.getLogger(__name__)
 LOG.addHandler(NullHandler())
 
 
+# Bytes read at a time from streamed responses
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
 def _prune_marshaled_data(marshaled, original_data):
     """Prune keys from marshaled data that don't exist in the original data
     (which would have been put there by to_dict method.
@@ -51,27 +59,154 @@ class Resource(object):
         self._args = cli_args
         self._command_line = cli_args is not None
 
-    def _parse_response(self, data, response_class, wrapper=None):
+    def _fire(self, event, **kwargs):
+        """Call the client's hooks for an event"""
+        if self._client is not None:
+            self._client.hooks.fire(event, **kwargs)
+
+    def _projection(self, response_class, wrapper, fields):
+        """Response class that only parses the given fields (see
+        :func:`~lavaclient.util.project`) of the wrapped objects"""
+        if not fields:
+            return response_class
+        elif wrapper is not None:
+            fields = ['{0}.{1}'.format(wrapper, field) for field in fields]
+
+        return project(response_class, fields)
+
+    def _parse_response(self, data, response_class, wrapper=None,
+                        fields=None):
         """
         Parse json data using the response class, returning
         response_class(data).  If wrapper is not None, return the attribute in
-        wrapper instead of the object itself.
+        wrapper instead of the object itself.  If fields is not None, only
+        those fields (of the wrapped objects, if wrapper is not None) are
+        parsed; see :func:`~lavaclient.util.project`.
 
         After parsing the data, the client object is injected into any Config
         objects. This allows Config objects to potentially make further API
-        queries.
+        queries. Results parsed from stale stored data are marked as such; see
+        :func:`~lavaclient.util.is_stale`.
+
+        The client's `after_parse` hooks are called with the time taken to
+        parse the data, or its `on_error` hooks if the data is invalid.
         """
         if wrapper is not None and not hasattr(response_class, wrapper):
             raise AttributeError('{0} does not have attribute {1}'.format(
                 response_class.__name__, wrapper))
 
+        response_class = self._projection(response_class, wrapper, fields)
+
+        start = time.time()
         try:
-            response = inject_client(self._client, response_class(data))
-            return response if wrapper is None else response.get(wrapper)
+            with tracing.span('parse ' + response_class.__name__,
+                              tracing.PARSE,
+                              tracer=getattr(self._client, 'tracer', None)):
+                response = inject_client(self._client, response_class(data))
+                result = (response if wrapper is None
+                          else response.get(wrapper))
         except (figgis.PropertyError, figgis.ValidationError) as exc:
+            msg = 'Invalid response: {0}'.format(exc)
+            LOG.critical(msg, exc_info=exc)
+            api_error = error.ApiError(msg)
+            self._fire(ON_ERROR, response_class=response_class,
+                       error=api_error)
+            raise api_error
+
+        self._fire(AFTER_PARSE, response_class=response_class,
+                   elapsed=time.time() - start)
+
+        if isinstance(data, StaleData):
+            result = mark_stale(result, data.fetched_at)
+
+        return result
+
+    def _iter_response(self, resp, response_class, wrapper, fields=None):
+        """
+        Like :meth:`_parse_response`, but incrementally parse a streamed
+        response (see the `stream` option of
+        :meth:`~lavaclient.client.Lava._request`), in which the wrapper
+        attribute of the response class is a list. Yield each list item as
+        soon as it has been parsed, closing the response when done.
+        """
+        if not hasattr(response_class, wrapper):
+            raise AttributeError('{0} does not have attribute {1}'.format(
+                response_class.__name__, wrapper))
+
+        item_class = self._projection(response_class, wrapper,
+                                      fields)._fields[wrapper].type
+
+        try:
+            for data in iter_json_list(
+                    resp.iter_content(chunk_size=STREAM_CHUNK_SIZE),
+                    response_class._fields[wrapper]._key or wrapper):
+                try:
+                    yield inject_client(self._client, item_class(data))
+                except (figgis.PropertyError, figgis.ValidationError) as exc:
+                    msg = 'Invalid response: {0}'.format(exc)
+                    LOG.critical(msg, exc_info=exc)
+                    raise error.ApiError(msg)
+        except ValueError as exc:
             msg = 'Invalid response: {0}'.format(exc)
             LOG.critical(msg, exc_info=exc)
             raise error.ApiError(msg)
+        finally:
+            resp.close()
+
+    def _paginate(self, path, parse, page_size, params=None):
+        """
+        Yield items from a list endpoint one page at a time, using the `limit`
+        and `marker` query parameters. `parse` turns the JSON data of a page
+        into a list of items, each of which must have an `id` attribute.
+
+        While the caller processes one page, the next one is fetched in the
+        background. If the server ignores `limit`, the first response already
+        contains every item; if it ignores `marker`, the next page repeats
+        the previous one, so the full list is fetched without paging and its
+        remaining items are yielded. In either case, no duplicates are
+        yielded.
+        """
+        if page_size < 1:
+            raise error.InvalidError('Page size must be a positive integer')
+
+        def fetch(marker):
+            page_params = dict(params or {}, limit=page_size)
+            if marker is not None:
+                page_params.update(marker=marker)
+
+            return parse(self._client._get(path, params=page_params))
+
+        seen = set()
+        page = fetch(None)
+
+        while True:
+            if len(page) > page_size:
+                LOG.debug('Server ignored page limit for %s', path)
+                for item in page:
+                    yield item
+                return
+
+            items = [item for item in page if item.id not in seen]
+            if page and not items:
+                LOG.debug('Server ignored page marker for %s', path)
+                for item in parse(self._client._get(path, params=params)):
+                    if item.id not in seen:
+                        yield item
+                return
+
+            if len(page) == page_size:
+                next_page = background(fetch, items[-1].id)
+            else:
+                next_page = None
+
+            for item in items:
+                seen.add(item.id)
+                yield item
+
+            if next_page is None:
+                return
+
+            page = next_page.result()
 
     def _marshal_request(self, data, request_class, wrapper=None):
         """
@@ -21,7 +21,7 @@ from datetime import datetime
 
 from lavaclient.validators import Length, Range
 from lavaclient.util import (display_result, prettify, _prettify, ssh_to_host,
-                             print_table)
+                             print_table, memoized_metadata)
 from lavaclient.log import NullHandler
 from lavaclient import error
 
@@ -38,30 +38,64 @@ def DateTime(value):
     return dateparse(value)
 
 
+# Shared copies of enum-like string values, e.g. cluster status or node group
+# ID. Only fields with a small set of possible values should be interned,
+# since entries are never evicted.
+_INTERNED = {}
+
+
+def intern_text(value):
+    """Return the shared copy of a text value, adding it if necessary"""
+    return _INTERNED.setdefault(value, value)
+
+
+def Interned(value):
+    """Parse a text value that repeats across many response objects, e.g.
+    `ACTIVE`, returning a single shared copy of each distinct value"""
+    return intern_text(six.text_type(value))
+
+
+# Keys of component dicts whose values are enum-like, e.g. `HiveClient`;
+# other values, such as `uri`, are unique to a host and are not interned
+_INTERNED_COMPONENT_KEYS = frozenset(['name'])
+
+
+def InternedDict(value):
+    """Parse a component dict, interning its keys and the values of
+    enum-like keys such as `name`"""
+    return dict(
+        (intern_text(six.text_type(key)),
+         intern_text(item) if (key in _INTERNED_COMPONENT_KEYS and
+                               isinstance(item, six.text_type)) else item)
+        for key, item in six.iteritems(value))
+
+
+def _repr_keys(cls):
+    """Return (keys shown with values, other keys) for ReprMixin"""
+    properties = set(
+        key for key, value in six.iteritems(cls.__dict__)
+        if not key.startswith('_') and isinstance(value, property))
+
+    # 'id' and 'name' always go at the front of the list
+    front = tuple(key for key in ('id', 'name') if key in properties)
+    properties.difference_update(front)
+
+    # Next come any other id's
+    ids = sorted(key for key in properties if key.endswith('_id'))
+    properties.difference_update(ids)
+
+    return front, tuple(ids) + tuple(sorted(properties))
+
+
 class ReprMixin(object):
     """Defines a standard __repr__ method for response objects"""
 
     def __repr__(self):
-        properties = set(
-            key for key, value in six.iteritems(self.__class__.__dict__)
-            if not key.startswith('_') and isinstance(value, property))
-
-        # 'id' and 'name' always go at the front of the list
-        ordered = []
-        for key in ('id', 'name'):
-            if key in properties:
-                ordered.append("{0}='{1}'".format(key, self.get(key)))
-                properties.remove(key)
-
-        # Next come any other id's
-        ids = []
-        for key in list(properties):
-            if key.endswith('_id'):
-                ids.append(key)
-                properties.remove(key)
-
-        ordered.extend(sorted(ids))
-        ordered.extend(sorted(properties))
+        front, rest = memoized_metadata(self.__class__, 'repr_keys',
+                                        _repr_keys)
+
+        ordered = ["{0}='{1}'".format(key, self.get(key)) for key in front]
+        ordered.extend(rest)
 
         return '{0}({1})'.format(self.__class__.__name__, ', '.join(ordered))
 
@@ -72,14 +106,14 @@ class ReprMixin(object):
 
 class Link(Config, ReprMixin):
 
-    rel = Field(six.text_type, required=True)
+    rel = Field(Interned, required=True)
     href = Field(six.text_type, required=True)
 
 
 class Address(Config, ReprMixin):
 
     address = Field(six.text_type, required=True, key='addr')
-    version = Field(six.text_type, required=True)
+    version = Field(Interned, required=True)
 
 
 class Addresses(Config, ReprMixin):
@@ -105,16 +139,22 @@ class Node(Config, ReprMixin):
     updated = Field(DateTime, required=True,
                     help=':py:class:`~datetime.datetime` corresponding to '
                          'date last updated')
-    status = Field(six.text_type, required=True)
-    flavor_id = Field(six.text_type, required=True)
+    status = Field(Interned, required=True)
+    flavor_id = Field(Interned, required=True)
     addresses = Field(Addresses, required=True,
                       help='Public and private IP addresses; See: '
                            ':class:`Addresses`')
-    node_group = Field(six.text_type, required=True, help='Node group ID')
-    components = ListField(dict, required=True,
+    node_group = Field(Interned, required=True, help='Node group ID')
+    components = ListField(InternedDict, required=True,
                            help='Components installed on this node, e.g. '
                                 '`HiveClient`')
 
+    # Fields used by properties; see lavaclient.util.project
+    field_dependencies = {
+        'private_ip': ('addresses.private',),
+        'public_ip': ('addresses.public',),
+    }
+
     @property
     def private_ip(self):
         """Private IP address on service network"""
@@ -155,7 +195,10 @@ class Node(Config, ReprMixin):
         """
         Execute a command remotely on this node, returning the output.
 
-        :param username: Login user
+        :param username: Login user, i.e. the `username` of the node's
+                         cluster, e.g. `topology.cluster.username` for a
+                         node found in a
+                         :class:`~lavaclient.inventory.ClusterTopology`
         :param command: Command to execute remotely
         :param ssh_command: ssh command string or `list`, e.g.
                             `ssh -F configfile`
@@ -174,15 +217,15 @@ class NodeGroup(Config, ReprMixin):
     id = Field(six.text_type, required=True,
                validator=Length(min=1, max=255))
     count = Field(int, validator=Range(min=1, max=100))
-    flavor_id = Field(six.text_type)
-    components = ListField(dict, default={})
+    flavor_id = Field(Interned)
+    components = ListField(InternedDict, default={})
 
 
 class ClusterScript(Config, ReprMixin):
 
     id = Field(six.text_type, required=True)
     name = Field(six.text_type, required=True)
-    status = Field(six.text_type, required=True)
+    status = Field(Interned, required=True)
 
 
 class BaseCluster(object):
@@ -192,6 +235,11 @@ class BaseCluster(object):
         """See: :meth:`~lavaclient.api.clusters.Resource.nodes`"""
         return self._client.clusters.nodes(self.id)
 
+    @property
+    def topology(self):
+        """See: :meth:`~lavaclient.api.clusters.Resource.topology`"""
+        return self._client.clusters.topology(self.id)
+
     def refresh(self):
         """
         Refresh the cluster. If this object was returned from
@@ -255,8 +303,8 @@ class Cluster(Config, ReprMixin, BaseCluster):
                     help=':py:class:`~datetime.datetime` corresponding to '
                          'date last updated')
     name = Field(six.text_type, required=True)
-    status = Field(six.text_type, required=True)
-    stack_id = Field(six.text_type, required=True)
+    status = Field(Interned, required=True)
+    stack_id = Field(Interned, required=True)
     cbd_version = Field(int, required=True,
                         help='API version at which cluster was created')
     links = ListField(Link, required=True)
@@ -86,6 +86,30 @@ class Resource(resource.Resource):
             ScriptsResponse,
             wrapper='scripts')
 
+    def iter(self, page_size=None):
+        """
+        Iterate over scripts that belong to the tenant specified in the
+        client. Unlike :meth:`list`, the response is parsed as it is
+        received.
+
+        :param page_size: If given, request scripts this many at a time,
+                          fetching the next page while the current one is
+                          being consumed
+        :returns: Iterator of :class:`~lavaclient.api.response.Script`
+                  objects
+        """
+        if page_size is not None:
+            return self._paginate(
+                'scripts',
+                lambda data: self._parse_response(data, ScriptsResponse,
+                                                  wrapper='scripts'),
+                page_size)
+
+        return self._iter_response(
+            self._client._get('scripts', stream=True),
+            ScriptsResponse,
+            wrapper='scripts')
+
     @command(
         parser_options=dict(
             description='Create a cluster script',
@@ -177,10 +177,13 @@ class Resource(resource.Resource):
         :param stack_id: Stack ID
         :returns: :class:`~lavaclient.api.response.StackDetail`
         """
-        return self._parse_response(
+        stack = self._parse_response(
             self._client._get('stacks/{0}'.format(stack_id)),
             StackResponse,
             wrapper='stack')
+        self._client.catalog.update_stack(stack)
+
+        return stack
 
     # @command(
     #     parser_options=dict(
@@ -0,0 +1,254 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Circuit breakers, which fail requests immediately while the API or keystone
+is failing, instead of letting every caller wait for its own timeout, e.g.
+
+    >>> breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    >>> lava = Lava(..., circuit_breaker=breaker)
+
+There is a circuit for each service (`'lava'` or `'keystone'`), base URL
+(e.g. the API endpoint of each region and tenant), and endpoint (see
+:func:`~lavaclient.metrics.endpoint`), so a breaker may be shared by clients
+of different regions and tenants. A circuit opens after
+`failure_threshold` consecutive connection errors, timeouts, or 5xx
+responses; requests through an open circuit raise
+:class:`~lavaclient.error.CircuitOpenError` without being sent. After
+`reset_timeout` seconds the circuit is half-open, and lets a probe request
+through: if it succeeds the circuit closes, otherwise it opens again.
+
+State changes fire the `on_circuit_change` hook (see :mod:`lavaclient.hooks`),
+from which :class:`~lavaclient.metrics.Metrics` reports circuit states.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+import requests
+from keystoneclient import exceptions as ks_error
+
+from lavaclient.hooks import ON_CIRCUIT_CHANGE
+from lavaclient.log import NullHandler
+from lavaclient.metrics import endpoint
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+# Services
+LAVA = 'lava'
+KEYSTONE = 'keystone'
+
+# Circuit states
+CLOSED = 'closed'
+HALF_OPEN = 'half_open'
+OPEN = 'open'
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+# Keystone exceptions that indicate that the service is failing
+KEYSTONE_FAILURES = (ks_error.ConnectionError, ks_error.RequestTimeout,
+                     ks_error.HttpServerError)
+
+
+def is_failure(exc):
+    """Whether an exception indicates that a service is failing, as opposed
+    to e.g. rejecting a bad request"""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        response = exc.response
+        return response is None or response.status_code >= 500
+
+    return isinstance(exc, (requests.exceptions.RequestException,) +
+                      KEYSTONE_FAILURES)
+
+
+def is_response(exc):
+    """Whether an exception was caused by a response from a service, which
+    shows that the service is reachable, as opposed to e.g. a deadline that
+    passed before a request was sent"""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        return exc.response is not None
+
+    return isinstance(exc, ks_error.HttpError)
+
+
+class Circuit(object):
+    """State of the circuit for a single service and endpoint"""
+
+    def __init__(self, service, endpoint, failure_threshold, reset_timeout,
+                 half_open_calls, base_url=None):
+        self.service = service
+        self.endpoint = endpoint
+        self.base_url = base_url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+
+        self._lock = Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._changed = time.time()
+        self._probes = 0
+
+    @property
+    def state(self):
+        return self._state
+
+    def _set_state(self, state):
+        """Change state, returning the previous one"""
+        previous = self._state
+        self._state = state
+        self._changed = time.time()
+        self._probes = 0
+
+        LOG.log(logging.WARNING if state == OPEN else logging.INFO,
+                'Circuit for %s %s changed from %s to %s', self.service,
+                self.endpoint, previous, state)
+        return previous
+
+    def before(self):
+        """
+        Check whether a request may be sent, raising
+        :class:`~lavaclient.error.CircuitOpenError` if not. Returns
+        (previous state, state) if the state changed, otherwise `None`.
+        """
+        with self._lock:
+            elapsed = time.time() - self._changed
+            change = None
+            if self._state != CLOSED and elapsed >= self.reset_timeout:
+                # Also lets probes through again if earlier ones were
+                # abandoned without recording their result
+                if self._state == OPEN:
+                    change = (self._set_state(HALF_OPEN), HALF_OPEN)
+                else:
+                    self._changed = time.time()
+                    self._probes = 0
+
+                elapsed = 0
+
+            if self._state == OPEN or (self._state == HALF_OPEN and
+                                       self._probes >= self.half_open_calls):
+                retry_in = max(self.reset_timeout - elapsed, 0)
+                raise error.CircuitOpenError(
+                    'Circuit for {0} {1} is open; retry in {2:.1f}s'.format(
+                        self.service, self.endpoint or '/', retry_in),
+                    service=self.service, endpoint=self.endpoint,
+                    retry_in=retry_in)
+
+            if self._state == HALF_OPEN:
+                self._probes += 1
+
+            return change
+
+    def success(self):
+        """Record a successful request; returns the state change, if any"""
+        with self._lock:
+            self._failures = 0
+            if self._state != CLOSED:
+                return (self._set_state(CLOSED), CLOSED)
+
+    def release(self):
+        """Record that a request was abandoned without reaching the service,
+        freeing its probe slot if the circuit is half-open"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def failure(self):
+        """Record a failed request; returns the state change, if any"""
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (
+                    self._state == CLOSED and
+                    self._failures >= self.failure_threshold):
+                return (self._set_state(OPEN), OPEN)
+
+
+class CircuitBreaker(object):
+    """
+    Circuits for each service and endpoint, created as they are needed. A
+    single breaker may be shared by any number of threads and clients.
+
+    :param failure_threshold: Number of consecutive failures after which a
+                              circuit opens
+    :param reset_timeout: Number of seconds after which an open circuit lets
+                          a probe request through
+    :param half_open_calls: Number of probe requests let through a half-open
+                            circuit at a time
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0,
+                 half_open_calls=1):
+        if failure_threshold < 1 or reset_timeout < 0 or half_open_calls < 1:
+            raise error.InvalidError('Invalid circuit breaker settings')
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+
+        self._lock = Lock()
+        self._circuits = {}
+
+    def circuit(self, service, path, base_url=None):
+        """Return the :class:`Circuit` for a service, base URL (e.g. the API
+        endpoint of a client), and request path"""
+        key = (service, base_url, endpoint(path))
+        with self._lock:
+            if key not in self._circuits:
+                self._circuits[key] = Circuit(
+                    service, key[2], self.failure_threshold,
+                    self.reset_timeout, self.half_open_calls,
+                    base_url=base_url)
+
+            return self._circuits[key]
+
+    def states(self):
+        """`dict` of (service, base URL, endpoint) to circuit state"""
+        with self._lock:
+            return dict((key, circuit.state)
+                        for key, circuit in self._circuits.items())
+
+    @contextmanager
+    def guard(self, service, path, hooks=None, base_url=None):
+        """
+        Context manager around a request, which raises
+        :class:`~lavaclient.error.CircuitOpenError` if the circuit is open,
+        and otherwise records whether the request failed. Exceptions that
+        neither indicate a failure nor carry a response from the service,
+        e.g. a deadline that passed before the request was sent, leave the
+        circuit unchanged. State changes are fired to hooks, if given.
+        """
+        circuit = self.circuit(service, path, base_url)
+
+        def changed(change):
+            if change is not None and hooks is not None:
+                hooks.fire(ON_CIRCUIT_CHANGE, service=service,
+                           endpoint=circuit.endpoint, state=change[1],
+                           previous=change[0], base_url=base_url)
+
+        changed(circuit.before())
+        try:
+            yield circuit
+        except BaseException as exc:
+            if is_failure(exc):
+                changed(circuit.failure())
+            elif is_response(exc):
+                changed(circuit.success())
+            else:
+                circuit.release()
+            raise
+
+        changed(circuit.success())
@@ -0,0 +1,193 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-memory cache of flavors and stack details, which rarely change. The cache
+is filled by :meth:`~lavaclient.api.flavors.Resource.list` and
+:meth:`~lavaclient.api.stacks.Resource.get`, and fetches anything it is
+missing on demand, e.g.
+
+    >>> lava.catalog.flavor('hadoop1-7').ram
+    7680
+
+It also remembers the stack of each cluster that has been listed or fetched,
+and, for a short time, the nodes of clusters used for SSH (see
+:meth:`cached_topology`).
+"""
+
+import logging
+import time
+from threading import Lock
+
+from lavaclient.log import NullHandler
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+# Number of seconds for which cached flavors and stacks are used
+DEFAULT_CATALOG_TTL = 3600
+
+# Number of seconds for which a cluster and its nodes are cached
+DEFAULT_TOPOLOGY_TTL = 60
+
+
+class Catalog(object):
+    """
+    Cache of :class:`~lavaclient.api.response.Flavor` and
+    :class:`~lavaclient.api.response.StackDetail` objects
+
+    :param client: :class:`~lavaclient.client.Lava` instance
+    :param ttl: Number of seconds for which cached data is used before it is
+                fetched again
+    :param topology_ttl: Number of seconds for which a cluster and its nodes
+                         are cached
+    """
+
+    def __init__(self, client, ttl=DEFAULT_CATALOG_TTL,
+                 topology_ttl=DEFAULT_TOPOLOGY_TTL):
+        self._client = client
+        self.ttl = ttl
+        self.topology_ttl = topology_ttl
+        self._lock = Lock()
+        self._flavors = None
+        self._flavors_at = None
+        self._stacks = {}
+        self._cluster_stacks = {}
+        self._topologies = {}
+
+    def _expired(self, fetched_at):
+        return fetched_at is None or time.time() - fetched_at >= self.ttl
+
+    def update_flavors(self, flavors):
+        """Replace the cached flavors"""
+        with self._lock:
+            self._flavors = dict((flavor.id, flavor) for flavor in flavors)
+            self._flavors_at = time.time()
+
+    def update_stack(self, stack):
+        """Add or replace a cached stack"""
+        with self._lock:
+            self._stacks[stack.id] = (stack, time.time())
+
+    def update_clusters(self, clusters):
+        """Remember the stack IDs of clusters"""
+        with self._lock:
+            for cluster in clusters:
+                self._cluster_stacks[cluster.id] = cluster.stack_id
+
+    def remove_cluster(self, cluster_id):
+        """Forget the stack ID and nodes of a deleted cluster"""
+        with self._lock:
+            self._cluster_stacks.pop(cluster_id, None)
+            self._topologies.pop(cluster_id, None)
+
+    def update_topology(self, topology):
+        """Cache a :class:`~lavaclient.inventory.ClusterTopology`"""
+        with self._lock:
+            self._topologies[topology.cluster.id] = (topology, time.time())
+
+    def cached_topology(self, cluster_id):
+        """Return the :class:`~lavaclient.inventory.ClusterTopology` of a
+        cluster if it is cached (and not expired), or `None`"""
+        with self._lock:
+            topology, fetched_at = self._topologies.get(cluster_id,
+                                                        (None, None))
+            if (fetched_at is None or
+                    time.time() - fetched_at >= self.topology_ttl):
+                return None
+
+            return topology
+
+    def invalidate_topology(self, cluster_id):
+        """Discard the cached nodes of a cluster, e.g. after resizing it"""
+        with self._lock:
+            self._topologies.pop(cluster_id, None)
+
+    def cluster_stack(self, cluster_id):
+        """Return the stack ID of a cluster, or `None` if it is not known"""
+        with self._lock:
+            return self._cluster_stacks.get(cluster_id)
+
+    def invalidate(self):
+        """Discard all cached data"""
+        with self._lock:
+            self._flavors = None
+            self._flavors_at = None
+            self._stacks.clear()
+            self._topologies.clear()
+
+    def cached_flavors(self):
+        """Return the cached flavors as a `dict` of flavor ID to
+        :class:`~lavaclient.api.response.Flavor`, or `None` if they are not
+        cached (or expired)"""
+        with self._lock:
+            if self._expired(self._flavors_at):
+                return None
+
+            return dict(self._flavors)
+
+    def flavors(self):
+        """
+        Return the cached flavors, fetching them if necessary
+
+        :returns: `dict` of flavor ID to
+                  :class:`~lavaclient.api.response.Flavor`
+        """
+        with self._lock:
+            if not self._expired(self._flavors_at):
+                return dict(self._flavors)
+
+        LOG.debug('Fetching flavors')
+        self._client.flavors.list()
+        with self._lock:
+            return dict(self._flavors or {})
+
+    def flavor(self, flavor_id):
+        """
+        Return a flavor by ID. If the flavor is not cached, the flavors are
+        fetched again in case it was added since.
+
+        :returns: :class:`~lavaclient.api.response.Flavor`
+        """
+        flavor = self.flavors().get(flavor_id)
+        if flavor is None:
+            with self._lock:
+                self._flavors_at = None
+
+            flavor = self.flavors().get(flavor_id)
+            if flavor is None:
+                raise error.NotFoundError(
+                    'Flavor not found: {0}'.format(flavor_id))
+
+        return flavor
+
+    def cached_stack(self, stack_id):
+        """Return a stack if it is cached (and not expired), or `None`"""
+        with self._lock:
+            stack, fetched_at = self._stacks.get(stack_id, (None, None))
+            return None if self._expired(fetched_at) else stack
+
+    def stack(self, stack_id):
+        """
+        Return a stack by ID, fetching it if necessary
+
+        :returns: :class:`~lavaclient.api.response.StackDetail`
+        """
+        stack = self.cached_stack(stack_id)
+        if stack is None:
+            LOG.debug('Fetching stack %s', stack_id)
+            stack = self._client.stacks.get(stack_id)
+
+        return stack
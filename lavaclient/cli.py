@@ -11,16 +11,22 @@
 #    under the License.
 
 import argparse
+import cProfile
 import six
 import sys
 import getpass
 import logging
 import os
+import time
 
 from lavaclient._version import __version__
 from lavaclient.client import Lava
+from lavaclient.deadlines import deadline
 from lavaclient.error import LavaError
-from lavaclient.util import get_function_arguments, first_exists
+from lavaclient.store import Store, DEFAULT_MAX_AGE
+from lavaclient.tracing import Tracer, FORMATS as TRACE_FORMATS
+from lavaclient.util import (get_function_arguments, first_exists,
+                             output_format, write_records, OUTPUT_FORMATS)
 from lavaclient.log import NullHandler
 from lavaclient.api import (clusters, limits, flavors, stacks, distros,
                             scripts, nodes, credentials)
@@ -56,6 +62,11 @@ def create_client(args):
         else:
             password = getpass.getpass('Password for {0}: '.format(user))
 
+    store_path = first_exists(args.store, os.environ.get('LAVA_STORE'))
+    store = None
+    if store_path:
+        store = Store(store_path, max_age=args.store_max_age)
+
     try:
         return Lava(
             user,
@@ -75,6 +86,10 @@ def create_client(args):
                                   os.environ.get('LAVA2_API_URL'),
                                   os.environ.get('LAVA_API_URL')),
             verify_ssl=args.verify_ssl,
+            store=store,
+            stale_while_revalidate=args.stale_while_revalidate,
+            tracer=Tracer() if args.trace or args.timings else None,
+            timeout=args.request_timeout,
             _cli_args=args)
     except LavaError as exc:
         six.print_('Error during authentication: {0}'.format(exc),
@@ -103,7 +118,11 @@ def print_action(func, *args, **kwargs):
         func.display(func.__self__, *args, **kwargs)
     else:
         result = func(*args, **kwargs)
-        if result is not None:
+
+        fmt = output_format(getattr(func, '__self__', None))
+        if fmt != 'table':
+            write_records(result, fmt)
+        elif result is not None:
             six.print_(result)
 
 
@@ -144,6 +163,80 @@ def execute_command(client, args):
     action = getattr(getattr(client, resource), method)
 
     call_action(action, args)
+    report_stale(client)
+
+
+def report_stale(client):
+    """
+    Warn about any output that came from stale stored data, then wait for
+    that data to be refreshed in the background, warning about any that
+    could not be
+    """
+    now = time.time()
+    for path, fetched_at in sorted(client.served_stale.items()):
+        age = 'unknown' if not fetched_at else '{0:.0f}s'.format(
+            now - fetched_at)
+        six.print_('Warning: /{0} is stale stored data (age: {1})'.format(
+            path, age), file=sys.stderr)
+
+    for path in client.wait_for_revalidation():
+        six.print_('Warning: unable to refresh /{0}; stored data remains '
+                   'stale'.format(path), file=sys.stderr)
+
+
+def export_trace(client, args):
+    """Write the spans recorded by the client's tracer to the --trace file"""
+    if not args.trace or client.tracer is None:
+        return
+
+    try:
+        client.tracer.export(args.trace, fmt=args.trace_format)
+    except (IOError, OSError) as exc:
+        six.print_('Warning: unable to write trace: {0}'.format(exc),
+                   file=sys.stderr)
+
+
+def process_age():
+    """Number of seconds since the current process started, or `None` if it
+    can not be determined (only Linux is supported)"""
+    try:
+        with open('/proc/self/stat') as handle:
+            # The command name may contain spaces, but it ends with ')'
+            fields = handle.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as handle:
+            uptime = float(handle.read().split()[0])
+
+        return uptime - float(fields[19]) / os.sysconf('SC_CLK_TCK')
+    except (IOError, OSError, IndexError, ValueError, AttributeError):
+        return None
+
+
+def print_timings(tracer, phases, started):
+    """
+    Print a breakdown of wall time to stderr: the given phases, as (name,
+    seconds), followed by each span recorded by the tracer, indented
+    according to nesting
+    """
+    rows = list(phases)
+
+    depths = {}
+    for span in sorted(tracer.spans, key=lambda span: span.start):
+        depth = depths.get(span.parent_id, -1) + 1
+        depths[span.span_id] = depth
+
+        name = span.name
+        if 'status_code' in span.attributes:
+            name += ' ({0})'.format(span.attributes['status_code'])
+
+        rows.append(('  ' * depth + name, span.duration))
+
+    rows.append(('total', time.time() - started))
+
+    width = max(len(name) for name, _ in rows)
+    six.print_('Timings:', file=sys.stderr)
+    for name, seconds in rows:
+        six.print_('  {0} {1:8.3f}s'.format(name.ljust(width), seconds),
+                   file=sys.stderr)
 
 
 def initialize_logging(args):  # pragma: nocover
@@ -204,11 +297,59 @@ def parse_argv():
         general.add_argument('--insecure', '-k', action='store_false',
                              dest='verify_ssl',
                              help='Turn of SSL cert validation')
+        general.add_argument('--store', metavar='<path>',
+                             help='SQLite file in which to keep a local copy '
+                                  'of clusters, nodes, stacks, flavors, and '
+                                  'scripts; list and get commands use it '
+                                  'while its data is fresh')
+        general.add_argument('--store-max-age', type=int, metavar='<seconds>',
+                             help='Number of seconds for which stored data is '
+                                  'fresh (default: {0})'.format(
+                                      DEFAULT_MAX_AGE))
+        general.add_argument('--format', choices=OUTPUT_FORMATS,
+                             help='Output format (default: table). json and '
+                                  'jsonl include every attribute; csv and tsv '
+                                  'have the same columns as the table')
+        general.add_argument('--stale-while-revalidate', action='store_true',
+                             help='Show stored data immediately even if it is '
+                                  'no longer fresh, and refresh it in the '
+                                  'background; requires --store')
+        general.add_argument('--trace', metavar='<path>',
+                             help='Record the time spent in API calls, HTTP '
+                                  'requests, authentication, and SSH commands '
+                                  'and write it to this JSON file')
+        general.add_argument('--trace-format', choices=TRACE_FORMATS,
+                             help='Format of the --trace file: chrome (for '
+                                  'chrome://tracing or Perfetto; default) or '
+                                  'otlp (OpenTelemetry)')
+        general.add_argument('--timings', action='store_true',
+                             help='Print a breakdown of wall time, including '
+                                  'each HTTP request, to stderr')
+        general.add_argument('--profile', metavar='<path>',
+                             help='Profile the command and write the pstats '
+                                  'output to this file')
+        general.add_argument('--request-timeout', type=float,
+                             metavar='<seconds>',
+                             help='Timeout for connecting to the API and for '
+                                  'each response (default: no timeout)')
+        general.add_argument('--deadline', type=float, metavar='<seconds>',
+                             help='Maximum time for the whole command, '
+                                  'including requests, retries, waiting, and '
+                                  'SSH (default: no limit)')
 
     # Ugly hack; add defaults only to main parser so as to not override values
     # via child parsers
     parser.set_defaults(enable_cli=True,
-                        verify_ssl=not os.environ.get('LAVA_INSECURE'))
+                        verify_ssl=not os.environ.get('LAVA_INSECURE'),
+                        store_max_age=DEFAULT_MAX_AGE,
+                        stale_while_revalidate=False,
+                        format='table',
+                        trace=None,
+                        trace_format=TRACE_FORMATS[0],
+                        timings=False,
+                        profile=None,
+                        request_timeout=None,
+                        deadline=None)
 
     subparsers = parser.add_subparsers(title='Commands')
 
@@ -234,11 +375,25 @@ def parse_argv():
 
 
 def main():
+    started = time.time()
     args = parse_argv()
     if args.version:
         six.print_('lavaclient version ' + __version__)
         sys.exit(0)
 
+    phases = [('argparse', time.time() - started)]
+    if args.timings:
+        startup = process_age()
+        if startup is not None:
+            started -= startup - phases[0][1]
+            phases.insert(0, ('startup and imports',
+                              startup - phases[0][1]))
+
+    profiler = None
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
     initialize_logging(args)
 
     try:
@@ -248,14 +403,27 @@ def main():
         six.print_('ERROR: {0}'.format(exc), file=sys.stderr)
         sys.exit(1)
 
+    if args.timings and client.tracer is None:
+        client.tracer = Tracer()
+
     try:
-        execute_command(client, args)
+        with deadline(args.deadline):
+            execute_command(client, args)
     except Exception as exc:
         LOG.debug('Error while executing command', exc_info=exc)
         six.print_('ERROR: {0}'.format(exc), file=sys.stderr)
         sys.exit(1)
     except KeyboardInterrupt:
         pass
+    finally:
+        export_trace(client, args)
+
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+
+        if args.timings:
+            print_timings(client.tracer, phases, started)
 
 
 if __name__ == '__main__':  # pragma: nocover
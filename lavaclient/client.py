@@ -14,20 +14,32 @@
 Lava client setup and authentication
 """
 
+import hashlib
+import json
 import logging
 import six
 import re
+import time
 from keystoneclient import exceptions as ks_error
 import uuid
 import requests
+from contextlib import contextmanager
 from threading import Lock
 
 from lavaclient._version import __version__
 from lavaclient import keystone
+from lavaclient import breaker
+from lavaclient import deadlines
 from lavaclient import util
 from lavaclient import constants
 from lavaclient import error
+from lavaclient import tracing
+from lavaclient.catalog import Catalog
+from lavaclient.concurrency import background, SingleFlight
+from lavaclient.hooks import (Hooks, BEFORE_REQUEST, AFTER_RESPONSE,
+                              ON_RETRY, ON_REAUTH, ON_ERROR)
 from lavaclient.log import NullHandler
+from lavaclient.metrics import endpoint as path_endpoint
 from lavaclient.api import (clusters, limits, flavors, stacks, distros,
                             workloads, scripts, nodes, credentials)
 
@@ -36,10 +48,41 @@ LOG = logging.getLogger(__name__)
 LOG.addHandler(NullHandler())
 
 
+def _request_bytes(kwargs):
+    """Size of the body of a request, given the keyword arguments to
+    requests.request"""
+    if kwargs.get('json') is not None:
+        return len(json.dumps(kwargs['json']))
+
+    data = kwargs.get('data')
+    return len(data) if isinstance(data, (six.binary_type,
+                                          six.text_type)) else 0
+
+
+def _response_bytes(resp, kwargs):
+    """Size of the body of a response, or `None` if it is streamed and its
+    length is unknown"""
+    if not kwargs.get('stream'):
+        return len(resp.content or b'')
+
+    try:
+        return int(resp.headers['Content-Length'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+@contextmanager
+def _unguarded():
+    yield None
+
+
 class Lava(object):
     """
     Lava(username, region=None, password=None, token=None, api_key=None, \
-auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
+auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None, store=None, \
+stale_while_revalidate=False, hooks=None, \
+tracer=None, retry_policy=None, rate_limiter=None, \
+circuit_breaker=None, timeout=None, session=None, token_cache=None)
 
     Cloud Big Data API client. Creating an instance will automatically attempt
     to authenticate.
@@ -54,6 +97,48 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
     :param tenant_id: Rackspace tenant ID
     :param endpoint: Cloud Big Data endpoint URL; usually discovered
                      automatically with a valid `region`
+    :param store: :class:`~lavaclient.store.Store` in which to keep a local
+                  copy of clusters, nodes, stacks, flavors, and scripts. GET
+                  requests for these are served from the store while its
+                  data is fresh. If the API can not be reached, stored data is
+                  returned even if it is no longer fresh; see
+                  :func:`~lavaclient.util.is_stale`. Data is stored under the
+                  client's `endpoint`, so clients for different regions or
+                  tenants may share a store.
+    :param stale_while_revalidate: If `True`, serve stored data that is no
+                                   longer fresh immediately, and refresh it in
+                                   the background. Requires `store`.
+    :param hooks: :class:`~lavaclient.hooks.Hooks` called on client events;
+                  by default, a new, empty instance. Also available as the
+                  `hooks` attribute.
+    :param tracer: :class:`~lavaclient.tracing.Tracer` with which to record
+                   resource method calls, HTTP requests, keystone
+                   authentication, and SSH commands as spans. Also available
+                   as the `tracer` attribute.
+    :param retry_policy: :class:`~lavaclient.retries.RetryPolicy` for
+                         requests that fail with connection errors or
+                         transient error responses (e.g. 503). By default,
+                         requests are not retried.
+    :param rate_limiter: :class:`~lavaclient.ratelimit.RateLimiter` with which
+                         to pace requests, which may be shared with other
+                         clients; requests to each API endpoint are limited
+                         separately. By default, requests are not limited.
+    :param circuit_breaker: :class:`~lavaclient.breaker.CircuitBreaker` with
+                            which to fail requests immediately while the API
+                            or keystone is failing, which may be shared with
+                            other clients; circuits are kept separately for
+                            each API endpoint
+    :param timeout: Timeout in seconds for connecting to the API and for
+                    reading each response, or a (connect, read) tuple. By
+                    default, requests do not time out. See also
+                    :meth:`deadline`.
+    :param session: :class:`requests.Session` with which to make API
+                    requests, e.g. to share connection pools between
+                    clients
+    :param token_cache: :class:`~lavaclient.pool.TokenCache` shared with
+                        other clients, so that clients with the same
+                        credentials (e.g. for different regions)
+                        authenticate only once
     """
 
     def __init__(self,
@@ -66,6 +151,16 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
                  tenant_id=None,
                  endpoint=None,
                  verify_ssl=None,
+                 store=None,
+                 stale_while_revalidate=False,
+                 hooks=None,
+                 tracer=None,
+                 retry_policy=None,
+                 rate_limiter=None,
+                 circuit_breaker=None,
+                 timeout=None,
+                 session=None,
+                 token_cache=None,
                  _cli_args=None):
         if not any((api_key, password, token)):
             raise error.InvalidError("One of api_key, token, or password is "
@@ -89,6 +184,28 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
         self._tenant_id = tenant_id
         self._verify_ssl = verify_ssl
         self._token = token
+        self._store = store
+        self._stale_while_revalidate = stale_while_revalidate
+        self._revalidating = {}
+        self._revalidation_failed = set()
+        self._revalidating_lock = Lock()
+        self._in_flight = SingleFlight()
+        self._retry_policy = retry_policy
+        self._rate_limiter = rate_limiter
+        self._circuit_breaker = circuit_breaker
+        self._timeout = timeout
+        self._session = session
+        self._token_cache = token_cache
+
+        #: Functions called on client events; see :mod:`lavaclient.hooks`
+        self.hooks = Hooks() if hooks is None else hooks
+
+        #: :class:`~lavaclient.tracing.Tracer`, or `None` if not tracing
+        self.tracer = tracer
+
+        #: Paths for which stale stored data was served, mapped to the time at
+        #: which the data was stored
+        self.served_stale = {}
 
         if token and not endpoint:
             raise error.InvalidError(
@@ -99,12 +216,16 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
             if username is None:
                 raise error.InvalidError("Missing username")
 
-            self._auth = self._authenticate(auth_url,
-                                            api_key,
-                                            region,
-                                            username,
-                                            password,
-                                            tenant_id)
+            if token_cache is None:
+                self._auth = self._authenticate(auth_url,
+                                                api_key,
+                                                region,
+                                                username,
+                                                password,
+                                                tenant_id)
+            else:
+                self._auth = token_cache.get(self._token_cache_key(),
+                                             self._login)
 
         if endpoint is None:
             self._endpoint = self._get_endpoint(region, tenant_id)
@@ -121,6 +242,9 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
         self.nodes = nodes.Resource(self, cli_args=_cli_args)
         self.credentials = credentials.Resource(self, cli_args=_cli_args)
 
+        #: Flavor and stack cache; see :class:`~lavaclient.catalog.Catalog`
+        self.catalog = Catalog(self)
+
         # Workloads isn't terrible useful right now, but I don't want to delete
         # it entirely. Therefore, I'll just make it private for now.
         self._workloads = workloads.Resource(self, cli_args=_cli_args)
@@ -154,7 +278,9 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
             filters.update(attr='tenantId', filter_value=tenant_id)
 
         try:
-            return self._auth.service_catalog.url_for(**filters)
+            with tracing.span('keystone.endpoint', tracing.KEYSTONE,
+                              tracer=self.tracer, region=region):
+                return self._auth.service_catalog.url_for(**filters)
         except ks_error.EndpointNotFound as exc:
             LOG.critical('Error getting endpoint: {0}'.format(exc),
                          exc_info=exc)
@@ -164,13 +290,16 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
                       tenant_id):
         """Return keystone authentication client"""
         try:
-            return keystone.Client(
-                auth_url=util.strip_url(auth_url),
-                api_key=api_key,
-                password=password,
-                region=region,
-                username=username,
-                tenant_id=tenant_id)
+            with tracing.span('keystone.authenticate', tracing.KEYSTONE,
+                              tracer=self.tracer, auth_url=auth_url):
+                with self._guard(breaker.KEYSTONE, 'tokens', auth_url):
+                    return keystone.Client(
+                        auth_url=util.strip_url(auth_url),
+                        api_key=api_key,
+                        password=password,
+                        region=region,
+                        username=username,
+                        tenant_id=tenant_id)
         except ks_error.AuthorizationFailure as exc:
             LOG.critical('Unable to authenticate', exc_info=exc)
             raise error.AuthenticationError(
@@ -180,6 +309,22 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
             raise error.AuthorizationError(
                 'Authorization error: {0}'.format(exc))
 
+    def _login(self):
+        """Authenticate with the client's credentials"""
+        return self._authenticate(self._auth_url,
+                                  self._api_key,
+                                  self._region,
+                                  self._username,
+                                  self._password,
+                                  self._tenant_id)
+
+    def _token_cache_key(self):
+        """Key under which the client's authentication is shared by clients
+        with the same credentials"""
+        secret = self._api_key or self._password or ''
+        return (self._auth_url, self._username, self._tenant_id,
+                hashlib.sha256(secret.encode('utf-8')).hexdigest())
+
     def reauthenticate(self):
         """Reauthenticate with keystone, assuming our token is no longer
         valid"""
@@ -191,12 +336,21 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
             LOG.info('Reauthenticating via keystone')
 
             old_token = self.token
-            self._auth = self._authenticate(self._auth_url,
-                                            self._api_key,
-                                            self._region,
-                                            self._username,
-                                            self._password,
-                                            self._tenant_id)
+            start = time.time()
+            try:
+                if self._token_cache is None:
+                    self._auth = self._login()
+                else:
+                    # Another client may already have reauthenticated
+                    self._auth = self._token_cache.refresh(
+                        self._token_cache_key(), self._auth, self._login)
+            except error.LavaError as exc:
+                self.hooks.fire(ON_REAUTH, elapsed=time.time() - start,
+                                error=exc)
+                raise
+
+            self.hooks.fire(ON_REAUTH, elapsed=time.time() - start,
+                            error=None)
 
             if self.token == old_token:
                 LOG.warn('Reauthentication produced the same token')
@@ -213,6 +367,21 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
         :class:`Lava`"""
         return self._endpoint.rstrip('/')
 
+    def deadline(self, seconds=None, timeout=None):
+        """
+        Context manager that bounds the total time taken by everything done
+        within it, including requests, retries, polling (e.g.
+        :meth:`~lavaclient.api.clusters.Resource.wait`), and SSH commands,
+        raising :class:`~lavaclient.error.TimeoutError` when the time runs
+        out; see :mod:`lavaclient.deadlines`.
+
+        :param seconds: Number of seconds in which to finish, or `None` for no
+                        limit other than that of an enclosing deadline
+        :param timeout: Connect and read timeout for the requests made
+                        within it, overriding the client's `timeout`
+        """
+        return deadlines.deadline(seconds, timeout=timeout)
+
     ######################################################################
     # Request methods
     ######################################################################
@@ -241,9 +410,46 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
             'User-Agent': 'python-lavaclient {0}'.format(__version__),
         }
 
-    def _request(self, method, path, reauthenticate=True, **kwargs):
+    def _request(self, method, path, reauthenticate=True, use_store=True,
+                 coalesce=True, **kwargs):
         """Same as requests.request, but automatically injects
-        authentication headers into request and prepends endpoint to path"""
+        authentication headers into request and prepends endpoint to path.
+        If `stream` is `True`, return the response object without reading
+        the body.
+
+        If the client has a store and `use_store` is `True`, simple GET
+        requests are served from the store while its data is fresh, and their
+        responses are saved to it; other requests invalidate stored data for
+        the same collection.
+
+        Concurrent GET requests for the same path and parameters are
+        coalesced into a single request, unless `coalesce` is `False`. A
+        request that waited for another does not fail because the other's
+        deadline passed; see :class:`~lavaclient.concurrency.SingleFlight`."""
+        store = self._store if use_store else None
+        storable = (store is not None and method.upper() == 'GET' and
+                    not kwargs.get('params') and not kwargs.get('stream'))
+        if storable:
+            data = store.load(path, endpoint=self.endpoint)
+            if data is not None:
+                LOG.debug('Using stored data for %s', path)
+                return data
+
+            if self._stale_while_revalidate:
+                data = self._load_stale(store, path, invalidated=False)
+                if data is not None:
+                    self._revalidate(store, path)
+                    return data
+
+        if (coalesce and method.upper() == 'GET' and
+                not kwargs.get('stream')):
+            key = (path.strip('/'),
+                   repr(sorted(six.iteritems(kwargs.get('params') or {}))))
+            return self._in_flight.call(
+                key, self._request, method, path,
+                reauthenticate=reauthenticate, use_store=use_store,
+                coalesce=False, **kwargs)
+
         if self._verify_ssl is not None:
             kwargs['verify'] = kwargs.get('verify', self._verify_ssl)
 
@@ -252,37 +458,225 @@ auth_url=None, tenant_id=None, endpoint=None, verify_ssl=None)
         kwargs['headers'] = headers
 
         url = '{0}/{1}'.format(self.endpoint, path.lstrip('/'))
+        hook_path = path.strip('/')
+
+        start = time.time()
 
         try:
-            resp = requests.request(method, url, **kwargs)
-            resp.raise_for_status()
+            resp = self._send(method, hook_path, url, kwargs)
+        except (error.CircuitOpenError, error.TimeoutError) as exc:
+            data = self._load_stale(store, path) if storable else None
+            if data is not None:
+                return data
+
+            self._raise_request_error(method, hook_path, start, exc, None)
         except requests.exceptions.HTTPError as exc:
+            if storable and exc.response.status_code >= 500:
+                data = self._load_stale(store, path)
+                if data is not None:
+                    return data
+
             if exc.response.status_code != requests.codes.unauthorized:
                 try:
                     msg = exc.response.json()['fault']['message']
                 except (KeyError, ValueError):
                     msg = exc.response.text or str(exc)
 
-                six.raise_from(
+                self._raise_request_error(
+                    method, hook_path, start,
                     error.RequestError(msg, code=exc.response.status_code),
                     exc)
 
             if reauthenticate:
                 self.reauthenticate()
+                self.hooks.fire(ON_RETRY, method=method.upper(),
+                                path=hook_path, attempt=2, error=exc)
                 return self._request(method, path, reauthenticate=False,
+                                     use_store=use_store, coalesce=False,
                                      **kwargs)
 
             msg = '{0} /{1}: Unauthorized'.format(
                 method.upper(), path.lstrip('/'))
             LOG.critical(msg, exc_info=exc)
-            six.raise_from(error.AuthorizationError(msg), exc)
+            self._raise_request_error(method, hook_path, start,
+                                      error.AuthorizationError(msg), exc)
         except requests.exceptions.RequestException as exc:
+            data = self._load_stale(store, path) if storable else None
+            if data is not None:
+                return data
+
+            left = deadlines.remaining()
+            if left is not None and left <= 0:
+                self._raise_request_error(
+                    method, hook_path, start, error.TimeoutError(
+                        '{0} /{1}: Request did not complete before the '
+                        'deadline'.format(method.upper(), path.lstrip('/'))),
+                    exc)
+
             msg = '{0} /{1}: Error encountered during request'.format(
                 method.upper(), path.lstrip('/'))
             LOG.critical(msg, exc_info=exc)
-            six.raise_from(error.RequestError(msg), exc)
+            self._raise_request_error(method, hook_path, start,
+                                      error.RequestError(msg), exc)
+
+        if kwargs.get('stream'):
+            return resp
+
+        if store is not None and method.upper() != 'GET':
+            store.invalidate(path, endpoint=self.endpoint)
 
         try:
-            return resp.json()
+            data = resp.json()
         except ValueError:
             return resp
+
+        if storable:
+            store.save(path, data, endpoint=self.endpoint)
+
+        return data
+
+    def _send_once(self, method, path, url, kwargs):
+        """Send a single request, returning the response"""
+        self.hooks.fire(BEFORE_REQUEST, method=method, path=path, url=url,
+                        kwargs=kwargs)
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire(method, path, self.endpoint)
+
+        timeout = deadlines.request_timeout(
+            kwargs.get('timeout', self._timeout))
+        if timeout is not None:
+            kwargs = dict(kwargs, timeout=timeout)
+
+        start = time.time()
+
+        request_id = kwargs['headers']['Client-Request-ID']
+        with tracing.span('{0} /{1}'.format(method, path_endpoint(path)),
+                          tracing.HTTP, tracer=self.tracer, url=url,
+                          client_request_id=request_id) as span:
+            resp = (self._session or requests).request(method, url,
+                                                       **kwargs)
+            span.set('status_code', resp.status_code)
+
+        if self._rate_limiter is not None:
+            self._rate_limiter.update(method, path, resp, self.endpoint)
+
+        if AFTER_RESPONSE in self.hooks:
+            self.hooks.fire(AFTER_RESPONSE, method=method, path=path,
+                            response=resp, elapsed=time.time() - start,
+                            request_bytes=_request_bytes(kwargs),
+                            response_bytes=_response_bytes(resp, kwargs))
+
+        return resp
+
+    def _send(self, method, path, url, kwargs):
+        """
+        Send a request, retrying transient failures according to the client's
+        retry policy, and return the response. Raise the exception from the
+        last attempt if it failed, including
+        :class:`requests.exceptions.HTTPError` for error responses.
+        """
+        method = method.upper()
+        state = (None if self._retry_policy is None
+                 else self._retry_policy.begin(method))
+
+        while True:
+            try:
+                with self._guard(breaker.LAVA, path, self.endpoint):
+                    resp = self._send_once(method, path, url, kwargs)
+                    resp.raise_for_status()
+
+                return resp
+            except requests.exceptions.RequestException as exc:
+                delay = None if state is None else state.next_delay(exc)
+                if delay is None:
+                    raise
+
+                LOG.warning('%s /%s failed (%s); retrying in %.1fs', method,
+                            path, exc, delay)
+                self.hooks.fire(ON_RETRY, method=method, path=path,
+                                attempt=state.attempt, error=exc)
+
+            time.sleep(delay)
+
+    def _guard(self, service, path, base_url):
+        """Context manager around a request to service at base_url, which
+        fails immediately if the client's circuit breaker is open"""
+        if self._circuit_breaker is None:
+            return _unguarded()
+
+        return self._circuit_breaker.guard(service, path, hooks=self.hooks,
+                                           base_url=base_url)
+
+    def _raise_request_error(self, method, path, start, exc, cause):
+        """Fire the on_error hooks, then raise exc from cause"""
+        self.hooks.fire(ON_ERROR, method=method.upper(), path=path,
+                        elapsed=time.time() - start, error=exc)
+        six.raise_from(exc, cause)
+
+    def _load_stale(self, store, path, invalidated=True):
+        """Return stored data for a path regardless of its age, wrapped in
+        :class:`~lavaclient.util.StaleData`, or `None` if nothing was stored.
+        Data that was explicitly invalidated is only returned if `invalidated`
+        is `True`."""
+        fetched_at = store.fetched_at(path, endpoint=self.endpoint)
+        if fetched_at is None or (not fetched_at and not invalidated):
+            return None
+
+        data = store.load(path, fresh=False, endpoint=self.endpoint)
+        if data is None:
+            return None
+
+        LOG.warning('Using stale stored data for %s', path)
+        self.served_stale[path.strip('/')] = fetched_at
+        return util.StaleData(data, fetched_at)
+
+    def _revalidate(self, store, path):
+        """Refresh the stored data for a path in the background, unless a
+        refresh is already in progress"""
+        with self._revalidating_lock:
+            if path in self._revalidating:
+                return
+
+            def refresh():
+                try:
+                    store.save(path,
+                               self._request('GET', path, use_store=False),
+                               endpoint=self.endpoint)
+                except Exception as exc:
+                    self._revalidation_error(path, exc)
+                finally:
+                    with self._revalidating_lock:
+                        self._revalidating.pop(path, None)
+
+            self._revalidating[path] = background(refresh)
+
+    def wait_for_revalidation(self, timeout=None):
+        """
+        Wait for background refreshes of stale stored data to complete. Errors
+        encountered while refreshing are logged and ignored.
+
+        :param timeout: Maximum number of seconds to wait for each refresh
+        :returns: Sorted list of paths whose stored data could not be
+                  refreshed, and so remains stale
+        """
+        with self._revalidating_lock:
+            futures = list(self._revalidating.items())
+
+        for path, future in futures:
+            try:
+                future.result(timeout)
+            except Exception as exc:
+                self._revalidation_error(path, exc)
+
+        with self._revalidating_lock:
+            failed = sorted(self._revalidation_failed)
+            self._revalidation_failed.clear()
+
+        return failed
+
+    def _revalidation_error(self, path, exc):
+        """Log an error refreshing the stored data for a path, which remains
+        stale"""
+        LOG.debug('Unable to refresh stored data for %s', path, exc_info=exc)
+        with self._revalidating_lock:
+            self._revalidation_failed.add(path.strip('/'))
@@ -0,0 +1,189 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Helpers for running API calls in background threads
+"""
+
+import logging
+import sys
+import threading
+import six
+from six.moves import queue
+
+from lavaclient.log import NullHandler
+from lavaclient import deadlines
+from lavaclient import error
+from lavaclient import tracing
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+def propagate(func):
+    """Wrap func so that it runs in the current thread's tracing span and
+    under its deadline, e.g. in another thread"""
+    return deadlines.propagate(tracing.propagate(func))
+
+
+class Future(object):
+
+    """The eventual result of a call running in another thread"""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self._result = None
+        self._exc_info = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_exception(self, exc_info):
+        """Store the exception from `sys.exc_info()`, to be re-raised by
+        :meth:`result`"""
+        self._exc_info = exc_info
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """
+        Block until the call has completed, then return its result or re-raise
+        its exception.
+
+        :param timeout: Maximum number of seconds to wait
+        """
+        self._done.wait(timeout)
+        if not self._done.is_set():
+            raise error.TimeoutError('Background call did not complete in '
+                                     'time')
+
+        if self._exc_info is not None:
+            six.reraise(*self._exc_info)
+
+        return self._result
+
+
+def background(func, *args, **kwargs):
+    """
+    Call func(*args, **kwargs) in a daemon thread
+
+    :returns: :class:`Future`
+    """
+    future = Future()
+
+    @propagate
+    def run():
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception:
+            LOG.debug('Background call failed', exc_info=True)
+            future.set_exception(sys.exc_info())
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+
+    return future
+
+
+def map_bounded(func, items, parallelism):
+    """
+    Call func(item) for each item, running at most `parallelism` calls at a
+    time in daemon threads
+
+    :returns: List of :class:`Future` objects, in the same order as `items`
+    """
+    if parallelism < 1:
+        raise error.InvalidError('Parallelism must be a positive integer')
+
+    items = list(items)
+    futures = [Future() for _ in items]
+
+    work = queue.Queue()
+    for pair in zip(items, futures):
+        work.put(pair)
+
+    def run():
+        while True:
+            try:
+                item, future = work.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                future.set_result(func(item))
+            except Exception:
+                LOG.debug('Background call failed', exc_info=True)
+                future.set_exception(sys.exc_info())
+
+    for _ in range(min(parallelism, len(items))):
+        thread = threading.Thread(target=propagate(run))
+        thread.daemon = True
+        thread.start()
+
+    return futures
+
+
+class SingleFlight(object):
+
+    """
+    Coalesce concurrent calls that share a key: while a call is in progress,
+    other callers with the same key wait for it and receive its result (or
+    exception) instead of making their own call.
+
+    The exception is not shared if it is a
+    :class:`~lavaclient.error.TimeoutError` and the waiting caller's own
+    deadline (see :mod:`lavaclient.deadlines`) has not passed, since it may
+    come from a shorter deadline of the caller that made the call. The
+    waiting caller then makes its own call instead.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def call(self, key, func, *args, **kwargs):
+        """Call func(*args, **kwargs), unless a call with the same key is
+        already in progress, in which case return its result"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            LOG.debug('Waiting for in-flight call %r', key)
+            try:
+                return future.result(timeout=deadlines.remaining())
+            except error.TimeoutError:
+                left = deadlines.remaining()
+                if left is not None and left <= 0:
+                    raise
+
+            LOG.debug('In-flight call %r timed out; calling again', key)
+            return func(*args, **kwargs)
+
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException:
+            # Including e.g. KeyboardInterrupt, so that waiting callers are
+            # never left blocked
+            future.set_exception(sys.exc_info())
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+        return future.result()
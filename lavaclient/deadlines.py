@@ -0,0 +1,179 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Deadlines that bound the total time taken by an operation, including every
+request, retry, poll, and SSH command that it makes, e.g.
+
+    >>> with lava.deadline(600):
+    ...     lava.clusters.create(..., wait=True)
+
+A deadline applies to everything done on the current thread within it, and
+to background calls started from it (see :mod:`lavaclient.concurrency`).
+Nested deadlines can only shorten the time remaining. When a deadline has
+passed, operations raise :class:`~lavaclient.error.TimeoutError`.
+
+A deadline may also set the connect and read timeouts of the requests made
+within it, overriding the client's `timeout`.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from lavaclient.log import NullHandler
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+# Deadlines in effect on the current thread, innermost last
+_local = threading.local()
+
+
+def _stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+class Deadline(object):
+    """
+    Point in time by which an operation must finish
+
+    :param seconds: Number of seconds from now, or `None` for no limit
+    :param timeout: Request timeout in seconds, or a (connect, read) tuple,
+                    or `None`
+    :param parent: Enclosing :class:`Deadline`, which this one can not
+                   extend, and whose timeout it inherits if `timeout` is
+                   `None`
+    """
+
+    def __init__(self, seconds=None, timeout=None, parent=None):
+        self.expires = None if seconds is None else time.time() + seconds
+        self.timeout = timeout
+
+        if parent is not None:
+            if parent.expires is not None:
+                self.expires = (parent.expires if self.expires is None
+                                else min(self.expires, parent.expires))
+            if timeout is None:
+                self.timeout = parent.timeout
+
+    def remaining(self):
+        """Number of seconds left (which may be negative), or `None`"""
+        if self.expires is None:
+            return None
+
+        return self.expires - time.time()
+
+    def check(self, operation='Operation'):
+        """Raise :class:`~lavaclient.error.TimeoutError` if the deadline has
+        passed"""
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise error.TimeoutError(
+                '{0} did not complete before the deadline'.format(operation))
+
+
+@contextmanager
+def deadline(seconds=None, timeout=None):
+    """
+    Context manager that applies a :class:`Deadline`, which it yields, to
+    everything done within it on the current thread
+
+    :param seconds: Number of seconds in which to finish, or `None` to keep
+                    any enclosing deadline
+    :param timeout: Request timeout in seconds, or a (connect, read) tuple;
+                    by default, use the enclosing deadline's or the client's
+    """
+    stack = _stack()
+    current = Deadline(seconds, timeout,
+                       parent=stack[-1] if stack else None)
+    stack.append(current)
+    try:
+        yield current
+    finally:
+        stack.remove(current)
+
+
+def current():
+    """Innermost :class:`Deadline` on the current thread, or `None`"""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def remaining():
+    """Number of seconds left before the current deadline, or `None` if there
+    is none"""
+    current_deadline = current()
+    return None if current_deadline is None else current_deadline.remaining()
+
+
+def check(operation='Operation'):
+    """Raise :class:`~lavaclient.error.TimeoutError` if the current deadline
+    has passed"""
+    current_deadline = current()
+    if current_deadline is not None:
+        current_deadline.check(operation)
+
+
+def request_timeout(default=None):
+    """
+    Timeout to pass to :func:`requests.request`: that of the current deadline
+    if it sets one, otherwise default, with each value reduced to the time
+    remaining before the deadline. Raises
+    :class:`~lavaclient.error.TimeoutError` if the deadline has passed.
+    """
+    current_deadline = current()
+    if current_deadline is None:
+        return default
+
+    current_deadline.check('Request')
+    timeout = (default if current_deadline.timeout is None
+               else current_deadline.timeout)
+
+    left = current_deadline.remaining()
+    if left is None:
+        return timeout
+    elif timeout is None:
+        return left
+    elif isinstance(timeout, tuple):
+        return tuple(left if value is None else min(value, left)
+                     for value in timeout)
+
+    return min(timeout, left)
+
+
+def propagate(func):
+    """Wrap func so that it runs under the current thread's deadline, e.g. in
+    another thread"""
+    current_deadline = current()
+    if current_deadline is None:
+        return func
+
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        stack = _stack()
+        stack.append(current_deadline)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stack.remove(current_deadline)
+
+    return wrapped
@@ -22,6 +22,11 @@ class InvalidError(LavaError):
     pass
 
 
+class QuotaError(InvalidError):
+    """The request would exceed the tenant's quota"""
+    pass
+
+
 class AuthenticationError(LavaError):
     pass
 
@@ -62,3 +67,14 @@ class NotFoundError(LavaError):
 class ProxyError(LavaError):
     """Error in SOCKS proxy over SSH"""
     pass
+
+
+class CircuitOpenError(RequestError):
+    """A request was not sent because too many recent requests to the same
+    endpoint failed; see :mod:`lavaclient.breaker`"""
+
+    def __init__(self, msg, service=None, endpoint=None, retry_in=None):
+        super(CircuitOpenError, self).__init__(msg)
+        self.service = service
+        self.endpoint = endpoint
+        self.retry_in = retry_in
@@ -0,0 +1,148 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Keep a local snapshot of every cluster in a tenant up to date, refetching
+details only for clusters that have changed, e.g.
+
+    >>> fleet = FleetSync(lava)
+    >>> for delta in fleet.sync():
+    ...     print(delta.action, delta.cluster_id)
+    added 1a2b3c...
+"""
+
+import logging
+from collections import namedtuple
+from threading import Lock
+
+from lavaclient.inventory import ClusterInventory, NodeInventory
+from lavaclient.log import NullHandler
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+
+
+#: A change to a cluster between two syncs. `old` and `new` are
+#: :class:`ClusterState` objects, or `None` if the cluster was added or
+#: removed, respectively.
+Delta = namedtuple('Delta', ['action', 'cluster_id', 'old', 'new'])
+
+#: Snapshot of a single cluster: a
+#: :class:`~lavaclient.api.response.ClusterDetail` and its list of
+#: :class:`~lavaclient.api.response.Node` objects (`None` if nodes are not
+#: being synced)
+ClusterState = namedtuple('ClusterState', ['cluster', 'nodes'])
+
+
+def _version(cluster):
+    """Value that changes whenever the cluster does"""
+    return (cluster.updated, cluster.status)
+
+
+class FleetSync(object):
+    """
+    Local snapshot of all clusters belonging to the client's tenant. Each
+    call to :meth:`sync` lists clusters once, then fetches details (and
+    nodes) only for clusters whose `updated` timestamp or status differs from
+    the previous sync.
+
+    The snapshot is also available as indexed inventories; see
+    :mod:`lavaclient.inventory`.
+
+    :param client: :class:`~lavaclient.client.Lava` instance
+    :param nodes: If `True`, also keep track of each cluster's nodes
+    """
+
+    def __init__(self, client, nodes=True):
+        self._client = client
+        self._sync_nodes = nodes
+        self._states = {}
+        self._versions = {}
+        self._lock = Lock()
+
+        self.clusters = ClusterInventory()
+        self.nodes = NodeInventory()
+
+    @property
+    def snapshot(self):
+        """`dict` of cluster ID to :class:`ClusterState`"""
+        return dict(self._states)
+
+    def _fetch(self, cluster_id):
+        """Return the current :class:`ClusterState`, or `None` if the
+        cluster no longer exists"""
+        try:
+            cluster = self._client.clusters.get(cluster_id)
+            nodes = (self._client.nodes.list(cluster_id)
+                     if self._sync_nodes else None)
+        except error.RequestError as exc:
+            if exc.code == 404:
+                return None
+            raise
+
+        return ClusterState(cluster, nodes)
+
+    def _remove(self, cluster_id):
+        old = self._states.pop(cluster_id, None)
+        self._versions.pop(cluster_id, None)
+        self.clusters.remove(cluster_id)
+        self.nodes.remove_cluster(cluster_id)
+
+        return Delta(REMOVED, cluster_id, old, None)
+
+    def sync(self):
+        """
+        Bring the snapshot up to date
+
+        :returns: List of :class:`Delta` objects, one for each cluster that
+                  was added, changed, or removed since the last sync
+        """
+        with self._lock:
+            deltas = []
+            current = set()
+
+            for summary in self._client.clusters.list():
+                current.add(summary.id)
+
+                version = _version(summary)
+                if self._versions.get(summary.id) == version:
+                    continue
+
+                state = self._fetch(summary.id)
+                if state is None:
+                    current.discard(summary.id)
+                    continue
+
+                old = self._states.get(summary.id)
+                self._states[summary.id] = state
+                self._versions[summary.id] = version
+                self.clusters.add(state.cluster)
+                if state.nodes is not None:
+                    self.nodes.update_cluster(summary.id, state.nodes)
+
+                deltas.append(Delta(ADDED if old is None else CHANGED,
+                                    summary.id, old, state))
+
+            for cluster_id in set(self._states) - current:
+                deltas.append(self._remove(cluster_id))
+
+            LOG.debug('Fleet sync: %d clusters, %d changes', len(current),
+                      len(deltas))
+
+            return deltas
@@ -0,0 +1,105 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Functions called by the client when it sends requests, receives responses,
+parses them, retries, reauthenticates, or encounters errors, e.g.
+
+    >>> def log_slow(method, path, elapsed, **kwargs):
+    ...     if elapsed > 1:
+    ...         print('{0} /{1} took {2:.1f}s'.format(method, path, elapsed))
+    >>> lava.hooks.register('after_response', log_slow)
+
+Hooks are called with keyword arguments only, and should accept (and ignore)
+arguments that they don't use, since more may be added in the future:
+
+- `before_request`: `method`, `path`, `url`, and `kwargs`, the keyword
+  arguments to :func:`requests.request`, which may be modified
+- `after_response`: `method`, `path`, `response`, `elapsed` (seconds),
+  `request_bytes`, and `response_bytes` (`None` for streamed responses
+  without a Content-Length)
+- `after_parse`: `response_class`, `elapsed`
+- `on_retry`: `method`, `path`, `attempt` (starting at 2), `error`
+- `on_reauth`: `elapsed`, and `error`, which is `None` unless
+  reauthentication failed
+- `on_error`: `error`, the exception about to be raised, plus `method`,
+  `path`, and `elapsed` for request errors, or `response_class` for
+  invalid responses
+- `on_circuit_change`: `service`, `endpoint`, `state`, `previous`, and
+  `base_url` (e.g. the client's API endpoint), when
+  a circuit breaker opens, closes, or becomes half-open; see
+  :mod:`lavaclient.breaker`
+
+Exceptions raised by hooks are logged and otherwise ignored.
+"""
+
+import logging
+from threading import Lock
+
+from lavaclient.log import NullHandler
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+BEFORE_REQUEST = 'before_request'
+AFTER_RESPONSE = 'after_response'
+AFTER_PARSE = 'after_parse'
+ON_RETRY = 'on_retry'
+ON_REAUTH = 'on_reauth'
+ON_ERROR = 'on_error'
+ON_CIRCUIT_CHANGE = 'on_circuit_change'
+EVENTS = frozenset([BEFORE_REQUEST, AFTER_RESPONSE, AFTER_PARSE, ON_RETRY,
+                    ON_REAUTH, ON_ERROR, ON_CIRCUIT_CHANGE])
+
+
+class Hooks(object):
+    """Registry of functions to be called for each client event"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._hooks = dict((event, ()) for event in EVENTS)
+
+    def _check_event(self, event):
+        if event not in EVENTS:
+            raise error.InvalidError(
+                'Invalid hook event: {0}; must be one of {1}'.format(
+                    event, ', '.join(sorted(EVENTS))))
+
+    def register(self, event, func):
+        """Call func for every occurrence of event"""
+        self._check_event(event)
+        with self._lock:
+            self._hooks[event] += (func,)
+
+    def unregister(self, event, func):
+        """Stop calling func for event; does nothing if it was not
+        registered"""
+        self._check_event(event)
+        with self._lock:
+            self._hooks[event] = tuple(
+                hook for hook in self._hooks[event] if hook != func)
+
+    def __contains__(self, event):
+        """Whether any functions are registered for event"""
+        return bool(self._hooks.get(event))
+
+    def fire(self, event, **kwargs):
+        """Call the functions registered for event with the given keyword
+        arguments"""
+        for func in self._hooks[event]:
+            try:
+                func(**kwargs)
+            except Exception as exc:
+                LOG.warning('Error in %s hook %r', event, func, exc_info=exc)
@@ -0,0 +1,502 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Indexed, in-memory collections of clusters and nodes that can be queried
+without scanning every object, e.g.
+
+    >>> inventory = lava.clusters.inventory()
+    >>> inventory.query(status='ACTIVE', name__prefix='etl-')
+    [Cluster(id='...', name='etl-nightly', ...)]
+
+    >>> inventory.refresh()  # Re-index only what changed
+"""
+
+import bisect
+import logging
+import operator
+import six
+
+from lavaclient.log import NullHandler
+from lavaclient.util import getattrs
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+# Query operators, e.g. created__gte=datetime(2015, 1, 1)
+COMPARISONS = {
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+}
+OPERATORS = frozenset(COMPARISONS).union(['prefix', 'in'])
+
+
+class Inventory(object):
+    """
+    Collection of response objects, keyed by `id`, with hash indexes for exact
+    lookups and sorted indexes for range and prefix lookups. Subclasses
+    declare which attributes to index.
+
+    Queries are given as keyword arguments, in which the key is an attribute
+    (or dotted path, see :func:`~lavaclient.util.getattrs`) optionally
+    followed by an operator:
+
+    - `attr=value`: equal to value
+    - `attr__in=values`: equal to any of values
+    - `attr__prefix=value`: starts with value
+    - `attr__gt`, `attr__gte`, `attr__lt`, `attr__lte`: range comparisons
+
+    Criteria on indexed attributes are answered from the indexes; any others
+    fall back to comparing each remaining candidate.
+
+    :param items: Initial items
+    :param loader: Function returning the current list of items; used by
+                   :meth:`refresh`
+    """
+
+    #: Attributes indexed by exact value
+    hash_indexes = ()
+
+    #: Attributes indexed in sorted order, supporting range/prefix queries
+    sorted_indexes = ()
+
+    def __init__(self, items=(), loader=None):
+        self._loader = loader
+        self._items = {}
+        self._hash = dict((attr, {}) for attr in self.hash_indexes)
+        self._sorted = dict((attr, []) for attr in self.sorted_indexes)
+
+        self.update(items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __contains__(self, item_id):
+        return item_id in self._items
+
+    def get(self, item_id, default=None):
+        """Return the item with the given ID"""
+        return self._items.get(item_id, default)
+
+    ######################################################################
+    # Indexing
+    ######################################################################
+
+    def _normalize(self, attr, value):
+        """Normalize an index key; applied to both items and queries"""
+        return value
+
+    def _keys(self, item, attr):
+        """Return the index keys for an item attribute"""
+        value = getattrs(item, attr)
+        if value is None:
+            return ()
+
+        return (self._normalize(attr, value),)
+
+    def _index(self, item_id, item, old=None):
+        """Add item to each index, replacing the keys of the old version of
+        the item. Indexes whose keys did not change are left alone."""
+        for attr, index in six.iteritems(self._hash):
+            keys = frozenset(self._keys(item, attr)) if item else frozenset()
+            old_keys = (frozenset(self._keys(old, attr)) if old
+                        else frozenset())
+
+            for key in old_keys - keys:
+                ids = index[key]
+                ids.discard(item_id)
+                if not ids:
+                    del index[key]
+
+            for key in keys - old_keys:
+                index.setdefault(key, set()).add(item_id)
+
+        for attr, entries in six.iteritems(self._sorted):
+            keys = frozenset(self._keys(item, attr)) if item else frozenset()
+            old_keys = (frozenset(self._keys(old, attr)) if old
+                        else frozenset())
+
+            for key in old_keys - keys:
+                pos = bisect.bisect_left(entries, (key, item_id))
+                if pos < len(entries) and entries[pos] == (key, item_id):
+                    del entries[pos]
+
+            for key in keys - old_keys:
+                bisect.insort(entries, (key, item_id))
+
+    def add(self, item):
+        """Add or replace a single item"""
+        old = self._items.get(item.id)
+        if old is item:
+            return
+
+        self._items[item.id] = item
+        self._index(item.id, item, old)
+
+    def remove(self, item_id):
+        """Remove an item by ID, if it exists"""
+        old = self._items.pop(item_id, None)
+        if old is not None:
+            self._index(item_id, None, old)
+
+    def update(self, items, replace=False):
+        """
+        Add or replace items, re-indexing only attributes whose values
+        changed.
+
+        :param items: Iterable of items
+        :param replace: If `True`, remove any existing items that are not in
+                        `items`
+        """
+        seen = set()
+        for item in items:
+            seen.add(item.id)
+            self.add(item)
+
+        if replace:
+            for item_id in set(self._items) - seen:
+                self.remove(item_id)
+
+    def refresh(self):
+        """Reload all items using the loader, replacing existing items"""
+        if self._loader is None:
+            raise error.InvalidError('Inventory has no loader')
+
+        self.update(self._loader(), replace=True)
+        return self
+
+    ######################################################################
+    # Queries
+    ######################################################################
+
+    def _sorted_range(self, attr, op, value):
+        """Return IDs matching a range or prefix condition"""
+        entries = self._sorted[attr]
+
+        if op == 'prefix':
+            ids = set()
+            pos = bisect.bisect_left(entries, (value,))
+            while pos < len(entries) and entries[pos][0].startswith(value):
+                ids.add(entries[pos][1])
+                pos += 1
+            return ids
+
+        start = bisect.bisect_left(entries, (value,))
+        end = start
+        while end < len(entries) and entries[end][0] == value:
+            end += 1
+
+        if op is None:
+            selected = entries[start:end]
+        elif op == 'gt':
+            selected = entries[end:]
+        elif op == 'gte':
+            selected = entries[start:]
+        elif op == 'lt':
+            selected = entries[:start]
+        else:
+            selected = entries[:end]
+
+        return set(item_id for _, item_id in selected)
+
+    def _lookup(self, attr, op, value):
+        """Return a set of matching IDs from an index, or `None` if the
+        condition is not indexed"""
+        if op is None and attr in self._hash:
+            return set(self._hash[attr].get(self._normalize(attr, value), ()))
+        elif op == 'in' and attr in self._hash:
+            index = self._hash[attr]
+            ids = set()
+            for item in value:
+                ids.update(index.get(self._normalize(attr, item), ()))
+            return ids
+        elif op != 'in' and attr in self._sorted:
+            return self._sorted_range(attr, op, self._normalize(attr, value))
+
+        return None
+
+    def _matches(self, item, attr, op, value):
+        """Evaluate a condition directly against an item"""
+        keys = self._keys(item, attr)
+
+        if op is None:
+            value = self._normalize(attr, value)
+            return any(key == value for key in keys)
+        elif op == 'in':
+            values = set(self._normalize(attr, val) for val in value)
+            return any(key in values for key in keys)
+        elif op == 'prefix':
+            value = self._normalize(attr, value)
+            return any(key.startswith(value) for key in keys)
+
+        compare = COMPARISONS[op]
+        value = self._normalize(attr, value)
+        return any(compare(key, value) for key in keys)
+
+    def _parse_criteria(self, criteria):
+        parsed = []
+        for key, value in six.iteritems(criteria):
+            # Nested attributes are separated by '__' as well, e.g.
+            # resource_limits__min_ram__gte=1024
+            parts = key.split('__')
+            op = parts.pop() if len(parts) > 1 else None
+            if op is not None and op not in OPERATORS:
+                parts.append(op)
+                op = None
+
+            parsed.append(('.'.join(parts), op, value))
+
+        return parsed
+
+    def query(self, **criteria):
+        """
+        Return a list of items matching all criteria. See :class:`Inventory`
+        for the query syntax.
+        """
+        return self.filter(None, **criteria)
+
+    def filter(self, predicate=None, **criteria):
+        """
+        Like :meth:`query`, but additionally filter the results using
+        `predicate`, a function that takes an item and returns `True` if it
+        should be included.
+        """
+        conditions = self._parse_criteria(criteria)
+
+        candidates = None
+        unindexed = []
+        for attr, op, value in conditions:
+            ids = self._lookup(attr, op, value)
+            if ids is None:
+                unindexed.append((attr, op, value))
+            elif candidates is None:
+                candidates = ids
+            else:
+                candidates &= ids
+
+            if candidates is not None and not candidates:
+                return []
+
+        if candidates is None:
+            items = self._items.values()
+        else:
+            items = (self._items[item_id] for item_id in candidates)
+
+        return [item for item in items
+                if all(self._matches(item, attr, op, value)
+                       for attr, op, value in unindexed) and
+                (predicate is None or predicate(item))]
+
+
+class ClusterInventory(Inventory):
+    """Inventory of :class:`~lavaclient.api.response.Cluster` objects"""
+
+    hash_indexes = ('status', 'stack_id')
+    sorted_indexes = ('name', 'created', 'updated')
+
+
+class NodeInventory(Inventory):
+    """
+    Inventory of :class:`~lavaclient.api.response.Node` objects, possibly
+    from more than one cluster. Node names are case-insensitive, and
+    `component` matches the name of any component installed on the node.
+    """
+
+    hash_indexes = ('cluster_id', 'name', 'node_group', 'status',
+                    'component')
+    sorted_indexes = ('created', 'updated')
+
+    def __init__(self, items=(), loader=None):
+        self._clusters = {}
+        super(NodeInventory, self).__init__(items, loader=loader)
+
+    def _normalize(self, attr, value):
+        if attr == 'name':
+            return value.lower()
+
+        return value
+
+    def _keys(self, item, attr):
+        if attr == 'cluster_id':
+            cluster_id = self._clusters.get(item.id)
+            return () if cluster_id is None else (cluster_id,)
+        elif attr == 'component':
+            return tuple(component['name'] for component in item.components
+                         if 'name' in component)
+
+        return super(NodeInventory, self)._keys(item, attr)
+
+    def refresh(self):
+        """Reload all nodes using the loader, which must return a list of
+        `(cluster_id, nodes)` pairs"""
+        if self._loader is None:
+            raise error.InvalidError('Inventory has no loader')
+
+        seen = set()
+        for cluster_id, nodes in self._loader():
+            seen.add(cluster_id)
+            self.update_cluster(cluster_id, nodes)
+
+        for cluster_id in set(self._hash['cluster_id']) - seen:
+            self.remove_cluster(cluster_id)
+
+        return self
+
+    def cluster_id(self, node_id):
+        """Return the ID of the cluster to which a node belongs, if known"""
+        return self._clusters.get(node_id)
+
+    def update_cluster(self, cluster_id, nodes):
+        """
+        Replace the nodes that belong to a cluster
+
+        :param cluster_id: Cluster ID
+        :param nodes: Current list of the cluster's nodes
+        """
+        node_ids = set()
+        for node in nodes:
+            node_ids.add(node.id)
+
+            old = self._items.get(node.id)
+            if old is not None and self._clusters.get(node.id) != cluster_id:
+                # Moving a node between clusters changes its cluster_id key
+                self.remove(node.id)
+
+            self._clusters[node.id] = cluster_id
+            self.add(node)
+
+        self.remove_cluster(cluster_id, keep=node_ids)
+
+    def remove_cluster(self, cluster_id, keep=()):
+        """Remove all nodes belonging to a cluster, except those in `keep`"""
+        stale = self._hash['cluster_id'].get(cluster_id, set()) - set(keep)
+        for node_id in stale:
+            self.remove(node_id)
+
+    def remove(self, item_id):
+        super(NodeInventory, self).remove(item_id)
+        self._clusters.pop(item_id, None)
+
+    def by_name(self, name):
+        """Return the first node with the given (case-insensitive) name, or
+        `None` if there is none"""
+        return next(iter(self.query(name=name)), None)
+
+
+class ClusterTopology(NodeInventory):
+    """
+    The nodes of a single cluster, indexed by (case-insensitive) name, node
+    group, component name, and component URI, e.g.
+
+        >>> topology = lava.clusters.topology(cluster_id)
+        >>> topology.component_node('ResourceManager').private_ip
+        '10.0.0.5'
+
+    :param cluster: :class:`~lavaclient.api.response.ClusterDetail`
+    :param nodes: List of the cluster's
+                  :class:`~lavaclient.api.response.Node` objects
+    """
+
+    hash_indexes = NodeInventory.hash_indexes + ('uri',)
+
+    def __init__(self, cluster, nodes):
+        self.cluster = cluster
+        self.nodes = list(nodes)
+        self._positions = dict((node.id, index)
+                               for index, node in enumerate(self.nodes))
+        self._uris = [component['uri'] for node in self.nodes
+                      for component in node.components
+                      if 'uri' in component]
+
+        super(ClusterTopology, self).__init__()
+        self.update_cluster(cluster.id, self.nodes)
+
+    def __repr__(self):
+        return 'ClusterTopology(cluster={0!r}, nodes={1})'.format(
+            self.cluster.id, len(self.nodes))
+
+    def _keys(self, item, attr):
+        if attr == 'uri':
+            return tuple(component['uri'] for component in item.components
+                         if 'uri' in component)
+
+        return super(ClusterTopology, self)._keys(item, attr)
+
+    def _all(self, attr, value):
+        """Nodes, in API order, whose index keys for attr include value"""
+        ids = self._hash[attr].get(self._normalize(attr, value), ())
+        return [self._items[node_id]
+                for node_id in sorted(ids, key=self._positions.get)]
+
+    def _first(self, attr, value):
+        ids = self._hash[attr].get(self._normalize(attr, value))
+        if not ids:
+            return None
+
+        return self._items[min(ids, key=self._positions.get)]
+
+    def node(self, name=None):
+        """
+        Return the ACTIVE node with the given name, or the first node if name
+        is `None`; raise :class:`~lavaclient.error.InvalidError` if there is
+        no such node
+        """
+        if name is None:
+            if not self.nodes:
+                raise error.InvalidError('Cluster has no nodes')
+
+            return self.nodes[0]
+
+        node = self._first('name', name)
+        if node is None:
+            raise error.InvalidError(
+                'Invalid node: {0}; available nodes are {1}'.format(
+                    name, ', '.join(node.name for node in self.nodes)))
+
+        if node.status.upper() != 'ACTIVE':
+            raise error.InvalidError(
+                'Node {0} must be ACTIVE, but is {1} instead'.format(
+                    name, node.status))
+
+        return node
+
+    def node_group(self, node_group):
+        """List of nodes in a node group"""
+        return self._all('node_group', node_group)
+
+    def component_nodes(self, component):
+        """List of nodes on which a component, e.g. `'DataNode'`, is
+        installed"""
+        return self._all('component', component)
+
+    def component_node(self, component):
+        """First node on which a component, e.g. `'ResourceManager'`, is
+        installed, or `None`"""
+        return self._first('component', component)
+
+    def uri_node(self, uri):
+        """Node on which the component with the given URI runs, or `None`"""
+        return self._first('uri', uri)
+
+    def uris(self, scheme=None):
+        """List of component URIs, in node order, optionally only those with
+        the given scheme (e.g. `'http'`, which includes `'https'`)"""
+        return [uri for uri in self._uris
+                if scheme is None or uri.startswith(scheme)]
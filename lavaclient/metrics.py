@@ -0,0 +1,369 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Request metrics collected from client hooks (see :mod:`lavaclient.hooks`),
+e.g.
+
+    >>> metrics = Metrics().attach(lava)
+    >>> lava.clusters.list()
+    >>> metrics.snapshot()['requests'][0]['endpoint']
+    'clusters'
+    >>> print(metrics.prometheus())
+    # HELP lavaclient_request_duration_seconds ...
+
+Requests are grouped by method and endpoint, which is the request path with
+IDs replaced by `{id}`, e.g. `clusters/{id}/nodes`; see :func:`endpoint`.
+"""
+
+import logging
+import six
+from bisect import bisect_left
+from threading import Lock
+
+from lavaclient.log import NullHandler
+from lavaclient import hooks
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+# Upper bounds, in seconds, of latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0)
+
+# Path segments that name API collections, rather than identify objects
+COLLECTIONS = frozenset([
+    'clusters', 'nodes', 'distros', 'flavors', 'limits', 'workloads',
+    'recommendations', 'credentials', 'cloud_files', 's3', 'ssh_keys',
+    'types', 'scripts', 'stacks', 'storagesize',
+])
+
+
+def endpoint(path):
+    """Request path with object IDs replaced by `{id}`, e.g.
+    `clusters/{id}/nodes`"""
+    return '/'.join(
+        segment if segment in COLLECTIONS else '{id}'
+        for segment in path.strip('/').split('/') if segment)
+
+
+class Histogram(object):
+    """Cumulative histogram of observed values, e.g. request latencies"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """List of (upper bound, number of values less than or equal to it),
+        ending with (`float('inf')`, total count)"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            result.append((bound, total))
+
+        result.append((float('inf'), self.count))
+        return result
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': [(bound, count) for bound, count in self.cumulative()],
+        }
+
+
+def _escape(value):
+    return six.text_type(value).replace('\\', '\\\\').replace(
+        '"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+
+    if not pairs:
+        return ''
+
+    return '{{{0}}}'.format(','.join(
+        '{0}="{1}"'.format(name, _escape(value)) for name, value in pairs))
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(float(bound))
+
+
+class Metrics(object):
+    """
+    Collects, for each method and endpoint:
+
+    - request latency histograms and counts by status code
+    - request and response body sizes
+    - retries and errors
+
+    as well as response parse time histograms for each response class,
+    keystone reauthentication counts and latency, and the state of each
+    circuit breaker circuit (see :mod:`lavaclient.breaker`).
+
+    :param buckets: Upper bounds, in seconds, of histogram buckets
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """Discard all collected metrics"""
+        with self._lock:
+            self._latency = {}
+            self._responses = {}
+            self._request_bytes = {}
+            self._response_bytes = {}
+            self._retries = {}
+            self._errors = {}
+            self._parse = {}
+            self._reauth = Histogram(self._buckets)
+            self._reauth_failures = 0
+            self._circuits = {}
+            self._circuit_changes = {}
+
+    def _handlers(self):
+        return ((hooks.AFTER_RESPONSE, self._after_response),
+                (hooks.AFTER_PARSE, self._after_parse),
+                (hooks.ON_RETRY, self._on_retry),
+                (hooks.ON_REAUTH, self._on_reauth),
+                (hooks.ON_ERROR, self._on_error),
+                (hooks.ON_CIRCUIT_CHANGE, self._on_circuit_change))
+
+    def attach(self, client):
+        """Start collecting metrics from a :class:`~lavaclient.client.Lava`
+        instance; returns self"""
+        for event, handler in self._handlers():
+            client.hooks.register(event, handler)
+
+        return self
+
+    def detach(self, client):
+        """Stop collecting metrics from a client"""
+        for event, handler in self._handlers():
+            client.hooks.unregister(event, handler)
+
+    def _histogram(self, histograms, key):
+        if key not in histograms:
+            histograms[key] = Histogram(self._buckets)
+
+        return histograms[key]
+
+    def _after_response(self, method, path, response, elapsed, request_bytes,
+                        response_bytes, **kwargs):
+        key = (method, endpoint(path))
+        with self._lock:
+            self._histogram(self._latency, key).observe(elapsed)
+
+            code_key = key + (response.status_code,)
+            self._responses[code_key] = self._responses.get(code_key, 0) + 1
+
+            self._request_bytes[key] = (self._request_bytes.get(key, 0) +
+                                        request_bytes)
+            if response_bytes is not None:
+                self._response_bytes[key] = (
+                    self._response_bytes.get(key, 0) + response_bytes)
+
+    def _after_parse(self, response_class, elapsed, **kwargs):
+        with self._lock:
+            self._histogram(self._parse,
+                            response_class.__name__).observe(elapsed)
+
+    def _on_retry(self, method, path, **kwargs):
+        key = (method, endpoint(path))
+        with self._lock:
+            self._retries[key] = self._retries.get(key, 0) + 1
+
+    def _on_reauth(self, elapsed, error=None, **kwargs):
+        with self._lock:
+            self._reauth.observe(elapsed)
+            if error is not None:
+                self._reauth_failures += 1
+
+    def _on_error(self, error, method=None, path=None, **kwargs):
+        key = (method or '', endpoint(path or ''), type(error).__name__)
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def _on_circuit_change(self, service, endpoint, state, **kwargs):
+        key = (service, endpoint)
+        with self._lock:
+            self._circuits[key] = state
+            change_key = key + (state,)
+            self._circuit_changes[change_key] = (
+                self._circuit_changes.get(change_key, 0) + 1)
+
+    def snapshot(self):
+        """
+        Return the collected metrics as a `dict`:
+
+        - `requests`: list of `dict` with keys `method`, `endpoint`,
+          `latency` (histogram), `responses` (`dict` of status code to count),
+          `request_bytes`, `response_bytes`, and `retries`
+        - `parse`: `dict` of response class name to histogram
+        - `reauth`: `dict` with keys `latency` (histogram) and `failures`
+        - `errors`: list of `dict` with keys `method`, `endpoint`, `error`
+          (exception class name), and `count`
+        - `circuits`: list of `dict` with keys `service`, `endpoint`, `state`
+          (`'closed'`, `'half_open'`, or `'open'`), and `changes`, a `dict`
+          of state to the number of times the circuit changed to it
+
+        Each histogram is a `dict` with keys `count`, `sum`, and `buckets`,
+        a list of (upper bound, cumulative count).
+        """
+        with self._lock:
+            keys = sorted(set(self._latency) | set(self._retries))
+            requests = []
+            for key in keys:
+                latency = (self._latency.get(key) or
+                           Histogram(self._buckets))
+                requests.append({
+                    'method': key[0],
+                    'endpoint': key[1],
+                    'latency': latency.snapshot(),
+                    'responses': dict(
+                        (code_key[2], count)
+                        for code_key, count in six.iteritems(self._responses)
+                        if code_key[:2] == key),
+                    'request_bytes': self._request_bytes.get(key, 0),
+                    'response_bytes': self._response_bytes.get(key, 0),
+                    'retries': self._retries.get(key, 0),
+                })
+
+            return {
+                'requests': requests,
+                'parse': dict(
+                    (name, histogram.snapshot())
+                    for name, histogram in six.iteritems(self._parse)),
+                'reauth': {
+                    'latency': self._reauth.snapshot(),
+                    'failures': self._reauth_failures,
+                },
+                'errors': [
+                    {'method': key[0], 'endpoint': key[1], 'error': key[2],
+                     'count': count}
+                    for key, count in sorted(six.iteritems(self._errors))
+                ],
+                'circuits': [
+                    {'service': key[0], 'endpoint': key[1], 'state': state,
+                     'changes': dict(
+                         (change_key[2], count) for change_key, count
+                         in six.iteritems(self._circuit_changes)
+                         if change_key[:2] == key)}
+                    for key, state in sorted(six.iteritems(self._circuits))
+                ],
+            }
+
+    def prometheus(self, prefix='lavaclient'):
+        """Return the collected metrics in the Prometheus text exposition
+        format"""
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append('# HELP {0}_{1} {2}'.format(prefix, name, help_text))
+            lines.append('# TYPE {0}_{1} {2}'.format(prefix, name, kind))
+
+        def histogram(name, label_names, histograms):
+            for key, hist in sorted(six.iteritems(histograms)):
+                for bound, count in hist.cumulative():
+                    le = ('le', _format_bound(bound))
+                    lines.append('{0}_{1}_bucket{2} {3}'.format(
+                        prefix, name, _labels(label_names, key, le), count))
+                lines.append('{0}_{1}_sum{2} {3!r}'.format(
+                    prefix, name, _labels(label_names, key), hist.sum))
+                lines.append('{0}_{1}_count{2} {3}'.format(
+                    prefix, name, _labels(label_names, key), hist.count))
+
+        def counter(name, label_names, counts):
+            for key, count in sorted(six.iteritems(counts)):
+                lines.append('{0}_{1}{2} {3}'.format(
+                    prefix, name, _labels(label_names, key), count))
+
+        request_labels = ('method', 'endpoint')
+        with self._lock:
+            header('request_duration_seconds', 'histogram',
+                   'Time from sending a request to receiving the response')
+            histogram('request_duration_seconds', request_labels,
+                      self._latency)
+
+            header('responses_total', 'counter',
+                   'Responses received, by status code')
+            counter('responses_total', request_labels + ('code',),
+                    self._responses)
+
+            header('request_bytes_total', 'counter',
+                   'Size of request bodies sent')
+            counter('request_bytes_total', request_labels,
+                    self._request_bytes)
+
+            header('response_bytes_total', 'counter',
+                   'Size of response bodies received')
+            counter('response_bytes_total', request_labels,
+                    self._response_bytes)
+
+            header('retries_total', 'counter', 'Requests retried')
+            counter('retries_total', request_labels, self._retries)
+
+            header('errors_total', 'counter', 'Errors raised, by type')
+            counter('errors_total', request_labels + ('error',),
+                    self._errors)
+
+            header('parse_duration_seconds', 'histogram',
+                   'Time spent parsing responses, by response class')
+            histogram('parse_duration_seconds', ('response',),
+                      dict(((name,), hist)
+                           for name, hist in six.iteritems(self._parse)))
+
+            header('reauthentication_duration_seconds', 'histogram',
+                   'Time spent reauthenticating with keystone')
+            histogram('reauthentication_duration_seconds', (),
+                      {(): self._reauth})
+
+            header('reauthentication_failures_total', 'counter',
+                   'Failed keystone reauthentications')
+            counter('reauthentication_failures_total', (),
+                    {(): self._reauth_failures})
+
+            circuit_labels = ('service', 'endpoint', 'state')
+            header('circuit_state', 'gauge',
+                   'Circuit breaker state; 1 for the current state')
+            counter('circuit_state', circuit_labels, dict(
+                (key + (state,), int(state == current))
+                for key, current in six.iteritems(self._circuits)
+                for state in ('closed', 'half_open', 'open')))
+
+            header('circuit_changes_total', 'counter',
+                   'Circuit breaker state changes, by new state')
+            counter('circuit_changes_total', circuit_labels,
+                    self._circuit_changes)
+
+        return '\n'.join(lines) + '\n'
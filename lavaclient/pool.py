@@ -0,0 +1,284 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Clients for many regions and tenants, queried concurrently, e.g.
+
+    >>> pool = LavaPool('username', api_key='...',
+    ...                 regions=['DFW', 'ORD', 'IAD', 'LON'],
+    ...                 tenant_ids=['123456', '654321'])
+    >>> result = pool.clusters.list()
+    >>> for target, cluster in result.items():
+    ...     print(target.region, target.tenant_id, cluster.name)
+
+Resource methods called through the pool run on every client at once, so a
+query across all regions takes about as long as the slowest of them. The
+clients share a connection pool and a :class:`TokenCache`, so each set of
+credentials authenticates with keystone only once.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from lavaclient.api.clusters import BatchResult
+from lavaclient.client import Lava
+from lavaclient.concurrency import map_bounded, SingleFlight
+from lavaclient.log import NullHandler
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+# Client attributes that are fanned out by the pool
+RESOURCES = ('clusters', 'limits', 'flavors', 'stacks', 'distros', 'scripts',
+             'nodes', 'credentials')
+
+
+#: Region and tenant of a client in a :class:`LavaPool`
+Target = namedtuple('Target', ['region', 'tenant_id'])
+
+
+class TokenCache(object):
+    """
+    Keystone authentications shared by clients with the same credentials.
+    Each key is authenticated only once, even when many clients are created
+    concurrently.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._auths = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key, authenticate):
+        """Return the authentication for key, calling authenticate() to
+        create it if there is none"""
+        with self._key_lock(key):
+            if key not in self._auths:
+                self._auths[key] = authenticate()
+
+            return self._auths[key]
+
+    def refresh(self, key, stale, authenticate):
+        """
+        Replace the authentication for key, which a client found to be stale,
+        by calling authenticate(). If another client has already replaced
+        it, return the replacement instead.
+        """
+        with self._key_lock(key):
+            current = self._auths.get(key)
+            if current is None or current is stale:
+                current = self._auths[key] = authenticate()
+
+            return current
+
+    def clear(self):
+        """Forget all authentications"""
+        with self._lock:
+            self._auths.clear()
+
+
+class PoolResult(BatchResult):
+    """
+    :class:`~lavaclient.api.clusters.BatchResult` of a call on every client
+    in a pool
+
+    :ivar succeeded: List of `(target, result)` pairs, where `target` is a
+                     :class:`Target`
+    :ivar failed: List of `(target, exception)` pairs
+    """
+
+    def __repr__(self):
+        return 'PoolResult(succeeded={0}, failed={1})'.format(
+            len(self.succeeded), len(self.failed))
+
+    def _record_item(self, target):
+        return dict(target._asdict())
+
+    def items(self):
+        """Iterate over `(target, item)` pairs, flattening results that are
+        lists, e.g. those of `clusters.list`"""
+        for target, result in self.succeeded:
+            if isinstance(result, list):
+                for item in result:
+                    yield target, item
+            else:
+                yield target, result
+
+
+class _FanOut(object):
+
+    """Calls the methods of a resource on every client in a pool"""
+
+    def __init__(self, pool, resource):
+        self._pool = pool
+        self._resource = resource
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._pool.map(
+                lambda client: getattr(getattr(client, self._resource),
+                                       name)(*args, **kwargs))
+
+        call.__name__ = name
+        return call
+
+    def __repr__(self):
+        return '<{0} on {1!r}>'.format(self._resource, self._pool)
+
+
+class LavaPool(object):
+    """
+    Clients for each combination of `regions` and `tenant_ids`, plus any
+    added with :meth:`add`. Clients are created (and authenticate) the first
+    time they are used.
+
+    Each resource of :class:`~lavaclient.client.Lava` (`clusters`, `limits`,
+    etc.) is also an attribute of the pool, whose methods are called on every
+    client concurrently, returning a :class:`PoolResult`.
+
+    :param username: Rackspace username
+    :param regions: Region identifiers, e.g. `['DFW', 'ORD']`
+    :param tenant_ids: Tenant IDs; by default, the tenant of the credentials
+    :param parallelism: Maximum number of clients called at a time; by
+                        default, all of them
+    :param session: :class:`requests.Session` shared by the clients; by
+                    default, a new one with a connection pool for each
+                    endpoint
+    :param token_cache: :class:`TokenCache` shared by the clients; by
+                        default, a new one
+
+    Other keyword arguments (e.g. `api_key`, `timeout`, `retry_policy`) are
+    passed to each :class:`~lavaclient.client.Lava`.
+    """
+
+    def __init__(self, username, regions=(), tenant_ids=(None,),
+                 parallelism=None, session=None, token_cache=None,
+                 **options):
+        if parallelism is not None and parallelism < 1:
+            raise error.InvalidError('Parallelism must be a positive integer')
+
+        self.parallelism = parallelism
+        self.session = session
+        self.token_cache = TokenCache() if token_cache is None else token_cache
+
+        self._username = username
+        self._options = options
+        self._targets = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._creating = SingleFlight()
+
+        for region in regions:
+            for tenant_id in tenant_ids:
+                self.add(region, tenant_id)
+
+        if self.session is None:
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=max(len(self._targets), 10),
+                                  pool_maxsize=max(parallelism or 0, 10))
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
+
+        for resource in RESOURCES:
+            setattr(self, resource, _FanOut(self, resource))
+
+    def __repr__(self):
+        return 'LavaPool({0})'.format(', '.join(
+            '{0}/{1}'.format(target.region, target.tenant_id)
+            for target in self.targets))
+
+    @property
+    def targets(self):
+        """List of :class:`Target` objects, in the order they were added"""
+        with self._lock:
+            return sorted(self._targets, key=self._targets.get)
+
+    def add(self, region, tenant_id=None, **options):
+        """
+        Add a client for a region and tenant, with keyword arguments to
+        :class:`~lavaclient.client.Lava` that override the pool's (e.g.
+        different credentials); returns its :class:`Target`
+        """
+        target = Target(region, tenant_id)
+        with self._lock:
+            if target in self._targets:
+                raise error.InvalidError(
+                    'Pool already has a client for {0}'.format(target))
+
+            self._targets[target] = (len(self._targets), options)
+
+        return target
+
+    def client(self, region, tenant_id=None):
+        """Return the :class:`~lavaclient.client.Lava` instance for a region
+        and tenant, creating it if necessary"""
+        target = Target(region, tenant_id)
+        with self._lock:
+            if target in self._clients:
+                return self._clients[target]
+            elif target not in self._targets:
+                raise error.InvalidError(
+                    'Pool has no client for {0}'.format(target))
+
+        return self._creating.call(target, self._create, target)
+
+    def _create(self, target):
+        options = dict(self._options, region=target.region,
+                       tenant_id=target.tenant_id, session=self.session,
+                       token_cache=self.token_cache)
+        options.update(self._targets[target][1])
+
+        LOG.debug('Creating client for %s', target)
+        client = Lava(options.pop('username', self._username), **options)
+        with self._lock:
+            self._clients[target] = client
+
+        return client
+
+    def map(self, func):
+        """
+        Call func(client) for every client concurrently
+
+        :returns: :class:`PoolResult`
+        """
+        targets = self.targets
+        futures = map_bounded(
+            lambda target: func(self.client(*target)), targets,
+            self.parallelism or max(len(targets), 1))
+
+        result = PoolResult()
+        for target, future in zip(targets, futures):
+            try:
+                result.succeeded.append((target, future.result()))
+            except Exception as exc:
+                LOG.error('Call failed for %s', target, exc_info=exc)
+                result.failed.append((target, exc))
+
+        return result
+
+    def close(self):
+        """Close the pool's connections"""
+        self.session.close()
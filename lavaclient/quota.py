@@ -0,0 +1,177 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Check locally whether planned cluster creates and resizes fit within the
+tenant's remaining quota, before sending them to the API, e.g.
+
+    >>> checker = QuotaChecker(lava)
+    >>> usage = checker.create_usage('stack_id', {'slave': {'count': 50}})
+    >>> checker.check(usage)
+    Traceback (most recent call last):
+      ...
+    QuotaError: Quota exceeded: node_count: 52 requested, 10 remaining
+"""
+
+import logging
+import six
+from collections import namedtuple
+
+from lavaclient.log import NullHandler
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+# Values of the check_quota option
+WARN = 'warn'
+ERROR = 'error'
+MODES = frozenset([WARN, ERROR])
+
+
+class Usage(namedtuple('Usage', ['node_count', 'ram', 'disk', 'vcpus'])):
+
+    """Resources used by a set of nodes, in the same units as
+    :class:`~lavaclient.api.response.AbsoluteLimits`"""
+
+    def __add__(self, other):
+        return Usage(*[mine + theirs for mine, theirs in zip(self, other)])
+
+    def __sub__(self, other):
+        return Usage(*[mine - theirs for mine, theirs in zip(self, other)])
+
+    @classmethod
+    def zero(cls):
+        return cls(0, 0, 0, 0)
+
+    @classmethod
+    def of(cls, flavor, count):
+        """Usage of `count` nodes of the given flavor"""
+        return cls(count, flavor.ram * count, flavor.disk * count,
+                   flavor.vcpus * count)
+
+
+def _by_id(node_groups):
+    return dict((group['id'], group) for group in node_groups or [])
+
+
+class QuotaChecker(object):
+    """
+    Estimates the resources used by cluster creates and resizes from cached
+    flavors and stacks (see :class:`~lavaclient.catalog.Catalog`), and
+    compares them against the tenant's remaining
+    :class:`~lavaclient.api.response.AbsoluteLimits`.
+
+    :param client: :class:`~lavaclient.client.Lava` instance
+    """
+
+    def __init__(self, client):
+        self._client = client
+        self._catalog = client.catalog
+
+    def create_usage(self, stack_id, node_groups=None):
+        """
+        Resources used by a new cluster. Node groups of the stack that are not
+        given, or for which `count` or `flavor_id` is not given, use the
+        stack defaults.
+
+        :param node_groups: Same as the argument to
+                            :meth:`~lavaclient.api.clusters.Resource.create`
+        :returns: :class:`Usage`
+        """
+        requested = _by_id(self._client.clusters._gather_node_groups(
+            node_groups))
+
+        usage = Usage.zero()
+        for group in self._catalog.stack(stack_id).node_groups:
+            spec = requested.get(group.id, {})
+            usage += Usage.of(
+                self._catalog.flavor(spec.get('flavor_id', group.flavor_id)),
+                int(spec.get('count', group.count)))
+
+        return usage
+
+    def resize_usage(self, cluster_id, node_groups):
+        """
+        Additional resources used by resizing a cluster, including any
+        change of flavor of its existing nodes; negative if the cluster
+        shrinks.
+
+        :param node_groups: Same as the argument to
+                            :meth:`~lavaclient.api.clusters.Resource.resize`
+        :returns: :class:`Usage`
+        """
+        requested = _by_id(self._client.clusters._gather_node_groups(
+            node_groups))
+        current = dict((group.id, group) for group in
+                       self._client.clusters.get(cluster_id).node_groups)
+
+        usage = Usage.zero()
+        for group_id, spec in six.iteritems(requested):
+            group = current.get(group_id)
+            if group is None:
+                raise error.InvalidError(
+                    'Invalid node group for cluster {0}: {1}'.format(
+                        cluster_id, group_id))
+
+            flavor = self._catalog.flavor(spec.get('flavor_id',
+                                                   group.flavor_id))
+            usage += (
+                Usage.of(flavor, int(spec.get('count', group.count))) -
+                Usage.of(self._catalog.flavor(group.flavor_id), group.count))
+
+        return usage
+
+    def violations(self, usage):
+        """Return a list of messages describing each limit that `usage`
+        exceeds"""
+        limits = self._client.limits.get()
+
+        messages = []
+        for name, requested in zip(Usage._fields, usage):
+            remaining = getattr(limits, name).remaining
+            if requested > remaining:
+                messages.append('{0}: {1} requested, {2} remaining'.format(
+                    name, requested, remaining))
+
+        return messages
+
+    def check(self, usage, mode=ERROR):
+        """
+        Compare usage against the remaining quota
+
+        :param usage: :class:`Usage`, or a list of them (e.g. for a batch of
+                      planned creates) to be checked together
+        :param mode: If `'error'`, raise
+                     :class:`~lavaclient.error.QuotaError` if the quota would
+                     be exceeded; if `'warn'`, only log a warning
+        :returns: List of messages describing each exceeded limit
+        """
+        if mode not in MODES:
+            raise error.InvalidError(
+                'Invalid quota check mode: {0}; must be one of {1}'.format(
+                    mode, ', '.join(sorted(MODES))))
+
+        if not isinstance(usage, Usage):
+            usage = sum(usage, Usage.zero())
+
+        messages = self.violations(usage)
+        if messages:
+            msg = 'Quota exceeded: {0}'.format('; '.join(messages))
+            if mode == ERROR:
+                raise error.QuotaError(msg)
+
+            LOG.warning(msg)
+
+        return messages
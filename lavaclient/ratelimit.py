@@ -0,0 +1,317 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Client-side rate limiting, so that many concurrent calls are spread out at a
+steady rate instead of bursting into server throttling, e.g.
+
+    >>> limiter = RateLimiter(rate=5)
+    >>> lava = Lava(..., rate_limiter=limiter)
+
+Each endpoint (see :func:`~lavaclient.metrics.endpoint`) of each API base
+URL (i.e. region and tenant) has separate token buckets for reads and
+writes. When the API responds with 429 Too Many
+Requests, the bucket's rate is halved and requests wait for any Retry-After
+period; the rate then recovers gradually as requests succeed (additive
+increase, multiplicative decrease).
+
+Buckets are shared by every thread using the limiter. To share them between
+processes as well, pass `shared_dir`; this requires :mod:`fcntl`, i.e. a
+POSIX system.
+"""
+
+import json
+import logging
+import os
+import re
+import time
+from threading import Lock
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from lavaclient.log import NullHandler
+from lavaclient.metrics import endpoint
+from lavaclient import deadlines
+from lavaclient.retries import retry_after
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+READ = 'read'
+WRITE = 'write'
+READ_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+def verb_class(method):
+    """'read' for methods without side effects, otherwise 'write'"""
+    return READ if method.upper() in READ_METHODS else WRITE
+
+
+def _block(state, wait):
+    # Tokens do not accumulate while the bucket is blocked
+    state['blocked_until'] = max(state['blocked_until'], time.time() + wait)
+    state['updated'] = max(state['updated'], state['blocked_until'])
+
+
+class TokenBucket(object):
+    """
+    Token bucket that refills at `rate` tokens per second, up to `burst`
+    tokens. The rate adapts to throttling; see :meth:`throttle` and
+    :meth:`recover`.
+
+    :param rate: Maximum number of tokens per second
+    :param burst: Maximum number of tokens that may accumulate; defaults to
+                  `rate`
+    :param min_rate: Rate below which throttling does not reduce the rate
+    :param decrease: Factor by which the rate is multiplied when throttled
+    :param increase: Tokens per second added to the rate after each
+                     successful request, until it is back to `rate`; defaults
+                     to 2% of `rate`
+    """
+
+    def __init__(self, rate, burst=None, min_rate=0.1, decrease=0.5,
+                 increase=None):
+        if rate <= 0:
+            raise error.InvalidError('Rate must be positive')
+
+        self.max_rate = float(rate)
+        self.burst = float(rate if burst is None else max(burst, 1))
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.decrease = decrease
+        self.increase = self.max_rate / 50 if increase is None else increase
+
+        self._lock = Lock()
+        self._state = self._initial_state()
+
+    def _initial_state(self):
+        return {'tokens': self.burst, 'updated': time.time(),
+                'rate': self.max_rate, 'blocked_until': 0}
+
+    def _update(self, func):
+        """Return func(state), holding the bucket's lock"""
+        with self._lock:
+            return func(self._state)
+
+    @property
+    def rate(self):
+        """Current rate in tokens per second"""
+        return self._update(lambda state: state['rate'])
+
+    def _take(self, state):
+        """Take a token if available and return 0, or return the number of
+        seconds until one will be"""
+        now = time.time()
+        if now < state['blocked_until']:
+            return state['blocked_until'] - now
+
+        capacity = max(1.0, min(self.burst, state['rate']))
+        elapsed = max(now - state['updated'], 0)
+        state['tokens'] = min(capacity,
+                              state['tokens'] + elapsed * state['rate'])
+        state['updated'] = now
+
+        if state['tokens'] >= 1:
+            state['tokens'] -= 1
+            return 0
+
+        return (1 - state['tokens']) / state['rate']
+
+    def acquire(self, timeout=None):
+        """
+        Wait until a token is available, then take it
+
+        :param timeout: Maximum number of seconds to wait; raise
+                        :class:`~lavaclient.error.TimeoutError` if exceeded
+        :returns: Number of seconds waited
+        """
+        start = time.time()
+        while True:
+            wait = self._update(self._take)
+            if not wait:
+                return time.time() - start
+
+            if timeout is not None and time.time() + wait - start > timeout:
+                raise error.TimeoutError('Timed out waiting for rate limit')
+
+            time.sleep(wait)
+
+    def throttle(self, wait=None):
+        """
+        Reduce the rate after the server throttled a request, and stop handing
+        out tokens for `wait` seconds (e.g. from a Retry-After header)
+        """
+        def update(state):
+            state['rate'] = max(self.min_rate, state['rate'] * self.decrease)
+            state['tokens'] = min(state['tokens'], 0)
+            if wait:
+                _block(state, wait)
+
+            return state['rate']
+
+        LOG.warning('Throttled; reducing rate to %.2f/s', self._update(update))
+
+    def block(self, wait):
+        """Stop handing out tokens for `wait` seconds, without changing the
+        rate"""
+        self._update(lambda state: _block(state, wait))
+
+    def recover(self):
+        """Increase the rate after a successful request, if it was reduced"""
+        def update(state):
+            state['rate'] = min(self.max_rate, state['rate'] + self.increase)
+
+        if self._state['rate'] < self.max_rate:
+            self._update(update)
+
+
+class FileTokenBucket(TokenBucket):
+    """
+    :class:`TokenBucket` whose state is kept in a file, so that it is shared
+    by every process using the same path. Requires :mod:`fcntl`.
+
+    :param path: File in which to keep the bucket's state; created if it
+                 does not exist
+    """
+
+    def __init__(self, path, rate, **kwargs):
+        if fcntl is None:
+            raise error.InvalidError(
+                'Sharing rate limits between processes is not supported on '
+                'this platform')
+
+        self.path = path
+        super(FileTokenBucket, self).__init__(rate, **kwargs)
+
+    def _update(self, func):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+
+            content = b''
+            while True:
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    break
+                content += chunk
+
+            try:
+                state = json.loads(content.decode('utf-8'))
+            except ValueError:
+                state = self._initial_state()
+
+            result = func(state)
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, json.dumps(state).encode('utf-8'))
+
+            return result
+        finally:
+            os.close(fd)
+
+    def recover(self):
+        # Reading the file is as expensive as updating it
+        def update(state):
+            if state['rate'] < self.max_rate:
+                state['rate'] = min(self.max_rate,
+                                    state['rate'] + self.increase)
+
+        self._update(update)
+
+
+class RateLimiter(object):
+    """
+    Token buckets for each base URL, endpoint, and verb class ('read' or
+    'write'), created as they are needed. A limiter may be shared by clients
+    of different regions and tenants, whose requests are limited separately.
+
+    :param rate: Default maximum number of requests per second for each
+                 bucket
+    :param rates: `dict` overriding `rate` for particular buckets, keyed by
+                  endpoint (e.g. `'clusters/{id}'`) or by (verb class,
+                  endpoint)
+    :param shared_dir: Directory in which to keep bucket state shared with
+                       other processes, or `None` to keep it in memory
+    :param timeout: Maximum number of seconds that a request waits for a
+                    token, or `None` to wait until the current deadline, if
+                    any (see :mod:`lavaclient.deadlines`)
+
+    Other keyword arguments are passed to each :class:`TokenBucket`.
+    """
+
+    def __init__(self, rate=10, rates=None, shared_dir=None, timeout=None,
+                 **bucket_options):
+        self.rate = rate
+        self.rates = dict(rates or {})
+        self.shared_dir = shared_dir
+        self.timeout = timeout
+        self._bucket_options = bucket_options
+        self._buckets = {}
+        self._lock = Lock()
+
+    def bucket(self, method, path, base_url=None):
+        """Return the :class:`TokenBucket` for a request to base_url (e.g. a
+        client's API endpoint)"""
+        rate_key = (verb_class(method), endpoint(path))
+        key = (base_url,) + rate_key
+        try:
+            return self._buckets[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            if key not in self._buckets:
+                rate = self.rates.get(rate_key,
+                                      self.rates.get(rate_key[1], self.rate))
+                if self.shared_dir is None:
+                    bucket = TokenBucket(rate, **self._bucket_options)
+                else:
+                    parts = rate_key if base_url is None else key
+                    name = re.sub(r'[^\w-]+', '_',
+                                  '-'.join(parts)).strip('_')
+                    bucket = FileTokenBucket(
+                        os.path.join(self.shared_dir, name + '.bucket'),
+                        rate, **self._bucket_options)
+
+                self._buckets[key] = bucket
+
+            return self._buckets[key]
+
+    def acquire(self, method, path, base_url=None):
+        """Wait until a request may be sent"""
+        timeout = self.timeout
+        left = deadlines.remaining()
+        if left is not None:
+            timeout = left if timeout is None else min(timeout, left)
+
+        waited = self.bucket(method, path, base_url).acquire(timeout=timeout)
+        if waited:
+            LOG.debug('Waited %.3fs to send %s /%s', waited, method, path)
+
+    def update(self, method, path, response, base_url=None):
+        """Adapt to a response: slow down on 429 Too Many Requests, honor
+        Retry-After headers, and otherwise recover the rate gradually"""
+        bucket = self.bucket(method, path, base_url)
+        wait = retry_after(response)
+
+        if response.status_code == 429:
+            bucket.throttle(wait)
+        elif wait:
+            bucket.block(wait)
+        elif response.status_code < 400:
+            bucket.recover()
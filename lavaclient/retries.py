@@ -0,0 +1,243 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Policies for retrying failed API requests, e.g.
+
+    >>> policy = RetryPolicy(attempts=5, deadline=60, budget=RetryBudget())
+    >>> lava = Lava(..., retry_policy=policy)
+
+Delays grow exponentially and are fully jittered by default, so that many
+clients that fail at the same time do not retry at the same time. A
+:class:`RetryBudget` shared between clients (or threads) caps retries at a
+fraction of requests, so that an outage does not multiply the load on the
+API.
+"""
+
+import logging
+import random
+import six
+import time
+from collections import deque
+from email.utils import parsedate_tz, mktime_tz
+from threading import Lock
+
+import requests
+
+from lavaclient.log import NullHandler
+from lavaclient import deadlines
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+# HTTP status codes that indicate a transient failure
+RETRY_STATUSES = frozenset([429, 502, 503, 504])
+
+# Status codes whose Retry-After header is honored
+RETRY_AFTER_STATUSES = frozenset([429, 503])
+
+# Request exceptions that indicate a transient failure
+RETRY_EXCEPTIONS = (requests.exceptions.ConnectionError,
+                    requests.exceptions.Timeout)
+
+# Methods that may be retried without side effects
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+
+def retry_after(response):
+    """Number of seconds to wait according to a response's Retry-After
+    header, which may be a number of seconds or an HTTP date, or `None`"""
+    value = (response.headers or {}).get('Retry-After')
+    if not isinstance(value, six.string_types):
+        return None
+
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        pass
+
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+
+    return max(mktime_tz(parsed) - time.time(), 0)
+
+
+class RetryBudget(object):
+    """
+    Limits retries to a fraction of recent requests, plus a minimum rate so
+    that clients making few requests can still retry. A single budget may be
+    shared by any number of threads and clients.
+
+    :param ratio: Retries allowed per request
+    :param min_per_second: Retries allowed per second regardless of the
+                           number of requests
+    :param window: Number of seconds over which requests and retries are
+                   counted
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, window=10.0):
+        if ratio < 0 or min_per_second < 0 or window <= 0:
+            raise error.InvalidError('Invalid retry budget')
+
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+
+        self._lock = Lock()
+        self._events = deque()
+        self._requests = 0
+        self._retries = 0
+
+    def _prune(self, now):
+        while self._events and self._events[0][0] <= now - self.window:
+            _, is_retry = self._events.popleft()
+            if is_retry:
+                self._retries -= 1
+            else:
+                self._requests -= 1
+
+    def deposit(self):
+        """Record a request"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            self._events.append((now, False))
+            self._requests += 1
+
+    def withdraw(self):
+        """Record a retry if the budget allows it; return whether it does"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+
+            allowed = (self.min_per_second * self.window +
+                       self.ratio * self._requests)
+            if self._retries >= allowed:
+                return False
+
+            self._events.append((now, True))
+            self._retries += 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    When and how long to wait before retrying a failed call. The delay before
+    retry `n` is `delay * backoff ** (n - 1)`, capped at `max_delay`; with
+    `jitter`, a random delay between zero and that is used instead ("full
+    jitter").
+
+    :param attempts: Maximum number of attempts, including the first
+    :param delay: Base delay in seconds
+    :param backoff: Multiplier applied to the delay after each retry
+    :param max_delay: Maximum delay in seconds, or `None`
+    :param jitter: If `True`, randomize delays
+    :param deadline: Number of seconds after the first attempt after which no
+                     more retries are made, or `None`
+    :param statuses: HTTP status codes to retry, or `None` to retry
+                     :class:`requests.exceptions.HTTPError` only if it is
+                     one of `exceptions`
+    :param exceptions: Exception classes to retry
+    :param methods: HTTP methods that may be retried, or `None` for any
+    :param retry_after: If `True`, wait at least as long as the Retry-After
+                        header of 429 and 503 responses asks
+    :param budget: :class:`RetryBudget` shared with other policies, or
+                   `None`
+    """
+
+    def __init__(self, attempts=3, delay=0.5, backoff=2, max_delay=30,
+                 jitter=True, deadline=None, statuses=RETRY_STATUSES,
+                 exceptions=RETRY_EXCEPTIONS, methods=IDEMPOTENT_METHODS,
+                 retry_after=True, budget=None):
+        self.attempts = max(attempts, 1)
+        self.delay = max(delay, 0)
+        self.backoff = max(backoff, 0)
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.statuses = None if statuses is None else frozenset(statuses)
+        self.exceptions = tuple(exceptions)
+        self.methods = (None if methods is None
+                        else frozenset(method.upper() for method in methods))
+        self.retry_after = retry_after
+        self.budget = budget
+
+    def backoff_delay(self, retry):
+        """Delay before retry number `retry` (starting at 1)"""
+        delay = self.delay * self.backoff ** (retry - 1)
+        if self.max_delay is not None:
+            delay = min(delay, self.max_delay)
+
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def retryable(self, exc):
+        """Whether an exception indicates a transient failure"""
+        response = getattr(exc, 'response', None)
+        if (self.statuses is not None and response is not None and
+                isinstance(exc, requests.exceptions.HTTPError)):
+            return response.status_code in self.statuses
+
+        return isinstance(exc, self.exceptions)
+
+    def begin(self, method=None):
+        """Start a call, returning a :class:`RetryState` with which to decide
+        whether to retry it"""
+        if self.budget is not None:
+            self.budget.deposit()
+
+        return RetryState(self, method)
+
+
+class RetryState(object):
+    """Attempts made so far at a single call; see :meth:`RetryPolicy.begin`"""
+
+    def __init__(self, policy, method=None):
+        self.policy = policy
+        self.method = None if method is None else method.upper()
+        self.attempt = 1
+        self.started = time.time()
+
+    def next_delay(self, exc):
+        """
+        Return the number of seconds to wait before retrying after exc, or
+        `None` if the call should not be retried
+        """
+        policy = self.policy
+        if self.attempt >= policy.attempts or not policy.retryable(exc):
+            return None
+        elif policy.methods is not None and self.method not in policy.methods:
+            return None
+
+        delay = policy.backoff_delay(self.attempt)
+
+        response = getattr(exc, 'response', None)
+        if (policy.retry_after and response is not None and
+                response.status_code in RETRY_AFTER_STATUSES):
+            delay = max(delay, retry_after(response) or 0)
+
+        left = deadlines.remaining()
+        if ((policy.deadline is not None and
+                time.time() + delay - self.started > policy.deadline) or
+                (left is not None and delay >= left)):
+            LOG.debug('Not retrying; deadline would be exceeded')
+            return None
+
+        if policy.budget is not None and not policy.budget.withdraw():
+            LOG.warning('Not retrying; retry budget exhausted')
+            return None
+
+        self.attempt += 1
+        return delay
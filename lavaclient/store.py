@@ -0,0 +1,652 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Persistent local copy of clusters, node groups, nodes, stacks, flavors, and
+scripts, stored in indexed SQLite tables.
+
+When passed to :class:`~lavaclient.client.Lava` via the `store` option,
+every successful GET of one of those resources is written to the store, and
+later GETs are served from disk for as long as the data is fresh. Stored data
+is kept separately for each API endpoint, which includes the region and
+tenant, so one store may be shared by several clients::
+
+    >>> from lavaclient.store import Store
+    >>> lava = Lava('username', ..., store=Store('~/.lava.db', max_age=300))
+
+The store can also be queried directly, e.g. by reporting jobs::
+
+    >>> store.refresh(lava)
+    >>> store.nodes(endpoint=lava.endpoint, node_group='slave',
+    ...             status='ACTIVE')
+    [Node(id='...', name='slave-1', ...), ...]
+"""
+
+import json
+import logging
+import re
+import sqlite3
+import time
+from threading import Lock
+
+from lavaclient.api.response import (Cluster, ClusterDetail, Node, NodeGroup,
+                                     Stack, StackDetail, Flavor, Script)
+from lavaclient.concurrency import background
+from lavaclient.log import NullHandler
+from lavaclient.util import expand
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+DEFAULT_MAX_AGE = 300
+
+
+# Stored as the database's user_version; stores with a different version are
+# emptied when opened
+SCHEMA_VERSION = 1
+
+TABLES = ('fetched', 'clusters', 'node_groups', 'nodes', 'stacks', 'flavors',
+          'scripts')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fetched (
+    endpoint TEXT NOT NULL,
+    path TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (endpoint, path)
+);
+
+CREATE TABLE IF NOT EXISTS clusters (
+    endpoint TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER,
+    name TEXT,
+    status TEXT,
+    stack_id TEXT,
+    created TEXT,
+    updated TEXT,
+    data TEXT NOT NULL,
+    detail TEXT,
+    PRIMARY KEY (endpoint, id)
+);
+CREATE INDEX IF NOT EXISTS clusters_status ON clusters (status);
+CREATE INDEX IF NOT EXISTS clusters_stack_id ON clusters (stack_id);
+CREATE INDEX IF NOT EXISTS clusters_name ON clusters (name);
+
+CREATE TABLE IF NOT EXISTS node_groups (
+    endpoint TEXT NOT NULL,
+    cluster_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    flavor_id TEXT,
+    count INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (endpoint, cluster_id, id)
+);
+
+CREATE TABLE IF NOT EXISTS nodes (
+    endpoint TEXT NOT NULL,
+    id TEXT NOT NULL,
+    cluster_id TEXT NOT NULL,
+    position INTEGER,
+    name TEXT,
+    node_group TEXT,
+    status TEXT,
+    flavor_id TEXT,
+    public_ip TEXT,
+    private_ip TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (endpoint, id)
+);
+CREATE INDEX IF NOT EXISTS nodes_cluster_id ON nodes (endpoint, cluster_id);
+CREATE INDEX IF NOT EXISTS nodes_node_group ON nodes (node_group);
+CREATE INDEX IF NOT EXISTS nodes_status ON nodes (status);
+CREATE INDEX IF NOT EXISTS nodes_name ON nodes (name);
+
+CREATE TABLE IF NOT EXISTS stacks (
+    endpoint TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER,
+    name TEXT,
+    distro TEXT,
+    data TEXT NOT NULL,
+    detail TEXT,
+    PRIMARY KEY (endpoint, id)
+);
+
+CREATE TABLE IF NOT EXISTS flavors (
+    endpoint TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER,
+    name TEXT,
+    ram INTEGER,
+    vcpus INTEGER,
+    disk INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (endpoint, id)
+);
+
+CREATE TABLE IF NOT EXISTS scripts (
+    endpoint TEXT NOT NULL,
+    id TEXT NOT NULL,
+    position INTEGER,
+    name TEXT,
+    type TEXT,
+    url TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (endpoint, id)
+);
+"""
+
+
+# API paths that can be stored, mapped to the name of the handler
+ROUTES = [
+    (re.compile(r'^clusters$'), 'clusters'),
+    (re.compile(r'^clusters/([^/]+)$'), 'cluster'),
+    (re.compile(r'^clusters/([^/]+)/nodes$'), 'nodes'),
+    (re.compile(r'^stacks$'), 'stacks'),
+    (re.compile(r'^stacks/([^/]+)$'), 'stack'),
+    (re.compile(r'^flavors$'), 'flavors'),
+    (re.compile(r'^scripts$'), 'scripts'),
+]
+
+# Columns extracted from each list item
+LIST_COLUMNS = {
+    'clusters': ('name', 'status', 'stack_id', 'created', 'updated'),
+    'stacks': ('name', 'distro'),
+    'flavors': ('name', 'ram', 'vcpus', 'disk'),
+    'scripts': ('name', 'type', 'url'),
+}
+
+# Tables that also store the detail of each item, as returned by a GET of
+# the item itself
+DETAIL_TABLES = frozenset(['clusters', 'stacks'])
+
+# Columns that may be used to filter queries
+FILTER_COLUMNS = {
+    'clusters': frozenset(['endpoint', 'id', 'name', 'status', 'stack_id']),
+    'nodes': frozenset(['endpoint', 'id', 'cluster_id', 'name', 'node_group',
+                        'status', 'flavor_id', 'public_ip', 'private_ip']),
+    'stacks': frozenset(['endpoint', 'id', 'name', 'distro']),
+    'flavors': frozenset(['endpoint', 'id', 'name', 'ram', 'vcpus', 'disk']),
+    'scripts': frozenset(['endpoint', 'id', 'name', 'type', 'url']),
+}
+
+# Paths fetched by Store.refresh, in addition to each cluster and its nodes
+CATALOG_PATHS = ('stacks', 'flavors', 'scripts')
+
+
+def normalize_path(path):
+    return path.strip('/')
+
+
+def _route(path):
+    """Return (handler name, path arguments) for a storable path"""
+    for regex, name in ROUTES:
+        match = regex.match(path)
+        if match:
+            return name, match.groups()
+
+    return None, None
+
+
+def _first_address(node, network):
+    try:
+        return node['addresses'][network][0]['addr']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def _column(value):
+    """Column value for a JSON field; anything other than a scalar is stored
+    as JSON text"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+
+    return value
+
+
+class Store(object):
+    """
+    SQLite-backed store for API data.
+
+    Every row belongs to an API endpoint (see
+    :attr:`~lavaclient.client.Lava.endpoint`), so that the data of different
+    regions and tenants is never mixed. Methods that read or write the data of
+    an API path take the `endpoint` it belongs to; query methods return rows
+    of every endpoint unless filtered by `endpoint`.
+
+    :param path: Database file path, or `':memory:'`
+    :param max_age: Number of seconds for which stored data is considered
+                    fresh
+    """
+
+    def __init__(self, path, max_age=DEFAULT_MAX_AGE):
+        self.path = path if path == ':memory:' else expand(path)
+        self.max_age = max_age
+
+        self._lock = Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # Stored data is only a cache, so data in another format is
+            # discarded rather than migrated
+            LOG.debug('Resetting store %s (version %s)', self.path, version)
+            for table in TABLES:
+                self._conn.execute('DROP TABLE IF EXISTS {0}'.format(table))
+            self._conn.execute('PRAGMA user_version = {0}'.format(
+                SCHEMA_VERSION))
+
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def execute(self, sql, params=()):
+        """Run a read-only SQL query against the store, returning all rows"""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    ######################################################################
+    # Freshness
+    ######################################################################
+
+    def fetched_at(self, path, endpoint=''):
+        """Return the time at which the data for an API path was stored, or
+        `None` if it never was"""
+        rows = self.execute(
+            'SELECT fetched_at FROM fetched WHERE endpoint = ? AND path = ?',
+            (endpoint, normalize_path(path)))
+        return rows[0][0] if rows else None
+
+    def is_fresh(self, path, endpoint=''):
+        """Return `True` if the data for an API path is younger than
+        `max_age`"""
+        fetched_at = self.fetched_at(path, endpoint)
+        return fetched_at is not None and (
+            time.time() - fetched_at < self.max_age)
+
+    def invalidate(self, path, endpoint=''):
+        """Mark stored data stale following a change to the given API path,
+        e.g. after a cluster has been resized. All paths belonging to the
+        same collection are invalidated."""
+        collection = normalize_path(path).split('/', 1)[0]
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'UPDATE fetched SET fetched_at = 0 '
+                    'WHERE endpoint = ? AND (path = ? OR path LIKE ?)',
+                    (endpoint, collection, collection + '/%'))
+
+    ######################################################################
+    # Storing API data
+    ######################################################################
+
+    def _mark_fetched(self, endpoint, path):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO fetched (endpoint, path, fetched_at) '
+            'VALUES (?, ?, ?)', (endpoint, path, time.time()))
+
+    def _upsert(self, table, key, values):
+        """Update the row identified by key (a dict) or insert it if it does
+        not exist, leaving unspecified columns untouched"""
+        where = ' AND '.join('{0} = ?'.format(col) for col in key)
+        assignments = ', '.join('{0} = ?'.format(col) for col in values)
+        cursor = self._conn.execute(
+            'UPDATE {0} SET {1} WHERE {2}'.format(table, assignments, where),
+            list(values.values()) + list(key.values()))
+
+        if cursor.rowcount == 0:
+            row = dict(key, **values)
+            self._conn.execute(
+                'INSERT INTO {0} ({1}) VALUES ({2})'.format(
+                    table, ', '.join(row), ', '.join('?' for _ in row)),
+                list(row.values()))
+
+    def _save_list(self, endpoint, table, items):
+        """Replace all of an endpoint's rows in a collection table"""
+        columns = LIST_COLUMNS[table]
+        details = {}
+        if table in DETAIL_TABLES:
+            details = dict(self._conn.execute(
+                'SELECT id, detail FROM {0} '
+                'WHERE endpoint = ? AND detail IS NOT NULL'.format(table),
+                (endpoint,)))
+
+        ids = []
+        for position, item in enumerate(items):
+            ids.append(item['id'])
+            values = dict((col, _column(item.get(col))) for col in columns)
+            values.update(position=position, data=json.dumps(item))
+
+            # Details that disagree with the list are older or newer than
+            # it; either way, they no longer match the row's columns
+            detail = details.get(item['id'])
+            if detail is not None and any(
+                    _column(json.loads(detail).get(col)) != values[col]
+                    for col in columns):
+                values.update(detail=None)
+                self._conn.execute(
+                    'DELETE FROM fetched WHERE endpoint = ? AND path = ?',
+                    (endpoint, '{0}/{1}'.format(table, item['id'])))
+
+            self._upsert(table, {'endpoint': endpoint, 'id': item['id']},
+                         values)
+
+        current = set(ids)
+        removed = [row[0] for row in self._conn.execute(
+            'SELECT id FROM {0} WHERE endpoint = ?'.format(table),
+            (endpoint,)) if row[0] not in current]
+        for item_id in removed:
+            self._conn.execute(
+                'DELETE FROM {0} WHERE endpoint = ? AND id = ?'.format(table),
+                (endpoint, item_id))
+            self._conn.execute(
+                'DELETE FROM fetched WHERE endpoint = ? AND path LIKE ?',
+                (endpoint, '{0}/{1}%'.format(table, item_id)))
+            if table == 'clusters':
+                self._conn.execute(
+                    'DELETE FROM node_groups '
+                    'WHERE endpoint = ? AND cluster_id = ?',
+                    (endpoint, item_id))
+                self._conn.execute(
+                    'DELETE FROM nodes WHERE endpoint = ? AND cluster_id = ?',
+                    (endpoint, item_id))
+
+    def _save_clusters(self, endpoint, data):
+        self._save_list(endpoint, 'clusters', data['clusters'])
+
+    def _save_cluster(self, endpoint, data, cluster_id):
+        cluster = data['cluster']
+        values = dict((col, _column(cluster.get(col)))
+                      for col in LIST_COLUMNS['clusters'])
+        values.update(detail=json.dumps(cluster))
+
+        exists = self._conn.execute(
+            'SELECT 1 FROM clusters WHERE endpoint = ? AND id = ?',
+            (endpoint, cluster_id)).fetchall()
+        if not exists:
+            values.update(data=json.dumps(cluster))
+
+        self._upsert('clusters', {'endpoint': endpoint, 'id': cluster_id},
+                     values)
+
+        self._conn.execute(
+            'DELETE FROM node_groups WHERE endpoint = ? AND cluster_id = ?',
+            (endpoint, cluster_id))
+        for group in cluster.get('node_groups') or []:
+            self._conn.execute(
+                'INSERT INTO node_groups (endpoint, cluster_id, id, '
+                'flavor_id, count, data) VALUES (?, ?, ?, ?, ?, ?)',
+                (endpoint, cluster_id, group['id'], group.get('flavor_id'),
+                 group.get('count'), json.dumps(group)))
+
+    def _save_nodes(self, endpoint, data, cluster_id):
+        self._conn.execute(
+            'DELETE FROM nodes WHERE endpoint = ? AND cluster_id = ?',
+            (endpoint, cluster_id))
+        for position, node in enumerate(data['nodes']):
+            self._conn.execute(
+                'INSERT OR REPLACE INTO nodes (endpoint, id, cluster_id, '
+                'position, name, node_group, status, flavor_id, public_ip, '
+                'private_ip, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (endpoint, node['id'], cluster_id, position, node.get('name'),
+                 _column(node.get('node_group')), node.get('status'),
+                 node.get('flavor_id'), _first_address(node, 'public'),
+                 _first_address(node, 'private'), json.dumps(node)))
+
+    def _save_stacks(self, endpoint, data):
+        self._save_list(endpoint, 'stacks', data['stacks'])
+
+    def _save_stack(self, endpoint, data, stack_id):
+        stack = data['stack']
+        values = dict((col, _column(stack.get(col)))
+                      for col in LIST_COLUMNS['stacks'])
+        values.update(detail=json.dumps(stack))
+
+        exists = self._conn.execute(
+            'SELECT 1 FROM stacks WHERE endpoint = ? AND id = ?',
+            (endpoint, stack_id)).fetchall()
+        if not exists:
+            values.update(data=json.dumps(stack))
+
+        self._upsert('stacks', {'endpoint': endpoint, 'id': stack_id}, values)
+
+    def _save_flavors(self, endpoint, data):
+        self._save_list(endpoint, 'flavors', data['flavors'])
+
+    def _save_scripts(self, endpoint, data):
+        self._save_list(endpoint, 'scripts', data['scripts'])
+
+    def save(self, path, data, endpoint=''):
+        """
+        Store the JSON response data for a GET request. Data for paths that
+        can not be stored is ignored.
+
+        :param endpoint: API endpoint the path belongs to
+        :returns: `True` if the data was stored
+        """
+        path = normalize_path(path)
+        name, args = _route(path)
+        if name is None or not isinstance(data, dict):
+            return False
+
+        with self._lock:
+            try:
+                with self._conn:
+                    getattr(self, '_save_' + name)(endpoint, data, *args)
+                    self._mark_fetched(endpoint, path)
+            except (KeyError, TypeError, sqlite3.Error) as exc:
+                LOG.warning('Unable to store %s', path, exc_info=exc)
+                return False
+
+        return True
+
+    ######################################################################
+    # Reading stored API data
+    ######################################################################
+
+    def _rows(self, sql, params=()):
+        return [json.loads(row[0]) for row in self.execute(sql, params)]
+
+    def _load_list(self, endpoint, table):
+        return {table: self._rows(
+            'SELECT data FROM {0} WHERE endpoint = ? '
+            'ORDER BY position'.format(table), (endpoint,))}
+
+    def _load_detail(self, endpoint, table, item_id):
+        """Return the stored detail of an item, of any endpoint if endpoint
+        is `None`, or `None`"""
+        sql = 'SELECT detail FROM {0} WHERE id = ? AND detail IS NOT NULL'
+        params = [item_id]
+        if endpoint is not None:
+            sql += ' AND endpoint = ?'
+            params.append(endpoint)
+
+        rows = self._rows(sql.format(table) + ' ORDER BY endpoint', params)
+        return rows[0] if rows else None
+
+    def _load_clusters(self, endpoint):
+        return self._load_list(endpoint, 'clusters')
+
+    def _load_cluster(self, endpoint, cluster_id):
+        cluster = self._load_detail(endpoint, 'clusters', cluster_id)
+        return None if cluster is None else {'cluster': cluster}
+
+    def _load_nodes(self, endpoint, cluster_id):
+        return {'nodes': self._rows(
+            'SELECT data FROM nodes WHERE endpoint = ? AND cluster_id = ? '
+            'ORDER BY position', (endpoint, cluster_id))}
+
+    def _load_stacks(self, endpoint):
+        return self._load_list(endpoint, 'stacks')
+
+    def _load_stack(self, endpoint, stack_id):
+        stack = self._load_detail(endpoint, 'stacks', stack_id)
+        return None if stack is None else {'stack': stack}
+
+    def _load_flavors(self, endpoint):
+        return self._load_list(endpoint, 'flavors')
+
+    def _load_scripts(self, endpoint):
+        return self._load_list(endpoint, 'scripts')
+
+    def load(self, path, fresh=True, endpoint=''):
+        """
+        Return the stored JSON response data for a GET request, in the same
+        format returned by the API, or `None` if nothing was stored.
+
+        :param fresh: If `True`, return `None` unless the data is fresh
+        :param endpoint: API endpoint the path belongs to
+        """
+        path = normalize_path(path)
+        name, args = _route(path)
+        if name is None:
+            return None
+
+        if fresh and not self.is_fresh(path, endpoint):
+            return None
+        elif not fresh and self.fetched_at(path, endpoint) is None:
+            return None
+
+        return getattr(self, '_load_' + name)(endpoint, *args)
+
+    def refresh(self, client, nodes=True, wait=True):
+        """
+        Fetch clusters, stacks, flavors, and scripts from the API and store
+        them, along with each cluster's details and (optionally) nodes.
+
+        :param client: :class:`~lavaclient.client.Lava` instance
+        :param nodes: If `True`, also fetch every cluster's nodes
+        :param wait: If `False`, refresh in a background thread, returning a
+                     :class:`~lavaclient.concurrency.Future`
+        """
+        if not wait:
+            return background(self.refresh, client, nodes=nodes)
+
+        def fetch(path):
+            data = client._request('GET', path, use_store=False)
+            self.save(path, data, endpoint=client.endpoint)
+            return data
+
+        for path in CATALOG_PATHS:
+            fetch(path)
+
+        for cluster in fetch('clusters')['clusters']:
+            fetch('clusters/{0}'.format(cluster['id']))
+            if nodes:
+                fetch('clusters/{0}/nodes'.format(cluster['id']))
+
+    ######################################################################
+    # Queries
+    ######################################################################
+
+    def _select(self, table, filters, order='endpoint, position'):
+        columns = sorted(filters)
+        invalid = set(columns) - FILTER_COLUMNS[table]
+        if invalid:
+            raise error.InvalidError('Can not filter {0} by {1}'.format(
+                table, ', '.join(sorted(invalid))))
+
+        where = ' AND '.join('{0} = ?'.format(col) for col in columns)
+        sql = 'SELECT {0} FROM {1}{2} ORDER BY {3}'.format(
+            'coalesce(detail, data)' if table in ('clusters', 'stacks')
+            else 'data',
+            table,
+            ' WHERE ' + where if where else '',
+            order)
+
+        return self._rows(sql, [filters[col] for col in columns])
+
+    def clusters(self, **filters):
+        """
+        Return stored clusters, optionally filtered by any of `endpoint`,
+        `name`, `status`, or `stack_id`
+
+        :returns: List of :class:`~lavaclient.api.response.Cluster`
+        """
+        return [Cluster(item) for item in self._select('clusters', filters)]
+
+    def cluster(self, cluster_id, endpoint=None):
+        """
+        Return a stored cluster, or `None`
+
+        :param endpoint: Endpoint the cluster belongs to; by default, any
+        :returns: :class:`~lavaclient.api.response.ClusterDetail`
+        """
+        data = self._load_detail(endpoint, 'clusters', cluster_id)
+        return None if data is None else ClusterDetail(data)
+
+    def node_groups(self, cluster_id, endpoint=None):
+        """
+        Return the node groups of a stored cluster
+
+        :param endpoint: Endpoint the cluster belongs to; by default, any
+        :returns: List of :class:`~lavaclient.api.response.NodeGroup`
+        """
+        sql = 'SELECT data FROM node_groups WHERE cluster_id = ?'
+        params = [cluster_id]
+        if endpoint is not None:
+            sql += ' AND endpoint = ?'
+            params.append(endpoint)
+
+        return [NodeGroup(item) for item in self._rows(
+            sql + ' ORDER BY endpoint, id', params)]
+
+    def nodes(self, **filters):
+        """
+        Return stored nodes, optionally filtered by any of `endpoint`,
+        `cluster_id`, `name`, `node_group`, `status`, or `flavor_id`
+
+        :returns: List of :class:`~lavaclient.api.response.Node`
+        """
+        return [Node(item) for item in self._select(
+            'nodes', filters, order='endpoint, cluster_id, position')]
+
+    def stacks(self, **filters):
+        """
+        Return stored stacks, optionally filtered by `endpoint`, `name` or
+        `distro`
+
+        :returns: List of :class:`~lavaclient.api.response.Stack`
+        """
+        return [Stack(item) for item in self._select('stacks', filters)]
+
+    def stack(self, stack_id, endpoint=None):
+        """
+        Return a stored stack, or `None`
+
+        :param endpoint: Endpoint the stack belongs to; by default, any
+        :returns: :class:`~lavaclient.api.response.StackDetail`
+        """
+        data = self._load_detail(endpoint, 'stacks', stack_id)
+        return None if data is None else StackDetail(data)
+
+    def flavors(self, **filters):
+        """
+        Return stored flavors, optionally filtered by `endpoint`
+
+        :returns: List of :class:`~lavaclient.api.response.Flavor`
+        """
+        return [Flavor(item) for item in self._select('flavors', filters)]
+
+    def scripts(self, **filters):
+        """
+        Return stored scripts, optionally filtered by `endpoint`, `name` or
+        `type`
+
+        :returns: List of :class:`~lavaclient.api.response.Script`
+        """
+        return [Script(item) for item in self._select('scripts', filters)]
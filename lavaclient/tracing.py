@@ -0,0 +1,317 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Record where time goes in a client session as a tree of spans: one for each
+API resource method call (e.g. `clusters.create`, `clusters.wait`), with
+nested spans for each HTTP request (tagged with its `Client-Request-ID`),
+keystone authentication, and SSH subprocess, e.g.
+
+    >>> tracer = Tracer()
+    >>> lava = Lava(..., tracer=tracer)
+    >>> lava.clusters.create(..., wait=True)
+    >>> tracer.export('trace.json')
+
+The exported file may be loaded in `chrome://tracing` (or Perfetto), or, with
+`fmt='otlp'`, sent to an OpenTelemetry collector.
+"""
+
+import binascii
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from lavaclient._version import __version__
+from lavaclient.log import NullHandler
+from lavaclient import error
+
+
+LOG = logging.getLogger(__name__)
+LOG.addHandler(NullHandler())
+
+
+# Span categories
+RESOURCE = 'resource'
+HTTP = 'http'
+KEYSTONE = 'keystone'
+SSH = 'ssh'
+PARSE = 'parse'
+RENDER = 'render'
+
+# Export formats
+CHROME = 'chrome'
+OTLP = 'otlp'
+FORMATS = (CHROME, OTLP)
+
+# OTLP span kinds and status codes
+_OTLP_INTERNAL = 1
+_OTLP_CLIENT = 3
+_OTLP_ERROR = 2
+
+# Spans that are in progress on the current thread, innermost last, as
+# (tracer, span) pairs
+_local = threading.local()
+
+
+def _random_id(n_bytes):
+    return binascii.hexlify(os.urandom(n_bytes)).decode('ascii')
+
+
+def _stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+class Span(object):
+    """A timed operation, possibly nested in another one"""
+
+    def __init__(self, name, category, trace_id, parent_id=None,
+                 attributes=None):
+        self.name = name
+        self.category = category
+        self.trace_id = trace_id
+        self.span_id = _random_id(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.thread_id = threading.current_thread().ident
+        self.start = time.time()
+        self.end = None
+        self.error = None
+
+    def set(self, key, value):
+        """Set an attribute, e.g. the status code of an HTTP response"""
+        self.attributes[key] = value
+
+    @property
+    def duration(self):
+        """Duration in seconds, or `None` if the span has not ended"""
+        return None if self.end is None else self.end - self.start
+
+    def __repr__(self):
+        return 'Span(name={0!r}, category={1!r}, duration={2!r})'.format(
+            self.name, self.category, self.duration)
+
+
+class _NullSpan(object):
+
+    """Stands in for a span when nothing is being traced"""
+
+    def set(self, key, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer(object):
+    """
+    Collects the spans of a client session. Spans started on the same thread
+    while another is in progress are nested in it; see also
+    :func:`propagate`.
+    """
+
+    def __init__(self):
+        self.trace_id = _random_id(16)
+        self._lock = threading.Lock()
+        self._spans = []
+
+    @property
+    def spans(self):
+        """List of finished :class:`Span` objects, in the order they
+        ended"""
+        with self._lock:
+            return list(self._spans)
+
+    @contextmanager
+    def span(self, name, category=RESOURCE, **attributes):
+        """Context manager that times its body as a :class:`Span`, which it
+        yields"""
+        stack = _stack()
+        parent = next((span for tracer, span in reversed(stack)
+                       if tracer is self), None)
+
+        current = Span(name, category, self.trace_id,
+                       parent_id=parent and parent.span_id,
+                       attributes=attributes)
+        stack.append((self, current))
+        try:
+            yield current
+        except BaseException as exc:
+            current.error = '{0}: {1}'.format(type(exc).__name__, exc)
+            raise
+        finally:
+            current.end = time.time()
+            stack.pop()
+            with self._lock:
+                self._spans.append(current)
+
+    def chrome_trace(self):
+        """Return the spans in the Chrome trace event format"""
+        pid = os.getpid()
+        events = []
+        for span in self.spans:
+            args = dict(span.attributes, span_id=span.span_id)
+            if span.parent_id:
+                args.update(parent_id=span.parent_id)
+            if span.error:
+                args.update(error=span.error)
+
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': int(span.start * 1e6),
+                'dur': int(span.duration * 1e6),
+                'pid': pid,
+                'tid': span.thread_id,
+                'args': args,
+            })
+
+        events.sort(key=lambda event: event['ts'])
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def otlp(self):
+        """Return the spans in the OpenTelemetry protocol (OTLP) JSON
+        format"""
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                'traceId': span.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': (_OTLP_CLIENT if span.category != RESOURCE
+                         else _OTLP_INTERNAL),
+                'startTimeUnixNano': str(int(span.start * 1e9)),
+                'endTimeUnixNano': str(int(span.end * 1e9)),
+                'attributes': _otlp_attributes(
+                    dict(span.attributes, category=span.category)),
+            }
+            if span.parent_id:
+                otlp_span['parentSpanId'] = span.parent_id
+            if span.error:
+                otlp_span['status'] = {'code': _OTLP_ERROR,
+                                       'message': span.error}
+
+            spans.append(otlp_span)
+
+        return {'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes(
+                {'service.name': 'python-lavaclient'})},
+            'scopeSpans': [{
+                'scope': {'name': 'lavaclient', 'version': __version__},
+                'spans': spans,
+            }],
+        }]}
+
+    def export(self, path, fmt=CHROME):
+        """
+        Write the spans to a JSON file
+
+        :param fmt: `'chrome'` for the Chrome trace event format, or `'otlp'`
+                    for OTLP JSON
+        """
+        if fmt not in FORMATS:
+            raise error.InvalidError(
+                'Invalid trace format: {0}; must be one of {1}'.format(
+                    fmt, ', '.join(FORMATS)))
+
+        data = self.chrome_trace() if fmt == CHROME else self.otlp()
+        with open(path, 'w') as handle:
+            json.dump(data, handle)
+
+        LOG.debug('Wrote trace to %s', path)
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    elif isinstance(value, int):
+        return {'intValue': str(value)}
+    elif isinstance(value, float):
+        return {'doubleValue': value}
+
+    return {'stringValue': '{0}'.format(value)}
+
+
+def _otlp_attributes(attributes):
+    return [{'key': key, 'value': _otlp_value(value)}
+            for key, value in sorted(attributes.items())
+            if value is not None]
+
+
+@contextmanager
+def _null_span():
+    yield _NULL_SPAN
+
+
+def span(name, category=RESOURCE, tracer=None, **attributes):
+    """
+    Context manager that times its body as a span of tracer, or of the tracer
+    with a span in progress on the current thread if tracer is `None`. If
+    there is no such tracer, nothing is recorded.
+    """
+    if tracer is None:
+        stack = _stack()
+        if not stack:
+            return _null_span()
+
+        tracer = stack[-1][0]
+
+    return tracer.span(name, category, **attributes)
+
+
+def propagate(func):
+    """
+    Wrap func so that spans it starts, e.g. in another thread, are nested in
+    the span that is in progress on the current thread
+    """
+    stack = _stack()
+    if not stack:
+        return func
+
+    context = stack[-1]
+
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        stack = _stack()
+        stack.append(context)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stack.remove(context)
+
+    return wrapped
+
+
+def traced(name):
+    """Decorator for resource methods that records each call as a span of
+    the client's tracer, if it has one"""
+    def decorator(func):
+        @wraps(func)
+        def wrapped(self, *args, **kwargs):
+            tracer = getattr(self._client, 'tracer', None)
+            if tracer is None:
+                return func(self, *args, **kwargs)
+
+            with tracer.span(name, RESOURCE):
+                return func(self, *args, **kwargs)
+
+        wrapped.__wrapped__ = func
+        return wrapped
+    return decorator
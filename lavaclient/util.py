@@ -21,21 +21,38 @@ import time
 import json
 import argparse
 import math
+import re
+import unicodedata
 import textwrap
 import six
 import binascii
 import base64
+import codecs
+import types
+import copy
+import csv
+import sys
 import os.path
+import threading
 import six.moves.urllib as urllib
 import socks
 from sockshandler import SocksiPyHandler
 from functools import wraps
 from collections import namedtuple
+from inspect import isclass
+from datetime import date
 from figgis import Config
 from prettytable import PrettyTable
 
 from lavaclient.log import NullHandler
-from lavaclient import error
+from lavaclient import deadlines, error, tracing
+from lavaclient.retries import RetryPolicy
+
+# YAML support is optional
+try:
+    import yaml
+except ImportError:  # pragma: no cover
+    yaml = None
 
 
 RETRY_DEFAULT_ATTEMPTS = 3
@@ -47,42 +64,73 @@ LOG = logging.getLogger(__name__)
 LOG.addHandler(NullHandler())
 
 
+# Metadata computed once per class or function; see memoized_metadata
+_METADATA = {}
+
+
 def retry(*args, **kwargs):
-    """Retry decorator"""
-    attempts = max(kwargs.get('attempts', RETRY_DEFAULT_ATTEMPTS), 1)
-    delay = max(kwargs.get('delay', RETRY_DEFAULT_DELAY), 0)
-    backoff = max(kwargs.get('backoff', RETRY_DEFAULT_BACKOFF), 0)
-
-    exceptions = kwargs.get('exceptions')
-    if exceptions is None:
-        exceptions = (Exception,)
-    elif isinstance(exceptions, Exception):
-        exceptions = (exceptions,)
-    else:
-        exceptions = tuple(exceptions)
+    """
+    retry(attempts=3, delay=1, backoff=2, exceptions=None, max_delay=None, \
+jitter=False, deadline=None, budget=None, policy=None)
+
+    Retry decorator. Delays grow exponentially; see
+    :class:`~lavaclient.retries.RetryPolicy` for the meaning of the options,
+    or pass a policy directly. By default, any exception is retried.
+    """
+    policy = kwargs.get('policy')
+    if policy is None:
+        exceptions = kwargs.get('exceptions')
+        if exceptions is None:
+            exceptions = (Exception,)
+        elif isinstance(exceptions, type):
+            exceptions = (exceptions,)
+
+        policy = RetryPolicy(
+            attempts=kwargs.get('attempts', RETRY_DEFAULT_ATTEMPTS),
+            delay=kwargs.get('delay', RETRY_DEFAULT_DELAY),
+            backoff=kwargs.get('backoff', RETRY_DEFAULT_BACKOFF),
+            max_delay=kwargs.get('max_delay'),
+            jitter=kwargs.get('jitter', False),
+            deadline=kwargs.get('deadline'),
+            budget=kwargs.get('budget'),
+            statuses=None,
+            exceptions=exceptions,
+            methods=None)
 
     def decorator(func):
         @wraps(func)
         def wrapped(*args, **kwargs):
-            delay_time = delay
+            state = policy.begin()
 
-            for attempt in six.moves.range(1, attempts + 1):
+            while True:
                 try:
                     return func(*args, **kwargs)
-                except exceptions as exc:
-                    LOG.debug('Attempt %d failed', attempt, exc_info=exc)
-                    if attempt == attempts:
+                except policy.exceptions as exc:
+                    LOG.debug('Attempt %d failed', state.attempt, exc_info=exc)
+                    delay_time = state.next_delay(exc)
+                    if delay_time is None:
                         raise
 
-                    time.sleep(delay_time)
-                    delay_time *= backoff
-
-            assert False, "This should never ever happen"
+                time.sleep(delay_time)
 
         return wrapped
     return decorator(args[0]) if args and callable(args[0]) else decorator
 
 
+def memoized_metadata(obj, name, compute):
+    """
+    Return compute(obj), computing it only the first time it is requested for
+    the given object (e.g. a response class or function) and name. Only use
+    this for metadata that does not change once the object is defined.
+    """
+    key = (obj, name)
+    try:
+        return _METADATA[key]
+    except KeyError:
+        value = _METADATA[key] = compute(obj)
+        return value
+
+
 def expand(path):
     """Fully expand OS path"""
     return os.path.expanduser(os.path.expandvars(path))
@@ -135,40 +183,169 @@ def create_single_table(data, header):
     return table
 
 
+def _title_lines(title, width, n_fields, padding):
+    """Return (title lines, new padding width) for a table of the given
+    width, widening the table if necessary so that the title fits"""
+    if width < len(title) + 4:
+        # Add padding to cover the space needed so that the table is as wide
+        # as the title
+        extra = int(math.ceil((len(title) + 4 - width) / (2.0 * n_fields)))
+        padding += extra
+        width += 2 * n_fields * extra
+
+    return ['+' + '-' * (width - 2) + '+',
+            '| ' + title.center(width - 4) + ' |'], padding
+
+
 def print_titled(table, title=None):
     if title:
-        width = len(str(table).split('\n', 1)[0])
-        if width < len(title) + 4:
-            n_fields = len(table.field_names)
-            padding = table.padding_width
+        text = table.get_string()
+        width = len(text.split('\n', 1)[0])
+        lines, padding = _title_lines(title, width, len(table.field_names),
+                                      table.padding_width)
+
+        six.print_('\n'.join(lines))
+        if padding != table.padding_width:
+            # Only re-render if the table had to be widened
+            table.padding_width = padding
+            text = table.get_string()
+
+        six.print_(text)
+    else:
+        six.print_(table)
+
+
+# Number of lines written to stdout at a time by the table renderer
+TABLE_WRITE_LINES = 500
+
+# Table cell padding, as in PrettyTable
+TABLE_PADDING = 1
+
+
+def _is_number(value):
+    return type(value) in (int, float)
+
+
+# Characters before U+0300 (combining diacritical marks) are all one column
+# wide
+_NARROW_TEXT = re.compile(u'^[\u0000-\u02ff]*$')
+
+
+def _text_width(text):
+    """Number of terminal columns taken by text: two for wide (e.g. CJK)
+    characters, none for combining characters, and one for the rest"""
+    if _NARROW_TEXT.match(text):
+        return len(text)
+
+    return sum(0 if unicodedata.combining(char) else
+               2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+               for char in text)
+
+
+def _cell_lines(value, float_format):
+    if float_format and isinstance(value, float):
+        return ['{0:.2f}'.format(value)]
+
+    return six.text_type(value).expandtabs().split('\n')
+
+
+def _justify(text, width, align):
+    # Pad to the display width rather than the number of characters
+    width -= _text_width(text) - len(text)
+    if align == 'l':
+        return text.ljust(width)
+    elif align == 'r':
+        return text.rjust(width)
+
+    return text.center(width)
+
+
+def _stream_table(rows, header, aligns, float_formats, title=None,
+                  show_header=True):
+    """
+    Write a table to stdout in the same format as PrettyTable, formatting
+    each cell only once and writing lines in batches. Tabs are expanded, and
+    column widths are measured in terminal columns, so that cells with wide
+    characters stay aligned.
+
+    `aligns` and `float_formats` are lists with one item per column; an align
+    of `None` means right-aligned if all values are numbers, or centered
+    otherwise, and likewise a float format of `None` means that floats are
+    formatted with two decimal places only in numeric columns.
+    """
+    rows = list(rows)
+
+    n_fields = len(header)
+    numeric = [all(_is_number(row[i]) for row in rows)
+               for i in range(n_fields)]
+    aligns = [('r' if numeric[i] else 'c') if align is None else align
+              for i, align in enumerate(aligns)]
+    float_formats = [numeric[i] if fmt is None else fmt
+                     for i, fmt in enumerate(float_formats)]
+
+    def format_row(row):
+        return [_cell_lines(value, fmt)
+                for value, fmt in zip(row, float_formats)]
+
+    cells = [format_row(row) for row in rows]
+
+    widths = [_text_width(six.text_type(name)) if show_header else 0
+              for name in header]
+    for row in cells:
+        for i, lines in enumerate(row):
+            widths[i] = max([widths[i]] +
+                            [_text_width(line) for line in lines])
+
+    width = sum(widths) + (2 * TABLE_PADDING + 1) * n_fields + 1
+    padding = TABLE_PADDING
+    buf = []
+    if title:
+        lines, padding = _title_lines(title, width, n_fields, padding)
+        buf.extend(lines)
+
+    pad = ' ' * padding
+    hrule = '+' + '+'.join('-' * (w + 2 * padding) for w in widths) + '+'
+
+    def render(row):
+        for n in range(max(len(lines) for lines in row) if row else 1):
+            yield '|' + '|'.join(
+                pad + _justify(lines[n] if n < len(lines) else '', w, align) +
+                pad
+                for lines, w, align in zip(row, widths, aligns)) + '|'
 
-            # Add padding to cover the space needed so that the table is as
-            # wide as the title
-            table.padding_width += int(math.ceil(
-                (len(title) + 4 - width) /
-                (2.0 * n_fields)))
+    def flush(force=False):
+        if buf and (force or len(buf) >= TABLE_WRITE_LINES):
+            six.print_('\n'.join(buf))
+            del buf[:]
 
-            extra_width = 2 * n_fields * (table.padding_width - padding)
-            width += extra_width
+    buf.append(hrule)
+    if show_header:
+        buf.extend(render([[six.text_type(name)] for name in header]))
+        buf.append(hrule)
 
-        six.print_('+' + '-' * (width - 2) + '+')
-        six.print_('| ' + title.center(width - 4) + ' |')
+    for row in cells:
+        buf.extend(render(row))
+        flush()
 
-    six.print_(table)
+    buf.append(hrule)
+    flush(force=True)
 
 
 def print_table(data, header, title=None):
     """
     Print a pretty table from multiple rows
     """
-    print_titled(create_table(data, header), title)
+    n_fields = len(header)
+    _stream_table(data, header, [None] * n_fields, [None] * n_fields,
+                  title=title)
 
 
 def print_single_table(data, header, title=None):
     """
     Print a pretty table for a single item
     """
-    print_titled(create_single_table(data, header), title)
+    _stream_table(zip(header, data), ['Property', 'Value'], ['l', 'r'],
+                  [False, True], title=title, show_header=False)
 
 
 def no_nulls(data):
@@ -181,34 +358,57 @@ def getattrs(item, path):
     return six.moves.reduce(getattr, path.split('.'), item)
 
 
-def table_attributes(response_class):
-    """Return a tuple of response_class attributes that can be used to display
-    a table"""
+def _table_attributes(response_class):
     attr_order = ('id', 'name', 'status')
     fields = response_class._fields
 
     attributes = [attr for attr in attr_order if attr in fields]
     attributes.extend(attr for attr in fields if attr not in set(attr_order))
 
-    return attributes
+    return tuple(attributes)
 
 
-def table_header(attributes):
-    """Return a reasonable guess at a nice-looking set of attribute headers"""
+def table_attributes(response_class):
+    """Return a tuple of response_class attributes that can be used to display
+    a table"""
+    return list(memoized_metadata(response_class, 'table_attributes',
+                                  _table_attributes))
+
+
+def _table_header(attributes):
     # Hard-coded attribute-to-header mapping
     header_map = {
         'id': 'ID',
     }
-    return [header_map.get(attr, attr.capitalize().replace('_', ' '))
-            for attr in attributes]
+    return tuple(header_map.get(attr, attr.capitalize().replace('_', ' '))
+                 for attr in attributes)
+
+
+def table_header(attributes):
+    """Return a reasonable guess at a nice-looking set of attribute headers"""
+    return list(memoized_metadata(tuple(attributes), 'table_header',
+                                  _table_header))
+
+
+def _table_columns(response_class):
+    """Return (attributes, header) used to display response_class"""
+    if hasattr(response_class, 'table_columns'):
+        attributes = response_class.table_columns
+    else:
+        attributes = table_attributes(response_class)
+
+    if hasattr(response_class, 'table_header'):
+        header = response_class.table_header
+    else:
+        header = table_header(attributes)
+
+    return attributes, header
 
 
 def table_data(response, response_class):
     """Transform API response into (table data, table header)"""
-    attributes = getattr(response_class, 'table_columns',
-                         table_attributes(response_class))
-    header = getattr(response_class, 'table_header',
-                     table_header(attributes))
+    attributes, header = memoized_metadata(response_class, 'table_columns',
+                                           _table_columns)
 
     if not isinstance(response, list):
         data = no_nulls(getattrs(response, attr) for attr in attributes)
@@ -231,11 +431,272 @@ def display_result(result, response_config, title=None):
         print_table(data, header, title=title)
 
 
+class _Unprojected(object):
+
+    """Attribute of a projected response class (see :func:`project`) standing
+    in for a field that was not included in the projection"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+
+        raise AttributeError(
+            "Field '{0}' was not included in the projected fields".format(
+                self.name))
+
+
+def _projected_field(field, paths):
+    """Copy of a field whose Config types are projected onto paths"""
+    if not any(isclass(type_) and issubclass(type_, Config)
+               for type_ in field.types):
+        return field
+
+    projected = copy.copy(field)
+    projected._types = tuple(
+        project(type_, paths)
+        if isclass(type_) and issubclass(type_, Config) else type_
+        for type_ in field.types)
+
+    return projected
+
+
+def _project(response_class, paths):
+    needed = {}
+
+    def require(path):
+        head, _, rest = path.partition('.')
+        if head in response_class._fields:
+            needed.setdefault(head, set()).add(rest or None)
+            return
+
+        dependencies = getattr(response_class, 'field_dependencies',
+                               {}).get(head)
+        if dependencies is None and head.lstrip('_') in response_class._fields:
+            # Prettified fields, e.g. _components; see prettify
+            dependencies = (head.lstrip('_'),)
+        elif dependencies is None:
+            raise error.InvalidError('Unknown field for {0}: {1}'.format(
+                response_class.__name__, path))
+
+        for dependency in dependencies:
+            require(dependency)
+
+    for path in paths:
+        require(path)
+
+    dct = {
+        '__module__': response_class.__module__,
+        '__doc__': response_class.__doc__,
+        'projected_fields': paths,
+        'table_columns': paths,
+        'table_header': tuple(table_header(paths)),
+    }
+    for name, field in six.iteritems(response_class._fields):
+        subpaths = needed.get(name)
+        if subpaths is None:
+            dct[name] = _Unprojected(name)
+        elif None in subpaths:
+            dct[name] = field
+        else:
+            dct[name] = _projected_field(field, tuple(sorted(subpaths)))
+
+    return type(response_class)(response_class.__name__, (response_class,),
+                                dct)
+
+
+def project(response_class, fields):
+    """
+    Return a subclass of response_class that only parses the given fields, so
+    that the work of validating and converting the others is skipped. Fields
+    may be dotted paths, as supported by :func:`getattrs` (e.g.
+    `addresses.public`), in which case only part of a nested object is
+    parsed.
+
+    Properties may also be given if the response class lists the fields they
+    use in its `field_dependencies` attribute (e.g. `public_ip` of
+    :class:`~lavaclient.api.response.Node`). Accessing a field that was not
+    projected raises `AttributeError`.
+
+    :param fields: List of field names or paths
+    :returns: Subclass of response_class; the same class is returned for the
+              same fields
+    """
+    paths = tuple(fields)
+    if not paths:
+        raise error.InvalidError('At least one field is required')
+
+    return memoized_metadata(response_class, ('projection', paths),
+                             lambda cls: _project(cls, paths))
+
+
+def field_list(value):
+    """Parse a comma-separated command-line list of fields, e.g. `id,status`"""
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    if not fields:
+        raise argparse.ArgumentTypeError('At least one field is required')
+
+    return fields
+
+
+# Values of the CLI --format option
+OUTPUT_FORMATS = ('table', 'json', 'jsonl', 'csv', 'tsv')
+
+
+def output_format(resource):
+    """Return the output format selected on the command line for a resource,
+    defaulting to 'table'"""
+    fmt = getattr(getattr(resource, '_args', None), 'format', None)
+    return fmt if fmt in OUTPUT_FORMATS else 'table'
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    elif isinstance(value, Config):
+        return value.to_dict()
+
+    return six.text_type(value)
+
+
+def _json_record(item):
+    if not isinstance(item, Config):
+        return item
+
+    fields = getattr(item, 'projected_fields', None)
+    if fields is None:
+        return item.to_dict()
+
+    # Same keys and values as the CSV columns of a projection (see project)
+    return dict((path.lstrip('_'), getattrs(item, path)) for path in fields)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    elif isinstance(value, date):
+        return value.isoformat()
+    elif isinstance(value, (dict, list, Config)):
+        return json.dumps(value, default=_json_default, sort_keys=True)
+
+    return value
+
+
+def _csv_columns(item, response_config):
+    """Return (attributes, header) of the CSV columns for a record"""
+    if response_config is None and isinstance(item, Config):
+        response_config = item.__class__
+
+    if response_config is not None:
+        attributes, _ = memoized_metadata(response_config, 'table_columns',
+                                          _table_columns)
+        return attributes, [attr.lstrip('_') for attr in attributes]
+    elif isinstance(item, dict):
+        keys = sorted(item)
+        return keys, keys
+
+    return None, ['value']
+
+
+def write_records(result, fmt, response_config=None):
+    """
+    Write the result of an API method to stdout in a machine-readable format,
+    one record at a time:
+
+    - `json`: a JSON object, or a JSON array for lists
+    - `jsonl`: one JSON object per line
+    - `csv`/`tsv`: a header row followed by one row per record, with the
+      same columns as the table output
+
+    JSON records contain every attribute of each response object (see
+    `figgis.Config.to_dict`), or only the projected fields of a projected
+    response class (see :func:`project`), keyed by path. The result of a
+    bulk operation (see :class:`~lavaclient.api.clusters.BatchResult`) is
+    written as a list of records with the `item`, `outcome`, `result`, and
+    `error` of each of its items.
+    """
+    if result is None:
+        return
+
+    if callable(getattr(result, 'records', None)):
+        result = list(result.records())
+        response_config = None
+
+    out = sys.stdout
+    is_list = isinstance(result, (list, tuple))
+    items = result if is_list else [result]
+
+    if fmt == 'json' and not is_list:
+        out.write(json.dumps(_json_record(result), default=_json_default) +
+                  '\n')
+    elif fmt == 'json':
+        out.write('[')
+        for index, item in enumerate(items):
+            out.write((',\n' if index else '\n') + json.dumps(
+                _json_record(item), default=_json_default))
+        out.write('\n]\n' if items else ']\n')
+    elif fmt == 'jsonl':
+        for item in items:
+            out.write(json.dumps(_json_record(item), default=_json_default) +
+                      '\n')
+    elif fmt in ('csv', 'tsv'):
+        writer = csv.writer(out, delimiter=',' if fmt == 'csv' else '\t',
+                            lineterminator='\n')
+        attributes = None
+        for item in items:
+            if attributes is None:
+                attributes, header = _csv_columns(item, response_config)
+                writer.writerow(header)
+
+            if attributes is None:
+                row = [item]
+            elif isinstance(item, dict):
+                row = [item.get(key) for key in attributes]
+            else:
+                row = [getattrs(item, attr) for attr in attributes]
+
+            writer.writerow([_csv_value(value) for value in row])
+    else:
+        raise error.InvalidError('Invalid output format: {0}'.format(fmt))
+
+    out.flush()
+
+
+def _display_table_result(resource, result, response_config, title,
+                          fields):
+    config = response_config
+    if fields:
+        config = project(response_config, fields)
+
+    fmt = output_format(resource)
+    if fmt != 'table':
+        write_records(result, fmt, config)
+        return
+
+    if config is not response_config:
+        display_result(result, config, title=title)
+        return
+
+    if hasattr(response_config, 'display'):
+        if isinstance(result, (list, tuple)):
+            for item in result:
+                response_config.display(result)
+        else:
+            response_config.display(result)
+
+        return
+
+    display_result(result, response_config, title=title)
+
+
 def display_table(response_config, title=None):
     """
     In the CLI interface, display the result of the decorated method as a
     table.  response_config should be the response (i.e. figgis.Config) class
-    returned by the decorated method
+    returned by the decorated method. If another output format was selected
+    (see :func:`output_format`), write the result in that format instead.
     """
     if not issubclass(response_config, Config):
         raise TypeError('Response class class must be a figgis.Config')
@@ -244,16 +705,10 @@ def display_table(response_config, title=None):
         def display_func(*args, **kwargs):
             result = func(*args, **kwargs)
 
-            if hasattr(response_config, 'display'):
-                if isinstance(result, (list, tuple)):
-                    for item in result:
-                        response_config.display(result)
-                else:
-                    response_config.display(result)
-
-                return
-
-            display_result(result, response_config, title=title)
+            with tracing.span('render', tracing.RENDER):
+                _display_table_result(args[0] if args else None, result,
+                                      response_config, title,
+                                      kwargs.get('fields'))
 
         func.display = display_func
         return func
@@ -263,11 +718,20 @@ def display_table(response_config, title=None):
 def display(display_function):
     """
     Attach a display function to the API method.  display_function should be a
-    function that takes the response from the decorated method
+    function that takes the response from the decorated method. If an output
+    format other than 'table' was selected (see :func:`output_format`), the
+    response is written in that format instead.
     """
     def wrapper(func):
         def display_func(*args, **kwargs):
-            return display_function(func(*args, **kwargs))
+            result = func(*args, **kwargs)
+
+            with tracing.span('render', tracing.RENDER):
+                fmt = output_format(args[0] if args else None)
+                if fmt != 'table':
+                    return write_records(result, fmt)
+
+                return display_function(result)
 
         func.display = display_func
         return func
@@ -319,8 +783,7 @@ class mutually_exclusive(object):
             group.add_argument(*arg.args, **arg.kwargs)
 
 
-def get_function_arguments(func):
-    """Return (args, kwargs) for func, excluding `self`"""
+def _function_arguments(func):
     code = six.get_function_code(func)
     defaults = six.get_function_defaults(func) or []
 
@@ -328,7 +791,20 @@ def get_function_arguments(func):
                  if var != 'self']
     n_required = len(arg_names) - len(defaults)
 
-    return arg_names[:n_required], arg_names[n_required:]
+    return tuple(arg_names[:n_required]), tuple(arg_names[n_required:])
+
+
+def get_function_arguments(func):
+    """Return (args, kwargs) for func, excluding `self`"""
+    # Bound methods are created on each attribute access, so key on the
+    # underlying function, unwrapping any decorators (e.g. tracing.traced)
+    func = getattr(func, '__func__', func)
+    while hasattr(func, '__wrapped__'):
+        func = func.__wrapped__
+    required, optional = memoized_metadata(func, 'function_arguments',
+                                           _function_arguments)
+
+    return list(required), list(optional)
 
 
 def _required_argument(name, arg):
@@ -460,6 +936,18 @@ class CommandLine(type):
                 parser_options[key] = value.parser_options
                 dct[key] = value.function
 
+        # Record calls to public methods and commands as trace spans, e.g.
+        # clusters.create; see lavaclient.tracing
+        prefix = dct.get('__module__', name).split('.')[-1]
+        for key, value in list(dct.items()):
+            if (isinstance(value, types.FunctionType) and
+                    (key in arguments or not key.startswith('_'))):
+                span_name = '{0}.{1}'.format(prefix, key.strip('_'))
+                dct[key] = tracing.traced(span_name)(value)
+                if hasattr(value, 'display'):
+                    dct[key].display = tracing.traced(span_name)(
+                        value.display)
+
         @classmethod
         def add_arguments(cls, parser_base, parser, arguments=arguments,
                           parser_options=parser_options):
@@ -556,6 +1044,140 @@ def read_json(value):
     return json.loads(data)
 
 
+def read_spec(value):
+    """Either parse a raw JSON or YAML string or read JSON or YAML data from a
+    file. YAML requires PyYAML to be installed."""
+    data = file_or_string(value)
+    try:
+        return json.loads(data)
+    except ValueError as exc:
+        if yaml is None:
+            raise error.InvalidError('Invalid JSON (install PyYAML to use '
+                                     'YAML instead): {0}'.format(exc))
+
+    try:
+        return yaml.safe_load(data)
+    except yaml.YAMLError as exc:
+        raise error.InvalidError('Invalid JSON or YAML: {0}'.format(exc))
+
+
+class _JSONBuffer(object):
+    """Text buffer over an iterable of (byte or text) chunks, from which
+    complete JSON values can be decoded one at a time"""
+
+    WHITESPACE = frozenset(' \t\n\r')
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._unicode = codecs.getincrementaldecoder('utf-8')()
+        self._json = json.JSONDecoder()
+        self.text = six.text_type()
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Append the next chunk to the buffer, discarding text that has
+        already been consumed. Return `False` if there is no more input."""
+        if self.eof:
+            return False
+
+        try:
+            chunk = six.next(self._chunks)
+        except StopIteration:
+            self.eof = True
+            chunk = self._unicode.decode(six.b(''), final=True)
+        else:
+            if isinstance(chunk, six.binary_type):
+                chunk = self._unicode.decode(chunk)
+
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return not self.eof
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it, or
+        `None` at the end of input"""
+        while True:
+            while (self.pos < len(self.text) and
+                   self.text[self.pos] in self.WHITESPACE):
+                self.pos += 1
+
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            elif not self.fill():
+                return None
+
+    def expect(self, chars):
+        """Consume the next non-whitespace character, which must be one of
+        `chars`"""
+        char = self.peek()
+        if char is None or char not in chars:
+            raise ValueError('Expected one of {0!r}, found {1!r}'.format(
+                chars, char))
+
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Consume and return the next complete JSON value"""
+        self.peek()
+
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.text, self.pos)
+            except ValueError:
+                if not self.fill():
+                    raise
+                continue
+
+            # A value that ends exactly at the end of the buffer may have been
+            # truncated, e.g. a number split across two chunks
+            if end == len(self.text) and self.fill():
+                continue
+
+            self.pos = end
+            return value
+
+
+def iter_json_list(chunks, key):
+    """
+    Incrementally decode a JSON document of the form `{"key": [...]}` from an
+    iterable of chunks, e.g. :meth:`requests.Response.iter_content`, yielding
+    each item of the list as soon as it has been read. Memory use is bounded
+    by the size of the largest item rather than the size of the document.
+    Any other top-level keys are skipped.
+    """
+    buf = _JSONBuffer(chunks)
+    found = False
+
+    buf.expect('{')
+    if buf.peek() == '}':
+        buf.pos += 1
+    else:
+        while True:
+            name = buf.value()
+            buf.expect(':')
+
+            if name != key:
+                buf.value()
+            else:
+                found = True
+                buf.expect('[')
+                if buf.peek() == ']':
+                    buf.pos += 1
+                else:
+                    while True:
+                        yield buf.value()
+                        if buf.expect(',]') == ']':
+                            break
+
+            if buf.expect(',}') == '}':
+                break
+
+    if not found:
+        raise ValueError('Missing key: {0}'.format(key))
+
+
 def coroutine(func):
     """Decorator that simplifies making a coroutine"""
     @wraps(func)
@@ -572,13 +1194,30 @@ def test_socks_connection(url, proxy_host, proxy_port):
     """Return HTTP code from opening URL via SOCKS proxy"""
     opener = urllib.request.build_opener(
         SocksiPyHandler(socks.PROXY_TYPE_SOCKS5, proxy_host, proxy_port))
-    resp = opener.open(url)
+
+    left = deadlines.remaining()
+    if left is None:
+        resp = opener.open(url)
+    else:
+        deadlines.check('SOCKS proxy test')
+        resp = opener.open(url, timeout=left)
     try:
         return resp.code
     finally:
         resp.close()
 
 
+def ssh_deadline_options():
+    """SSH options that limit the time spent connecting to the time left
+    before the current deadline, if any"""
+    left = deadlines.remaining()
+    if left is None:
+        return []
+
+    deadlines.check('SSH')
+    return ['-o', 'ConnectTimeout={0}'.format(int(math.ceil(left)))]
+
+
 def create_socks_proxy(username, host, port, ssh_command=None, test_url=None):
     """Create a SOCKS proxy via SSH"""
     if isinstance(ssh_command, six.string_types):
@@ -588,10 +1227,15 @@ def create_socks_proxy(username, host, port, ssh_command=None, test_url=None):
 
     options = [
         '-o', 'PasswordAuthentication=no', '-o', 'BatchMode=yes', '-N',
-        '-D', str(port)]
+        '-D', str(port)] + ssh_deadline_options()
     command = ssh_command + options + ['{0}@{1}'.format(username, host)]
 
     LOG.debug('SSH proxy command: %s', ' '.join(command))
+    with tracing.span('ssh.proxy', tracing.SSH, host=host, port=port):
+        return _start_socks_proxy(command, port, test_url)
+
+
+def _start_socks_proxy(command, port, test_url):
     process = subprocess.Popen(
         [expand(item) for item in command],
         stderr=subprocess.STDOUT,
@@ -645,6 +1289,66 @@ def inject_client(client, obj):
     return obj
 
 
+class StaleData(dict):
+    """JSON response data that was served from a local store instead of the
+    API, and which may therefore be out of date"""
+
+    def __init__(self, data, fetched_at):
+        super(StaleData, self).__init__(data)
+        self.fetched_at = fetched_at
+
+
+class _StaleList(list):
+    pass
+
+
+def mark_stale(obj, fetched_at):
+    """Mark a parsed response (or list of them) as having come from
+    :class:`StaleData`; see :func:`is_stale`"""
+    if isinstance(obj, list):
+        for item in obj:
+            mark_stale(item, fetched_at)
+        obj = _StaleList(obj)
+
+    if isinstance(obj, (Config, _StaleList)):
+        obj._stale_since = fetched_at
+
+    return obj
+
+
+def is_stale(obj):
+    """Return `True` if a response object or list was served from stored data
+    that may be out of date, e.g. because the API could not be reached"""
+    return getattr(obj, '_stale_since', None) is not None
+
+
+def _communicate(proc, timeout=None):
+    """
+    Return the output of a process and whether it was killed because it ran
+    for longer than timeout seconds
+    """
+    if timeout is None:
+        return proc.communicate()[0], False
+
+    expired = threading.Event()
+
+    def kill():
+        expired.set()
+        try:
+            proc.kill()
+        except OSError:
+            # Already exited
+            pass
+
+    timer = threading.Timer(max(timeout, 0), kill)
+    timer.daemon = True
+    timer.start()
+    try:
+        return proc.communicate()[0], expired.is_set()
+    finally:
+        timer.cancel()
+
+
 def ssh_to_host(username, host, ssh_command=None, command=None):
     """SSH to a host"""
     if isinstance(ssh_command, six.string_types):
@@ -656,23 +1360,32 @@ def ssh_to_host(username, host, ssh_command=None, command=None):
     else:
         ssh_cmd = ssh_command
 
-    command_list = ssh_cmd + ['{0}@{1}'.format(username, host)]
+    command_list = ssh_cmd + ssh_deadline_options() + [
+        '{0}@{1}'.format(username, host)]
     if command:
         command_list.append(six.text_type(command))
 
     LOG.debug('SSH command: %s', ' '.join(command_list))
 
-    if command:
-        proc = subprocess.Popen(
-            [expand(item) for item in command_list],
-            stderr=subprocess.STDOUT,
-            stdout=subprocess.PIPE)
+    with tracing.span('ssh', tracing.SSH, host=host,
+                      command=command) as span:
+        if command:
+            proc = subprocess.Popen(
+                [expand(item) for item in command_list],
+                stderr=subprocess.STDOUT,
+                stdout=subprocess.PIPE)
+
+            output, timed_out = _communicate(proc, deadlines.remaining())
+            returncode = proc.returncode
+            if timed_out:
+                raise error.TimeoutError(
+                    'SSH command did not complete before the deadline')
+        else:
+            returncode = subprocess.call(
+                [expand(item) for item in command_list])
+            output = None
 
-        output = proc.communicate()[0]
-        returncode = proc.returncode
-    else:
-        returncode = subprocess.call([expand(item) for item in command_list])
-        output = None
+        span.set('returncode', returncode)
 
     if returncode:
         msg = 'Command returned non-zero status code {0}'.format(
@@ -18,6 +18,14 @@ def test_authenticate():
     ('', '', 'endpoint', None),
     ('--endpoint foo/v2', '', 'endpoint', 'foo/v2'),
     ('', '--endpoint foo/v2', 'endpoint', 'foo/v2'),
+    ('', '', 'stale_while_revalidate', False),
+    ('', '--stale-while-revalidate', 'stale_while_revalidate', True),
+    ('', '', 'trace', None),
+    ('--trace out.json', '', 'trace', 'out.json'),
+    ('', '--trace-format otlp', 'trace_format', 'otlp'),
+    ('', '', 'request_timeout', None),
+    ('--request-timeout 5', '', 'request_timeout', 5.0),
+    ('', '--deadline 60', 'deadline', 60.0),
 ])
 def test_argparse_order(pre_args, post_args, key, value):
     argstr = 'lava {0} clusters list {1}'.format(pre_args, post_args)
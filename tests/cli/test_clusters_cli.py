@@ -1,3 +1,5 @@
+import json
+import pstats
 import socks
 import subprocess
 import pytest
@@ -11,6 +13,19 @@ from lavaclient.cli import main
 from lavaclient.api.response import Cluster, ClusterDetail, NodeGroup, Node
 from lavaclient.api.clusters import DEFAULT_SSH_KEY
 from lavaclient.error import RequestError
+from lavaclient.tracing import Tracer
+
+
+def topology(cluster_response, nodes_response):
+    """Side effect for a cluster and its nodes, which are requested
+    concurrently"""
+    def request(method, path, **kwargs):
+        if path.endswith('/nodes'):
+            return nodes_response
+
+        return cluster_response
+
+    return request
 
 
 @patch('sys.argv', ['lava', 'clusters', 'list'])
@@ -248,7 +263,8 @@ def test_ssh_proxy(popen, mock_client, cluster_response, nodes_response):
         poll=MagicMock(return_value=None),
         communicate=MagicMock(return_value=('stdout', 'stderr'))
     )
-    mock_client._request.side_effect = [cluster_response, nodes_response]
+    mock_client._request.side_effect = topology(cluster_response,
+                                                nodes_response)
 
     with patch('sys.argv', ['lava', 'clusters', 'ssh_proxy', 'cluster_id',
                             '--node-name', 'NODENAME', '--port', '54321']):
@@ -279,7 +295,8 @@ def test_ssh_proxy_errors(test_connection, popen, failure, mock_client,
     else:
         test_connection.return_value = 200
 
-    mock_client._request.side_effect = [cluster_response, nodes_response]
+    mock_client._request.side_effect = topology(cluster_response,
+                                                nodes_response)
 
     with patch('sys.argv', ['lava', 'clusters', 'ssh_proxy', 'cluster_id',
                             '--node-name', 'NODENAME', '--port',
@@ -300,7 +317,8 @@ def test_ssh_proxy_cmd_fail(popen, mock_client, cluster_response,
         poll=MagicMock(return_value=1),
         communicate=MagicMock(return_value=('stdout', 'stderr'))
     )
-    mock_client._request.side_effect = [cluster_response, nodes_response]
+    mock_client._request.side_effect = topology(cluster_response,
+                                                nodes_response)
 
     with patch('sys.argv', ['lava', 'clusters', 'ssh_proxy', 'cluster_id',
                             '--node-name', 'NODENAME', '--port',
@@ -318,9 +336,72 @@ def test_ssh_proxy_http_fail(test_connection, popen, error_code, mock_client,
         communicate=MagicMock(return_value=('stdout', 'stderr'))
     )
     test_connection.return_value = error_code
-    mock_client._request.side_effect = [cluster_response, nodes_response]
+    mock_client._request.side_effect = topology(cluster_response,
+                                                nodes_response)
 
     with patch('sys.argv', ['lava', 'clusters', 'ssh_proxy', 'cluster_id',
                             '--node-name', 'NODENAME', '--port',
                             '54321']):
         pytest.raises(Exception, main)
+
+
+@pytest.mark.parametrize('spec', [
+    '[{"name": "one", "stack_id": "stack_id"}]',
+    '- name: one\n  stack_id: stack_id',
+])
+@patch('lavaclient.api.clusters.print_table')
+def test_create_many(print_table, mock_client, cluster_response, spec):
+    mock_client._request.return_value = cluster_response
+
+    with patch('sys.argv', ['lava', 'clusters', 'create_many', spec,
+                            '--parallelism', '2']):
+        main()
+
+    assert mock_client._request.call_args[1]['json']['cluster']['name'] == \
+        'one'
+    (data, header), kwargs = print_table.call_args
+    assert data == [['one', 'cluster_id', 'ACTIVE']]
+    assert kwargs['title'] == 'Succeeded'
+
+
+@patch('sys.argv', ['lava', 'clusters', 'delete_many', '["a", "b"]'])
+@patch('lavaclient.api.clusters.print_table')
+def test_delete_many(print_table, mock_client):
+    mock_client._request.side_effect = [None, RequestError('Not found')]
+    main()
+
+    assert mock_client._request.call_count == 2
+    (succeeded, _), (failed, _) = [args for args, _ in
+                                   print_table.call_args_list]
+    assert len(succeeded) == 1 and len(failed) == 1
+
+
+def test_trace(print_table, mock_client, clusters_response, tmpdir):
+    path = str(tmpdir.join('trace.json'))
+    mock_client._request.return_value = clusters_response
+    mock_client.tracer = Tracer()
+
+    with patch('sys.argv', ['lava', 'clusters', 'list', '--trace', path]):
+        main()
+
+    with open(path) as handle:
+        events = json.load(handle)['traceEvents']
+
+    assert [event['name'] for event in events] == [
+        'clusters.list', 'parse ClustersResponse', 'render']
+
+
+def test_timings(print_table, mock_client, clusters_response, tmpdir):
+    path = str(tmpdir.join('profile.out'))
+    mock_client._request.return_value = clusters_response
+
+    with patch('sys.argv', ['lava', 'clusters', 'list', '--timings',
+                            '--profile', path]):
+        with patch('sys.stderr') as stderr:
+            main()
+
+    output = ''.join(call[0][0] for call in stderr.write.call_args_list)
+    lines = [line.split()[0] for line in output.splitlines()[1:]]
+    assert lines[-5:] == ['argparse', 'clusters.list', 'parse', 'render',
+                          'total']
+    assert pstats.Stats(path).total_calls > 0
@@ -2,6 +2,7 @@ from mock import patch
 
 from lavaclient.cli import main
 from lavaclient.api.response import Flavor
+from lavaclient.util import StaleData
 
 
 @patch('sys.argv', ['lava', 'flavors', 'list'])
@@ -14,3 +15,30 @@ def test_list(print_table, mock_client, flavors_response):
                            2500]]
     assert header == Flavor.table_header
     assert kwargs['title'] is None
+
+
+@patch('sys.argv', ['lava', 'flavors', 'list'])
+def test_list_stale(print_table, mock_client, flavors_response):
+    mock_client._request.return_value = StaleData(flavors_response, 1)
+    mock_client.served_stale['flavors'] = 1
+
+    with patch('sys.stderr') as stderr:
+        main()
+
+    assert print_table.call_count == 1
+    assert 'Warning: /flavors is stale' in ''.join(
+        call[0][0] for call in stderr.write.call_args_list)
+
+
+@patch('sys.argv', ['lava', '--format', 'csv', 'flavors', 'list'])
+def test_list_csv(print_table, mock_client, flavors_response):
+    mock_client._request.return_value = flavors_response
+    mock_client.flavors._args.format = 'csv'
+
+    with patch('sys.stdout') as stdout:
+        main()
+
+    assert not print_table.called
+    assert ''.join(call[0][0] for call in stdout.write.call_args_list) == (
+        'id,name,ram,vcpus,disk\n'
+        'hadoop1-15,Medium Hadoop Instance,15360,4,2500\n')
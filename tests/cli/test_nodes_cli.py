@@ -1,3 +1,5 @@
+import json
+
 from mock import patch
 
 from lavaclient.cli import main
@@ -15,3 +17,29 @@ def test_list(print_table, mock_client, nodes_response):
                            '5.6.7.8']
     assert header == Node.table_header
     assert kwargs['title'] is None
+
+
+@patch('sys.argv', ['lava', 'nodes', 'list', 'cluster_id', '--fields',
+                    'name,public_ip'])
+def test_list_fields(print_table, mock_client, nodes_response):
+    mock_client._request.return_value = nodes_response
+    main()
+
+    (data, header), kwargs = print_table.call_args
+    assert list(data) == [['NODENAME', '1.2.3.4']]
+    assert header == ('Name', 'Public ip')
+
+
+@patch('sys.argv', ['lava', '--format', 'json', 'nodes', 'list', 'cluster_id',
+                    '--fields', 'name,public_ip'])
+def test_list_fields_json(print_table, mock_client, nodes_response):
+    mock_client._request.return_value = nodes_response
+    mock_client.nodes._args.format = 'json'
+
+    with patch('sys.stdout') as stdout:
+        main()
+
+    assert not print_table.called
+    assert json.loads(''.join(
+        call[0][0] for call in stdout.write.call_args_list)) == [
+            {'name': 'NODENAME', 'public_ip': '1.2.3.4'}]
@@ -0,0 +1,173 @@
+import pytest
+import requests
+from keystoneclient import exceptions as ks_error
+from mock import patch, MagicMock
+
+from lavaclient import deadlines, error
+from lavaclient.breaker import CircuitBreaker, is_failure, is_response
+from lavaclient.client import Lava
+from lavaclient.metrics import Metrics
+
+
+def http_error(status):
+    return requests.exceptions.HTTPError(
+        response=MagicMock(status_code=status))
+
+
+def test_is_failure():
+    assert is_failure(http_error(503))
+    assert not is_failure(http_error(404))
+    assert is_failure(requests.exceptions.ConnectionError())
+    assert is_failure(ks_error.ConnectionRefused())
+    assert not is_failure(ValueError())
+
+    assert is_response(http_error(404))
+    assert is_response(ks_error.Unauthorized())
+    assert not is_response(error.TimeoutError('Deadline passed'))
+
+
+def test_circuit():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+    circuit = breaker.circuit('lava', 'clusters/1')
+    assert breaker.circuit('lava', 'clusters/2') is circuit
+    assert breaker.circuit('keystone', 'clusters/1') is not circuit
+    assert breaker.circuit('lava', 'clusters/1', 'https://ord') is not circuit
+
+    with patch('time.time', return_value=100):
+        assert circuit.failure() is None
+        assert circuit.success() is None
+        assert circuit.failure() is None
+        assert circuit.failure() == ('closed', 'open')
+
+        with pytest.raises(error.CircuitOpenError) as exc:
+            circuit.before()
+        assert exc.value.retry_in == 10
+        assert exc.value.endpoint == 'clusters/{id}'
+
+    with patch('time.time', return_value=110):
+        assert circuit.before() == ('open', 'half_open')
+        pytest.raises(error.CircuitOpenError, circuit.before)
+        assert circuit.failure() == ('half_open', 'open')
+
+    with patch('time.time', return_value=120):
+        circuit.before()
+        assert circuit.success() == ('half_open', 'closed')
+        assert circuit.before() is None
+
+    assert breaker.states() == {
+        ('lava', None, 'clusters/{id}'): 'closed',
+        ('lava', 'https://ord', 'clusters/{id}'): 'closed',
+        ('keystone', None, 'clusters/{id}'): 'closed'}
+
+    pytest.raises(error.InvalidError, CircuitBreaker, failure_threshold=0)
+
+
+def test_client_circuit(lavaclient):
+    lavaclient._circuit_breaker = CircuitBreaker(failure_threshold=2)
+    metrics = Metrics().attach(lavaclient)
+
+    with patch('requests.request') as request:
+        request.side_effect = requests.exceptions.ConnectionError()
+        for _ in range(3):
+            pytest.raises(error.RequestError, lavaclient._get, 'clusters')
+
+        # The third request failed without being sent
+        assert request.call_count == 2
+
+        with pytest.raises(error.CircuitOpenError):
+            lavaclient._get('clusters')
+
+        # Other endpoints are unaffected
+        request.side_effect = None
+        request.return_value = MagicMock(
+            status_code=200, json=MagicMock(return_value={}))
+        assert lavaclient._get('flavors') == {}
+
+    snapshot = metrics.snapshot()
+    assert snapshot['circuits'] == [{'service': 'lava',
+                                     'endpoint': 'clusters', 'state': 'open',
+                                     'changes': {'open': 1}}]
+    assert ('lavaclient_circuit_state{service="lava",endpoint="clusters",'
+            'state="open"} 1') in metrics.prometheus()
+
+
+def test_shared_circuit_breaker(lavaclient):
+    breaker = CircuitBreaker(failure_threshold=1)
+    lavaclient._circuit_breaker = breaker
+    with patch.object(Lava, '_authenticate'):
+        other = Lava('username', api_key='api_key', region='ORD',
+                     endpoint='https://ord.example.com/v2/tenant',
+                     circuit_breaker=breaker)
+
+    with patch('requests.request') as request:
+        request.side_effect = requests.exceptions.ConnectionError()
+        pytest.raises(error.RequestError, lavaclient._get, 'clusters')
+        pytest.raises(error.CircuitOpenError, lavaclient._get, 'clusters')
+
+        # The circuit of the other client's endpoint is still closed
+        request.side_effect = None
+        request.return_value = MagicMock(
+            status_code=200, json=MagicMock(return_value={}))
+        assert other._get('clusters') == {}
+
+    assert request.call_count == 2
+    assert breaker.states() == {
+        ('lava', lavaclient.endpoint, 'clusters'): 'open',
+        ('lava', other.endpoint, 'clusters'): 'closed'}
+
+
+def test_keystone_circuit(lavaclient):
+    lavaclient._circuit_breaker = CircuitBreaker(failure_threshold=1)
+
+    with patch('lavaclient.keystone.Client',
+               side_effect=ks_error.ConnectionRefused()) as client:
+        pytest.raises(ks_error.ConnectionRefused, lavaclient._authenticate,
+                      'url', 'api_key', 'DFW', 'username', None, 'tenant')
+        pytest.raises(error.CircuitOpenError, lavaclient._authenticate,
+                      'url', 'api_key', 'DFW', 'username', None, 'tenant')
+        assert client.call_count == 1
+
+
+def test_guard_local_errors():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    circuit = breaker.circuit('lava', 'clusters')
+
+    def request(exc):
+        with breaker.guard('lava', 'clusters'):
+            raise exc
+
+    with patch('time.time', return_value=100):
+        pytest.raises(requests.exceptions.ConnectionError, request,
+                      requests.exceptions.ConnectionError())
+        assert circuit.state == 'open'
+
+    with patch('time.time', return_value=110):
+        # A probe that is never sent leaves the circuit half-open, and lets
+        # another probe through
+        pytest.raises(error.TimeoutError, request,
+                      error.TimeoutError('Deadline passed'))
+        assert circuit.state == 'half_open'
+
+        pytest.raises(requests.exceptions.HTTPError, request,
+                      http_error(404))
+        assert circuit.state == 'closed'
+
+
+def test_client_deadline_probe(lavaclient):
+    lavaclient._circuit_breaker = CircuitBreaker(failure_threshold=1,
+                                                 reset_timeout=10)
+    circuit = lavaclient._circuit_breaker.circuit('lava', 'clusters',
+                                                  lavaclient.endpoint)
+
+    with patch('requests.request') as request:
+        request.side_effect = requests.exceptions.ConnectionError()
+        with patch('time.time', return_value=100):
+            pytest.raises(error.RequestError, lavaclient._get, 'clusters')
+
+        with patch('time.time', return_value=110):
+            with deadlines.deadline(0):
+                pytest.raises(error.TimeoutError, lavaclient._get,
+                              'clusters')
+
+    assert request.call_count == 1
+    assert circuit.state == 'half_open'
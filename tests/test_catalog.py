@@ -0,0 +1,36 @@
+import pytest
+import time
+from mock import patch
+
+from lavaclient import error
+
+
+def test_catalog(lavaclient, flavors_response, stack_response):
+    catalog = lavaclient.catalog
+
+    with patch.object(lavaclient, '_request') as request:
+        request.return_value = flavors_response
+        assert catalog.flavor('hadoop1-15').ram == 15360
+        assert catalog.flavor('hadoop1-15').vcpus == 4
+        assert request.call_count == 1
+
+        # Unknown flavors trigger a refetch
+        pytest.raises(error.NotFoundError, catalog.flavor, 'hadoop1-7')
+        assert request.call_count == 2
+
+        with patch('time.time', return_value=time.time() + catalog.ttl):
+            catalog.flavors()
+        assert request.call_count == 3
+
+    with patch.object(lavaclient, '_request') as request:
+        request.return_value = stack_response
+        assert catalog.cached_stack('stack_id') is None
+
+        # Stacks fetched by the API are cached
+        lavaclient.stacks.get('stack_id')
+        assert catalog.stack('stack_id').id == 'stack_id'
+        assert request.call_count == 1
+
+        catalog.invalidate()
+        assert catalog.stack('stack_id').id == 'stack_id'
+        assert request.call_count == 2
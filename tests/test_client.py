@@ -1,8 +1,11 @@
 from mock import patch, MagicMock
 import pytest
 import requests
+import threading
+import time
 
 from lavaclient import error
+from lavaclient.concurrency import background
 from lavaclient import __version__
 
 
@@ -150,3 +153,25 @@ def test_request_exception(request, lavaclient):
     )
 
     pytest.raises(error.RequestError, lavaclient._get, 'path')
+
+
+def test_coalesce_gets(lavaclient):
+    release = threading.Event()
+
+    def respond(*args, **kwargs):
+        release.wait(5)
+        return MagicMock(json=MagicMock(return_value={'key': 'value'}))
+
+    with patch('requests.request', side_effect=respond) as request:
+        futures = [background(lavaclient._get, 'path') for _ in range(5)]
+        time.sleep(0.1)
+        release.set()
+
+        assert all(future.result(timeout=5) == {'key': 'value'}
+                   for future in futures)
+        assert request.call_count == 1
+
+        # Different parameters and mutating requests are not coalesced
+        lavaclient._get('path', params={'limit': 1})
+        lavaclient._post('path')
+        assert request.call_count == 3
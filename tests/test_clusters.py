@@ -1,3 +1,5 @@
+import json
+import time
 import pytest
 from mock import patch, MagicMock
 
@@ -46,6 +48,73 @@ def test_api_list(lavaclient, cluster_fixture):
         assert isinstance(resp[0], response.Cluster)
 
 
+def test_api_iter(lavaclient, cluster_fixture):
+    body = json.dumps({'clusters': [cluster_fixture, cluster_fixture]})
+
+    with patch.object(lavaclient, '_request') as request:
+        request.return_value = MagicMock(
+            iter_content=MagicMock(return_value=iter([body[:20], body[20:]])))
+
+        resp = lavaclient.clusters.iter()
+        assert not isinstance(resp, list)
+
+        clusters = list(resp)
+        assert len(clusters) == 2
+        assert all(isinstance(item, response.Cluster) for item in clusters)
+        assert request.call_args[1]['stream'] is True
+        assert request.return_value.close.called
+
+
+def test_api_iter_invalid(lavaclient):
+    with patch.object(lavaclient, '_request') as request:
+        request.return_value = MagicMock(
+            iter_content=MagicMock(return_value=iter(['{"clusters": [{}]}'])))
+        pytest.raises(error.ApiError, list, lavaclient.clusters.iter())
+
+        request.return_value = MagicMock(
+            iter_content=MagicMock(return_value=iter(['{"clusters": [']))
+        )
+        pytest.raises(error.ApiError, list, lavaclient.clusters.iter())
+
+
+def make_pages(cluster, ids, honor_limit=True, honor_marker=True):
+    """Return a fake _request that pages through clusters with the given
+    ids"""
+    def request(method, path, params=None, **kwargs):
+        params = params or {}
+        start = 0
+        if honor_marker and 'marker' in params:
+            start = ids.index(params['marker']) + 1
+
+        end = len(ids)
+        if honor_limit and 'limit' in params:
+            end = start + params['limit']
+
+        return {'clusters': [dict(cluster, id=cluster_id)
+                             for cluster_id in ids[start:end]]}
+
+    return request
+
+
+@pytest.mark.parametrize('honor_limit,honor_marker,requests', [
+    (True, True, 3),
+    (False, True, 1),
+    (True, False, 3),
+])
+def test_api_iter_paged(lavaclient, cluster_fixture, honor_limit,
+                        honor_marker, requests):
+    ids = ['id{0}'.format(i) for i in range(5)]
+
+    with patch.object(lavaclient, '_request') as request:
+        request.side_effect = make_pages(cluster_fixture, ids, honor_limit,
+                                         honor_marker)
+
+        clusters = list(lavaclient.clusters.iter(page_size=2))
+        assert [cluster.id for cluster in clusters] == ids
+        assert request.call_count == requests
+        assert request.call_args_list[0][1]['params'] == {'limit': 2}
+
+
 def test_api_get(lavaclient, cluster_detail_fixture):
     with patch.object(lavaclient, '_request') as request:
         request.return_value = {'cluster': cluster_detail_fixture}
@@ -148,3 +217,200 @@ def test_api_clusters_nodes_property(lavaclient, nodes_response,
         for cluster in clusters:
             nodes = cluster.nodes
             assert all(isinstance(node, response.Node) for node in nodes)
+
+
+def test_api_create_many(lavaclient, cluster_detail_fixture):
+    def create(method, path, json=None, **kwargs):
+        if json['cluster']['name'] == 'bad':
+            raise error.RequestError('Quota exceeded', code=413)
+        elif json['cluster']['name'] == 'broken':
+            raise AttributeError('broken')
+
+        return {'cluster': dict(cluster_detail_fixture,
+                                id=json['cluster']['name'])}
+
+    specs = [{'name': name, 'stack_id': 'stack_id'}
+             for name in ('one', 'bad', 'broken', 'two')]
+    with patch.object(lavaclient, '_request', side_effect=create):
+        result = lavaclient.clusters.create_many(specs, parallelism=2)
+
+    assert not result.ok
+    assert [(spec['name'], cluster.id)
+            for spec, cluster in result.succeeded] == [('one', 'one'),
+                                                       ('two', 'two')]
+    assert [spec['name'] for spec, _ in result.failed] == ['bad', 'broken']
+    assert result.failed[0][1].code == 413
+    assert isinstance(result.failed[1][1], AttributeError)
+
+    # Specs are checked before sending any requests
+    with patch.object(lavaclient, '_request') as request:
+        pytest.raises(error.InvalidError, lavaclient.clusters.create_many,
+                      specs + [{'name': 'name'}])
+        pytest.raises(error.InvalidError, lavaclient.clusters.create_many,
+                      [{'name': 'name', 'stack_id': 'id', 'wait': True}])
+        assert request.call_count == 0
+
+
+def test_api_resize_many(lavaclient, cluster_detail_fixture):
+    def resize(method, path, **kwargs):
+        if path.endswith('other'):
+            raise error.RequestError('Cluster not found', code=404)
+
+        return {'cluster': cluster_detail_fixture}
+
+    with patch.object(lavaclient, '_request', side_effect=resize) as request:
+        result = lavaclient.clusters.resize_many([
+            {'cluster_id': 'cluster_id',
+             'node_groups': {'slave': {'count': 2}}},
+            {'cluster_id': 'other', 'node_groups': {'slave': {'count': 3}}},
+        ])
+
+    assert len(result.succeeded) == 1
+    assert isinstance(result.succeeded[0][1], response.ClusterDetail)
+    assert result.failed[0][0]['cluster_id'] == 'other'
+    assert request.call_count == 2
+
+    # Node groups are checked before sending any requests, including those
+    # of the quota check
+    with patch.object(lavaclient, '_request') as request:
+        for node_groups in ({'slave': {}}, [], [{'count': 1}],
+                            {'slave': {'count': 'many'}}):
+            pytest.raises(error.InvalidError, lavaclient.clusters.resize_many,
+                          [{'cluster_id': 'cluster_id',
+                            'node_groups': node_groups}],
+                          check_quota='error')
+        assert request.call_count == 0
+
+
+def test_api_delete_many(lavaclient):
+    with patch.object(lavaclient, '_request') as request:
+        result = lavaclient.clusters.delete_many(
+            ['cluster_{0}'.format(i) for i in range(20)], parallelism=5)
+
+    assert result.ok
+    assert len(result.succeeded) == 20
+    assert request.call_count == 20
+
+
+@patch('time.sleep', MagicMock())
+def test_api_wait_many(lavaclient, cluster_fixture):
+    def clusters(**statuses):
+        return {'clusters': [dict(cluster_fixture, id=cluster_id,
+                                  status=status)
+                             for cluster_id, status in statuses.items()]}
+
+    with patch.object(lavaclient, '_request') as request:
+        request.side_effect = [
+            clusters(a='BUILDING', b='BUILDING', c='BUILDING'),
+            clusters(a='ACTIVE', b='BUILDING', c='ERROR'),
+            clusters(a='ACTIVE', b='ACTIVE', c='ERROR'),
+        ]
+        result = lavaclient.clusters.wait_many(['a', 'b', 'c', 'd'])
+
+    assert request.call_count == 3
+    assert [(cluster_id, cluster.status)
+            for cluster_id, cluster in result.succeeded] == [('a', 'ACTIVE'),
+                                                             ('b', 'ACTIVE')]
+    assert [(cluster_id, type(exc))
+            for cluster_id, exc in result.failed] == [
+                ('c', error.FailedError), ('d', error.NotFoundError)]
+
+
+@patch('time.sleep', MagicMock())
+def test_api_create_many_wait(lavaclient, cluster_detail_fixture,
+                              cluster_fixture):
+    def request(method, path, **kwargs):
+        if method == 'POST':
+            return {'cluster': dict(cluster_detail_fixture,
+                                    id=kwargs['json']['cluster']['name'],
+                                    status='BUILDING')}
+
+        return {'clusters': [dict(cluster_fixture, id='one',
+                                  status='ACTIVE')]}
+
+    specs = [{'name': name, 'stack_id': 'stack_id'}
+             for name in ('one', 'two')]
+    with patch.object(lavaclient, '_request', side_effect=request):
+        result = lavaclient.clusters.create_many(specs, wait=True)
+
+    assert [(spec['name'], cluster.status)
+            for spec, cluster in result.succeeded] == [('one', 'ACTIVE')]
+    assert [spec['name'] for spec, _ in result.failed] == ['two']
+    assert isinstance(result.failed[0][1], error.NotFoundError)
+
+
+def test_api_stack_constraints(lavaclient, stack_detail, flavor,
+                               cluster_detail_fixture):
+    # Nothing is checked unless the stack is cached
+    with patch.object(lavaclient, '_request') as request:
+        request.return_value = {'cluster': cluster_detail_fixture}
+        lavaclient.clusters.create('name', 'stack_id',
+                                   node_groups={'id': {'count': 50}})
+        assert request.call_count == 1
+
+    small = dict(flavor, id='hadoop1-1', ram=512)
+    lavaclient.catalog.update_stack(response.StackDetail(stack_detail))
+    lavaclient.catalog.update_flavors([response.Flavor(flavor),
+                                       response.Flavor(small)])
+
+    with patch.object(lavaclient, '_request') as request:
+        request.return_value = {'cluster': cluster_detail_fixture}
+
+        for node_groups in ({'id': {'count': 11}},
+                            {'id': {'count': 0}},
+                            {'other': {'count': 1}},
+                            {'id': {'flavor_id': 'hadoop1-1'}},
+                            {'id': {'flavor_id': 'unknown'}}):
+            pytest.raises(error.InvalidError, lavaclient.clusters.create,
+                          'name', 'stack_id', node_groups=node_groups)
+        assert request.call_count == 0
+
+        lavaclient.clusters.create(
+            'name', 'stack_id',
+            node_groups={'id': {'count': 5, 'flavor_id': 'hadoop1-15'}})
+        assert request.call_count == 1
+
+        # Resizes are checked once the cluster's stack is known
+        lavaclient.clusters.get('cluster_id')
+        pytest.raises(error.InvalidError, lavaclient.clusters.resize,
+                      'cluster_id', {'id': {'count': 11}})
+        assert request.call_count == 2
+
+
+def test_api_cluster_topology(lavaclient, cluster_response, nodes_response):
+    def request(method, path, **kwargs):
+        return nodes_response if path.endswith('/nodes') else cluster_response
+
+    catalog = lavaclient.catalog
+    with patch.object(lavaclient, '_request', side_effect=request) as req:
+        topology = lavaclient.clusters.topology('cluster_id')
+        assert topology.cluster.id == 'cluster_id'
+        assert [node.name for node in topology.nodes] == ['NODENAME']
+        assert topology.node('nodename') is topology.nodes[0]
+        assert req.call_count == 2
+
+        # The cluster and its nodes are cached for a short time
+        assert lavaclient.clusters.topology('cluster_id') is topology
+        assert req.call_count == 2
+
+        with patch('time.time',
+                   return_value=time.time() + catalog.topology_ttl):
+            lavaclient.clusters.topology('cluster_id')
+        assert req.call_count == 4
+
+        # Resizing invalidates the cache
+        lavaclient.clusters.resize('cluster_id', [{'id': 'slave',
+                                                   'count': 3}])
+        lavaclient.clusters.topology('cluster_id')
+        assert req.call_count == 7
+
+        # Lookups made while the resize request is in flight are not kept
+        def resize(method, path, **kwargs):
+            if method == 'PUT':
+                lavaclient.clusters.topology('cluster_id')
+            return request(method, path, **kwargs)
+
+        req.side_effect = resize
+        lavaclient.clusters.resize('cluster_id', [{'id': 'slave',
+                                                   'count': 3}])
+        assert catalog.cached_topology('cluster_id') is None
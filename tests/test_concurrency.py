@@ -0,0 +1,139 @@
+import pytest
+import threading
+import time
+
+from lavaclient import concurrency, deadlines, error
+
+
+def test_background():
+    future = concurrency.background(lambda x, y: x + y, 1, y=2)
+    assert future.result(timeout=5) == 3
+    assert future.done()
+
+
+def test_background_exception():
+    def fail():
+        raise ValueError('failed')
+
+    future = concurrency.background(fail)
+    pytest.raises(ValueError, future.result, 5)
+
+
+def test_background_timeout():
+    event = threading.Event()
+    future = concurrency.background(event.wait)
+    pytest.raises(error.TimeoutError, future.result, 0.01)
+
+    event.set()
+    assert future.result(timeout=5)
+
+
+def test_single_flight():
+    flight = concurrency.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def call(value):
+        calls.append(value)
+        started.set()
+        release.wait(5)
+        return value
+
+    leader = concurrency.background(flight.call, 'key', call, 1)
+    started.wait(5)
+    followers = [concurrency.background(flight.call, 'key', call, 2)
+                 for _ in range(3)]
+    assert flight.call('other', lambda: 'other') == 'other'
+
+    time.sleep(0.1)
+    release.set()
+    assert leader.result(timeout=5) == 1
+    assert [future.result(timeout=5) for future in followers] == [1, 1, 1]
+    assert calls == [1]
+
+    # Once the call has completed, the key can be reused
+    assert flight.call('key', lambda: 3) == 3
+
+
+def test_single_flight_exception():
+    flight = concurrency.SingleFlight()
+
+    def fail():
+        raise ValueError('failed')
+
+    pytest.raises(ValueError, flight.call, 'key', fail)
+    assert flight.call('key', lambda: 1) == 1
+
+
+def test_single_flight_interrupted():
+    flight = concurrency.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def interrupted():
+        started.set()
+        release.wait(5)
+        raise KeyboardInterrupt()
+
+    leader = concurrency.background(
+        lambda: pytest.raises(KeyboardInterrupt, flight.call, 'key',
+                              interrupted))
+    started.wait(5)
+    follower = concurrency.background(
+        lambda: pytest.raises(KeyboardInterrupt, flight.call, 'key',
+                              lambda: 1))
+
+    time.sleep(0.1)
+    release.set()
+    leader.result(timeout=5)
+    follower.result(timeout=5)
+
+
+def test_single_flight_deadline():
+    flight = concurrency.SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_call():
+        started.set()
+        release.wait(5)
+        raise error.TimeoutError('Deadline passed')
+
+    leader = concurrency.background(flight.call, 'key', leader_call)
+    started.wait(5)
+
+    # A follower whose own deadline has not passed makes its own call
+    with deadlines.deadline(60):
+        follower = concurrency.background(flight.call, 'key', lambda: 1)
+
+    time.sleep(0.1)
+    release.set()
+    pytest.raises(error.TimeoutError, leader.result, 5)
+    assert follower.result(timeout=5) == 1
+
+
+def test_map_bounded():
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def call(value):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+
+        if value == 3:
+            raise ValueError(value)
+        return value * 2
+
+    futures = concurrency.map_bounded(call, range(10), 3)
+    assert [future.result(timeout=5) for future in futures[:3]] == [0, 2, 4]
+    pytest.raises(ValueError, futures[3].result, 5)
+    assert [future.result(timeout=5) for future in futures[4:]] == [
+        8, 10, 12, 14, 16, 18]
+    assert running[1] <= 3
+
+    pytest.raises(error.InvalidError, concurrency.map_bounded, call, [], 0)
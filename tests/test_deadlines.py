@@ -0,0 +1,91 @@
+import pytest
+import requests
+from mock import patch, MagicMock
+
+from lavaclient import deadlines, error, util
+from lavaclient.concurrency import background
+from lavaclient.retries import RetryPolicy
+
+
+def test_deadline():
+    assert deadlines.current() is None
+    assert deadlines.request_timeout(5) == 5
+
+    with patch('time.time', return_value=100):
+        with deadlines.deadline(10, timeout=(1, 30)) as outer:
+            assert outer.expires == 110
+            assert deadlines.request_timeout(5) == (1, 10)
+
+            # Nested deadlines can not extend the outer one
+            with deadlines.deadline(60) as inner:
+                assert inner.expires == 110
+                assert inner.timeout == (1, 30)
+
+            with deadlines.deadline(timeout=3):
+                assert deadlines.remaining() == 10
+                assert deadlines.request_timeout() == 3
+
+        with deadlines.deadline(0):
+            pytest.raises(error.TimeoutError, deadlines.check)
+            pytest.raises(error.TimeoutError, deadlines.request_timeout)
+
+    assert deadlines.current() is None
+
+
+def test_propagate():
+    with deadlines.deadline(10) as current:
+        future = background(deadlines.current)
+
+    assert future.result() is current
+
+
+def test_client_deadline(lavaclient):
+    lavaclient._timeout = 30
+    lavaclient._retry_policy = RetryPolicy(delay=10, jitter=False)
+
+    with patch('requests.request') as request:
+        request.return_value = MagicMock(json=MagicMock(return_value={}))
+        lavaclient._get('clusters')
+        assert request.call_args[1]['timeout'] == 30
+
+        with lavaclient.deadline(5):
+            lavaclient._get('clusters')
+        assert request.call_args[1]['timeout'] <= 5
+
+        # Retries that would exceed the deadline are not made
+        request.reset_mock()
+        request.side_effect = requests.exceptions.ConnectionError()
+        with lavaclient.deadline(5):
+            pytest.raises(error.RequestError, lavaclient._get, 'clusters')
+        assert request.call_count == 1
+
+        request.reset_mock()
+        with lavaclient.deadline(0):
+            pytest.raises(error.TimeoutError, lavaclient._get, 'clusters')
+        assert not request.called
+
+
+@patch('time.sleep', MagicMock())
+def test_wait_deadline(lavaclient, cluster_response):
+    cluster_response['cluster']['status'] = 'BUILDING'
+
+    with patch.object(lavaclient, '_request') as request:
+        request.return_value = cluster_response
+        # The next poll would be after the deadline
+        with lavaclient.deadline(20):
+            pytest.raises(error.TimeoutError, lavaclient.clusters.wait,
+                          'cluster_id', interval=30)
+
+    assert request.call_count == 1
+
+
+@patch('subprocess.Popen')
+def test_ssh_deadline(popen):
+    popen.return_value = MagicMock(
+        returncode=0, communicate=MagicMock(return_value=('output', None)))
+
+    with deadlines.deadline(9.5):
+        assert util.ssh_to_host('user', 'host', command='ls') == 'output'
+
+    assert popen.call_args[0][0] == ['ssh', '-o', 'ConnectTimeout=10',
+                                     'user@host', 'ls']
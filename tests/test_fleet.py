@@ -0,0 +1,57 @@
+from mock import MagicMock
+
+from lavaclient.api import response
+from lavaclient import fleet, error
+
+
+def make_client(cluster, cluster_detail, node):
+    client = MagicMock()
+    client.clusters.get.side_effect = lambda cluster_id: (
+        response.ClusterDetail(dict(cluster_detail, id=cluster_id)))
+    client.nodes.list.side_effect = lambda cluster_id: [
+        response.Node(dict(node, id=cluster_id + '-node'))]
+
+    def set_clusters(*clusters):
+        client.clusters.list.return_value = [
+            response.Cluster(dict(cluster, **attrs)) for attrs in clusters]
+
+    return client, set_clusters
+
+
+def test_sync(cluster, cluster_detail, node):
+    client, set_clusters = make_client(cluster, cluster_detail, node)
+    sync = fleet.FleetSync(client)
+
+    set_clusters({'id': 'a'}, {'id': 'b'})
+    deltas = sync.sync()
+    assert sorted((d.action, d.cluster_id) for d in deltas) == [
+        ('added', 'a'), ('added', 'b')]
+    assert client.clusters.get.call_count == 2
+    assert sorted(sync.snapshot) == ['a', 'b']
+    assert sync.nodes.cluster_id('a-node') == 'a'
+
+    # Nothing changed; no detail requests
+    assert sync.sync() == []
+    assert client.clusters.get.call_count == 2
+    assert client.nodes.list.call_count == 2
+
+    set_clusters({'id': 'a', 'updated': '2015-01-01'}, {'id': 'c'})
+    deltas = sync.sync()
+    assert sorted((d.action, d.cluster_id) for d in deltas) == [
+        ('added', 'c'), ('changed', 'a'), ('removed', 'b')]
+    assert client.clusters.get.call_count == 4
+    assert sorted(item.id for item in sync.clusters) == ['a', 'c']
+    assert sync.nodes.get('b-node') is None
+
+    changed = next(d for d in deltas if d.action == 'changed')
+    assert changed.old.cluster.id == changed.new.cluster.id == 'a'
+
+
+def test_sync_deleted_during_sync(cluster, cluster_detail, node):
+    client, set_clusters = make_client(cluster, cluster_detail, node)
+    client.clusters.get.side_effect = error.RequestError('gone', code=404)
+
+    sync = fleet.FleetSync(client, nodes=False)
+    set_clusters({'id': 'a'})
+    assert sync.sync() == []
+    assert sync.snapshot == {}
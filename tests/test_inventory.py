@@ -0,0 +1,135 @@
+import pytest
+from datetime import datetime
+from mock import patch
+
+from lavaclient.api import response
+from lavaclient import inventory, error
+
+
+@pytest.fixture
+def clusters(cluster):
+    return [
+        response.Cluster(dict(cluster, id='1', name='etl-1', status='ACTIVE',
+                              created='2015-01-01')),
+        response.Cluster(dict(cluster, id='2', name='etl-2', status='ERROR',
+                              created='2015-02-01')),
+        response.Cluster(dict(cluster, id='3', name='adhoc', status='ACTIVE',
+                              created='2015-03-01', stack_id='other')),
+    ]
+
+
+def ids(items):
+    return sorted(item.id for item in items)
+
+
+def test_cluster_query(clusters):
+    inv = inventory.ClusterInventory(clusters)
+
+    assert len(inv) == 3
+    assert ids(inv.query(status='ACTIVE')) == ['1', '3']
+    assert ids(inv.query(status__in=['ERROR', 'BUILDING'])) == ['2']
+    assert ids(inv.query(name__prefix='etl-')) == ['1', '2']
+    assert ids(inv.query(name='adhoc')) == ['3']
+    assert ids(inv.query(created__gte=datetime(2015, 2, 1))) == ['2', '3']
+    assert ids(inv.query(created__gt=datetime(2015, 2, 1))) == ['3']
+    assert ids(inv.query(created__lt=datetime(2015, 2, 1))) == ['1']
+    assert ids(inv.query(created__lte=datetime(2015, 2, 1))) == ['1', '2']
+    assert ids(inv.query(status='ACTIVE', stack_id='stack_id')) == ['1']
+    assert ids(inv.query(status='BUILDING')) == []
+
+    # Unindexed attributes and predicates
+    assert ids(inv.query(cbd_version=1)) == ['1', '2', '3']
+    assert ids(inv.filter(lambda item: item.id != '1',
+                          status='ACTIVE')) == ['3']
+
+
+def test_cluster_refresh(clusters, cluster):
+    loaded = [clusters]
+    inv = inventory.ClusterInventory(clusters, loader=lambda: loaded[0])
+
+    updated = response.Cluster(dict(cluster, id='1', name='etl-1',
+                                    status='ERROR', created='2015-01-01'))
+    loaded[0] = [updated, clusters[2]]
+    inv.refresh()
+
+    assert '2' not in inv
+    assert inv.get('1') is updated
+    assert ids(inv.query(status='ERROR')) == ['1']
+    assert ids(inv.query(status='ACTIVE')) == ['3']
+    assert ids(inv.query(name__prefix='etl')) == ['1']
+
+    pytest.raises(error.InvalidError, inventory.ClusterInventory().refresh)
+
+
+def test_node_inventory(node):
+    nodes = [
+        response.Node(dict(node, id='a', name='MASTER-1', node_group='master',
+                           components=[{'name': 'ResourceManager'}])),
+        response.Node(dict(node, id='b', name='slave-1', node_group='slave',
+                           components=[{'name': 'NodeManager'},
+                                       {'name': 'DataNode'}])),
+    ]
+
+    inv = inventory.NodeInventory()
+    inv.update_cluster('cluster1', nodes)
+    inv.update_cluster('cluster2', [
+        response.Node(dict(node, id='c', name='slave-1', node_group='slave',
+                           components=[]))])
+
+    assert inv.by_name('master-1') is nodes[0]
+    assert inv.by_name('missing') is None
+    assert ids(inv.query(name='master-1')) == ['a']
+    assert ids(inv.query(name__prefix='Master')) == ['a']
+    assert ids(inv.query(name__in=['SLAVE-1'])) == ['b', 'c']
+    assert ids(inv.query(component='DataNode')) == ['b']
+    assert ids(inv.query(node_group='slave')) == ['b', 'c']
+    assert ids(inv.query(node_group='slave', cluster_id='cluster2')) == ['c']
+    assert inv.cluster_id('a') == 'cluster1'
+
+    inv.update_cluster('cluster1', nodes[:1])
+    assert ids(inv.query(cluster_id='cluster1')) == ['a']
+    assert inv.cluster_id('b') is None
+
+    inv.remove_cluster('cluster2')
+    assert ids(inv) == ['a']
+
+
+def test_nodes_resource_inventory(lavaclient, nodes_response):
+    with patch.object(lavaclient.nodes, 'list') as list_nodes:
+        list_nodes.return_value = [response.Node(item) for item in
+                                   nodes_response['nodes']]
+        inv = lavaclient.nodes.inventory(['cluster1'])
+
+    assert len(inv) == len(nodes_response['nodes'])
+    list_nodes.assert_called_once_with('cluster1')
+
+
+def test_cluster_topology(cluster_detail, node):
+    def make_node(node_id, name, node_group, status, *components):
+        return response.Node(dict(
+            node, id=node_id, name=name, node_group=node_group,
+            status=status, components=list(components)))
+
+    topology = inventory.ClusterTopology(
+        response.ClusterDetail(cluster_detail), [
+            make_node('a', 'master-1', 'master', 'ACTIVE',
+                      {'name': 'ResourceManager',
+                       'uri': 'http://master-1:8088'},
+                      {'name': 'NameNode', 'uri': 'hdfs://master-1'}),
+            make_node('b', 'slave-1', 'slave', 'ACTIVE',
+                      {'name': 'DataNode'}),
+            make_node('c', 'slave-2', 'slave', 'BUILD',
+                      {'name': 'DataNode'}),
+        ])
+
+    assert topology.node().id == 'a'
+    assert topology.node('SLAVE-1').id == 'b'
+    pytest.raises(error.InvalidError, topology.node, 'slave-2')
+    pytest.raises(error.InvalidError, topology.node, 'gateway-1')
+
+    assert topology.component_node('ResourceManager').id == 'a'
+    assert topology.component_node('HiveServer2') is None
+    assert ids(topology.component_nodes('DataNode')) == ['b', 'c']
+    assert ids(topology.node_group('slave')) == ['b', 'c']
+    assert topology.uri_node('hdfs://master-1').id == 'a'
+    assert topology.uris('http') == ['http://master-1:8088']
@@ -0,0 +1,90 @@
+import pytest
+import requests
+from mock import patch, MagicMock
+
+from lavaclient import error, hooks
+from lavaclient.metrics import Metrics, Histogram, endpoint
+
+
+def test_endpoint():
+    assert endpoint('clusters') == 'clusters'
+    assert endpoint('/clusters/1234/nodes') == 'clusters/{id}/nodes'
+    assert endpoint('credentials/ssh_keys/key') == 'credentials/ssh_keys/{id}'
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(1, 2))
+    for value in (0.5, 1, 1.5, 3):
+        histogram.observe(value)
+
+    assert histogram.cumulative() == [(1, 2), (2, 3), (float('inf'), 4)]
+    assert histogram.sum == 6
+
+
+def test_hooks(lavaclient, cluster_response):
+    calls = []
+
+    def record(event):
+        return lambda **kwargs: calls.append((event, kwargs))
+
+    for event in sorted(hooks.EVENTS):
+        lavaclient.hooks.register(event, record(event))
+    lavaclient.hooks.register(hooks.BEFORE_REQUEST, MagicMock(
+        side_effect=Exception))
+
+    with patch('requests.request') as request:
+        request.return_value = MagicMock(
+            status_code=200, content=b'{}',
+            json=MagicMock(return_value=cluster_response))
+        lavaclient.clusters.get('cluster_id')
+
+    assert [event for event, _ in calls] == [
+        'before_request', 'after_response', 'after_parse']
+    assert calls[0][1]['path'] == 'clusters/cluster_id'
+    assert calls[1][1]['response_bytes'] == 2
+
+    pytest.raises(error.InvalidError, lavaclient.hooks.register, 'invalid',
+                  record('invalid'))
+
+
+def test_metrics(lavaclient, cluster_response):
+    metrics = Metrics(buckets=(10,)).attach(lavaclient)
+    lavaclient._authenticate = MagicMock()
+
+    with patch('requests.request') as request:
+        request.side_effect = [
+            MagicMock(status_code=401, content=b'',
+                      raise_for_status=MagicMock(
+                          side_effect=requests.exceptions.HTTPError(
+                              response=MagicMock(status_code=401)))),
+            MagicMock(status_code=200, content=b'{}',
+                      json=MagicMock(return_value=cluster_response)),
+            requests.exceptions.ConnectionError(),
+        ]
+        lavaclient._token = None
+        lavaclient.clusters.get('cluster_id')
+        pytest.raises(error.RequestError, lavaclient._post, 'clusters',
+                      json={'a': 1})
+
+    snapshot = metrics.snapshot()
+    (cluster,) = [item for item in snapshot['requests']
+                  if item['endpoint'] == 'clusters/{id}']
+    assert cluster['method'] == 'GET'
+    assert cluster['latency']['count'] == 2
+    assert cluster['responses'] == {200: 1, 401: 1}
+    assert cluster['response_bytes'] == 2
+    assert cluster['retries'] == 1
+    assert snapshot['parse']['ClusterResponse']['count'] == 1
+    assert snapshot['reauth']['latency']['count'] == 1
+    assert snapshot['errors'] == [{'method': 'POST', 'endpoint': 'clusters',
+                                   'error': 'RequestError', 'count': 1}]
+
+    text = metrics.prometheus()
+    assert ('lavaclient_request_duration_seconds_bucket{method="GET",'
+            'endpoint="clusters/{id}",le="+Inf"} 2') in text
+    assert ('lavaclient_responses_total{method="GET",endpoint="clusters/{id}",'
+            'code="401"} 1') in text
+    assert 'lavaclient_reauthentication_failures_total 0' in text
+
+    metrics.detach(lavaclient)
+    assert hooks.AFTER_RESPONSE not in lavaclient.hooks
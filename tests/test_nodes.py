@@ -16,3 +16,21 @@ def test_list(lavaclient, nodes_response):
         assert isinstance(resp, list)
         assert len(resp) == 1
         assert all(isinstance(item, response.Node) for item in resp)
+
+
+def test_list_fields(lavaclient, nodes_response):
+    nodes_response['nodes'][0]['created'] = 'invalid date'
+
+    with patch.object(lavaclient, '_request') as request:
+        request.return_value = nodes_response
+        resp = lavaclient.nodes.list('cluster_id',
+                                     fields=['name', 'public_ip'])
+
+    node = resp[0]
+    assert isinstance(node, response.Node)
+    assert (node.name, node.public_ip) == ('NODENAME', '1.2.3.4')
+    assert node.to_dict() == {
+        'name': 'NODENAME',
+        'addresses': {'public': [{'address': '1.2.3.4', 'version': '4.0'}]}}
+    assert not hasattr(node, 'created')
+    assert not hasattr(node, 'private_ip')
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+from mock import patch, MagicMock
+
+from lavaclient import error
+from lavaclient.client import Lava
+from lavaclient.pool import LavaPool, TokenCache, Target
+
+
+@pytest.fixture
+def authenticate():
+    def url_for(region_name, **kwargs):
+        return 'https://{0}.example.com/v2/tenant'.format(region_name.lower())
+
+    with patch.object(Lava, '_authenticate') as auth:
+        auth.return_value = MagicMock(
+            auth_token='auth_token',
+            service_catalog=MagicMock(url_for=MagicMock(side_effect=url_for)))
+        yield auth
+
+
+def test_token_cache():
+    cache = TokenCache()
+    authenticate = MagicMock(side_effect=['first', 'second'])
+
+    assert cache.get('key', authenticate) == 'first'
+    assert cache.get('key', authenticate) == 'first'
+    assert authenticate.call_count == 1
+
+    assert cache.refresh('key', 'first', authenticate) == 'second'
+    assert cache.refresh('key', 'first', authenticate) == 'second'
+    assert authenticate.call_count == 2
+
+
+def test_pool(authenticate):
+    pool = LavaPool('username', api_key='api_key',
+                    regions=['DFW', 'ORD', 'LON'], tenant_ids=['tenant'])
+    pool.add('HKG', 'other', api_key='other_key')
+
+    assert pool.targets == [Target('DFW', 'tenant'), Target('ORD', 'tenant'),
+                            Target('LON', 'tenant'), Target('HKG', 'other')]
+    pytest.raises(error.InvalidError, pool.add, 'DFW', 'tenant')
+    pytest.raises(error.InvalidError, pool.client, 'SYD', 'tenant')
+
+    # Every client is called at the same time
+    started = []
+    all_started = threading.Event()
+
+    def endpoint(client):
+        started.append(client)
+        if len(started) == 4:
+            all_started.set()
+
+        assert all_started.wait(5)
+        return client.endpoint
+
+    result = pool.map(endpoint)
+    assert result.ok
+    assert [endpoint for _, endpoint in result.succeeded] == [
+        'https://{0}.example.com/v2/tenant'.format(region)
+        for region in ('dfw', 'ord', 'lon', 'hkg')]
+
+    # One authentication for each set of credentials
+    assert authenticate.call_count == 2
+    assert pool.client('DFW', 'tenant') is pool.client('DFW', 'tenant')
+    assert pool.client('HKG', 'other')._api_key == 'other_key'
+    assert pool.client('DFW', 'tenant')._session is pool.session
+
+
+def test_pool_fan_out(authenticate, cluster_response):
+    pool = LavaPool('username', api_key='api_key',
+                    regions=['DFW', 'ORD', 'IAD'])
+    clusters = {'clusters': [cluster_response['cluster']]}
+
+    with patch.object(pool.session, 'request') as request:
+        request.return_value = MagicMock(
+            status_code=200, json=MagicMock(return_value=clusters))
+        pool.client('ORD').clusters.list = MagicMock(
+            side_effect=error.RequestError('Unavailable'))
+        pool.client('IAD').clusters.list = MagicMock(
+            side_effect=KeyError('clusters'))
+
+        result = pool.clusters.list()
+
+    assert not result.ok
+    assert [(target.region, cluster.id)
+            for target, cluster in result.items()] == [
+                ('DFW', 'cluster_id')]
+    assert [(target.region, str(exc)) for target, exc in result.failed] == [
+        ('ORD', 'Unavailable'), ('IAD', "'clusters'")]
+
+    records = list(result.records())
+    assert [(record['item'], record['outcome']) for record in records] == [
+        ({'region': 'DFW', 'tenant_id': None}, 'succeeded'),
+        ({'region': 'ORD', 'tenant_id': None}, 'failed'),
+        ({'region': 'IAD', 'tenant_id': None}, 'failed')]
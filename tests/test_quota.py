@@ -0,0 +1,109 @@
+import pytest
+from mock import patch
+
+from lavaclient.quota import QuotaChecker, Usage
+from lavaclient import error
+
+
+@pytest.fixture
+def api(request, lavaclient, flavor, flavors_response, stack_response,
+        cluster_response, limits_response):
+    small = dict(flavor, id='hadoop1-7', ram=7680, disk=1500, vcpus=2)
+    flavors_response['flavors'].append(small)
+    cluster_response['cluster']['node_groups'][0]['flavor_id'] = 'hadoop1-7'
+    stack_response['stack']['node_groups'][0]['resource_limits'].update(
+        max_count=100)
+
+    limits = limits_response['limits']['absolute']
+    limits['node_count'] = {'limit': 20, 'remaining': 12}
+    for name in ('ram', 'disk', 'vcpus'):
+        limits[name] = {'limit': 10 ** 6, 'remaining': 10 ** 6}
+
+    responses = {
+        'flavors': flavors_response,
+        'stacks/stack_id': stack_response,
+        'clusters/cluster_id': cluster_response,
+        'limits': limits_response,
+    }
+
+    def respond(method, path, **kwargs):
+        if method != 'GET':
+            return cluster_response
+        return responses[path.strip('/')]
+
+    patcher = patch.object(lavaclient, '_request', side_effect=respond)
+    request.addfinalizer(patcher.stop)
+    return patcher.start()
+
+
+def test_create_usage(lavaclient, api):
+    checker = QuotaChecker(lavaclient)
+
+    # Stack defaults: 10 x hadoop1-7
+    assert checker.create_usage('stack_id') == Usage(10, 76800, 15000, 20)
+    assert checker.create_usage(
+        'stack_id', {'id': {'count': 2, 'flavor_id': 'hadoop1-15'}}) == \
+        Usage(2, 30720, 5000, 8)
+
+    # Stacks and flavors are only fetched once
+    paths = [args[1] for args, _ in api.call_args_list]
+    assert paths.count('stacks/stack_id') == 1
+    assert paths.count('/flavors') == 1
+
+
+def test_resize_usage(lavaclient, api):
+    checker = QuotaChecker(lavaclient)
+
+    assert checker.resize_usage('cluster_id', [{'id': 'id', 'count': 3}]) \
+        == Usage(2, 15360, 3000, 4)
+    assert checker.resize_usage('cluster_id', {'id': {'count': 0}}) == \
+        Usage(-1, -7680, -1500, -2)
+    pytest.raises(error.InvalidError, checker.resize_usage, 'cluster_id',
+                  {'other': {'count': 1}})
+
+    # Changing the flavor of existing nodes: hadoop1-7 to hadoop1-15
+    assert checker.resize_usage(
+        'cluster_id', {'id': {'count': 1, 'flavor_id': 'hadoop1-15'}}) == \
+        Usage(0, 7680, 1000, 2)
+    assert checker.resize_usage(
+        'cluster_id', {'id': {'count': 3, 'flavor_id': 'hadoop1-15'}}) == \
+        Usage(2, 38400, 6000, 10)
+
+
+def test_check(lavaclient, api):
+    checker = QuotaChecker(lavaclient)
+
+    assert checker.check(Usage(12, 0, 0, 0)) == []
+    pytest.raises(error.QuotaError, checker.check, [Usage(10, 0, 0, 0),
+                                                    Usage(10, 0, 0, 0)])
+    assert checker.check(Usage(13, 0, 0, 0), mode='warn') == [
+        'node_count: 13 requested, 12 remaining']
+    pytest.raises(error.InvalidError, checker.check, Usage.zero(), 'x')
+
+
+def test_create_check_quota(lavaclient, api):
+    pytest.raises(error.QuotaError, lavaclient.clusters.create, 'name',
+                  'stack_id', node_groups={'id': {'count': 13}},
+                  check_quota='error')
+    assert not any(args[0] == 'POST' for args, _ in api.call_args_list)
+
+    lavaclient.clusters.create('name', 'stack_id', check_quota='error')
+    lavaclient.clusters.create('name', 'stack_id',
+                               node_groups={'id': {'count': 13}},
+                               check_quota='warn')
+    assert sum(args[0] == 'POST' for args, _ in api.call_args_list) == 2
+
+    pytest.raises(error.QuotaError, lavaclient.clusters.resize, 'cluster_id',
+                  {'id': {'count': 14}}, check_quota='error')
+
+
+def test_create_many_check_quota(lavaclient, api):
+    specs = [{'name': name, 'stack_id': 'stack_id'} for name in 'ab']
+
+    # Each cluster fits on its own, but not both together
+    pytest.raises(error.QuotaError, lavaclient.clusters.create_many, specs,
+                  check_quota='error')
+    assert not any(args[0] == 'POST' for args, _ in api.call_args_list)
+
+    result = lavaclient.clusters.create_many(specs[:1], check_quota='error')
+    assert result.ok
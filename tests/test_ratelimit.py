@@ -0,0 +1,154 @@
+import pytest
+import requests
+from mock import patch, MagicMock
+
+from lavaclient import error
+from lavaclient.client import Lava
+from lavaclient.ratelimit import (TokenBucket, FileTokenBucket, RateLimiter,
+                                  verb_class)
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    with patch('time.time', clock.time), patch('time.sleep', clock.sleep):
+        yield clock
+
+
+def response(status, headers=None):
+    return MagicMock(status_code=status, headers=headers or {})
+
+
+def http_error(status):
+    return requests.exceptions.HTTPError(response=response(status))
+
+
+def test_verb_class():
+    assert verb_class('get') == 'read'
+    assert verb_class('POST') == 'write'
+
+
+def test_acquire(clock):
+    bucket = TokenBucket(rate=2, burst=2)
+
+    # The burst is available immediately, then tokens arrive at the rate
+    assert [bucket.acquire() for _ in range(4)] == [0, 0, 0.5, 0.5]
+
+    clock.sleep(10)
+    assert [bucket.acquire() for _ in range(3)] == [0, 0, 0.5]
+
+    with pytest.raises(error.TimeoutError):
+        bucket.acquire(timeout=0.1)
+
+    pytest.raises(error.InvalidError, TokenBucket, 0)
+
+
+def test_throttle(clock):
+    bucket = TokenBucket(rate=4, increase=1)
+
+    bucket.throttle(wait=3)
+    assert bucket.rate == 2
+    assert bucket.acquire() == 3.5
+
+    bucket.recover()
+    bucket.recover()
+    bucket.recover()
+    assert bucket.rate == 4
+
+    bucket.block(1)
+    assert bucket.rate == 4
+    assert bucket.acquire() == 1.25
+
+
+def test_file_bucket(clock, tmpdir):
+    path = str(tmpdir.join('bucket'))
+    first = FileTokenBucket(path, rate=1, burst=1, increase=0.25)
+    second = FileTokenBucket(path, rate=1, burst=1, increase=0.25)
+
+    assert first.acquire() == 0
+    assert second.acquire() == 1
+
+    first.throttle()
+    assert second.rate == 0.5
+    second.recover()
+    assert first.rate == 0.75
+
+
+def test_rate_limiter(clock, tmpdir):
+    limiter = RateLimiter(rate=1, rates={'clusters/{id}': 2})
+
+    assert limiter.bucket('GET', 'clusters/1') is limiter.bucket(
+        'HEAD', 'clusters/2')
+    assert limiter.bucket('GET', 'clusters/1') is not limiter.bucket(
+        'PUT', 'clusters/1')
+    assert limiter.bucket('GET', 'clusters/1').max_rate == 2
+    assert limiter.bucket('GET', 'clusters').max_rate == 1
+
+    limiter.update('GET', 'clusters', response(429, {'Retry-After': '5'}))
+    assert limiter.bucket('GET', 'clusters').rate == 0.5
+    limiter.acquire('GET', 'clusters')
+    assert clock.now == 1007.0
+
+    limiter.update('GET', 'clusters', response(200))
+    assert limiter.bucket('GET', 'clusters').rate == pytest.approx(0.52)
+
+    limiter = RateLimiter(rate=1, shared_dir=str(tmpdir))
+    limiter.acquire('GET', 'clusters/1/nodes')
+    assert tmpdir.join('read-clusters_id_nodes.bucket').check()
+
+
+def test_client_rate_limit(lavaclient, clock):
+    lavaclient._rate_limiter = RateLimiter(rate=1)
+
+    with patch('requests.request') as request:
+        request.return_value = MagicMock(
+            status_code=200, headers={},
+            json=MagicMock(return_value={'key': 'value'}))
+
+        assert lavaclient._get('path') == {'key': 'value'}
+        assert lavaclient._get('path') == {'key': 'value'}
+        assert clock.now == 1001.0
+
+        request.return_value = MagicMock(
+            status_code=429, headers={},
+            raise_for_status=MagicMock(side_effect=http_error(429)))
+        pytest.raises(error.RequestError, lavaclient._get, 'path')
+        assert lavaclient._rate_limiter.bucket(
+            'GET', 'path', lavaclient.endpoint).rate == 0.5
+
+
+def test_shared_rate_limiter(lavaclient, clock):
+    limiter = RateLimiter(rate=1)
+    lavaclient._rate_limiter = limiter
+    with patch.object(Lava, '_authenticate'):
+        other = Lava('username', api_key='api_key', region='ORD',
+                     endpoint='https://ord.example.com/v2/tenant',
+                     rate_limiter=limiter)
+
+    with patch('requests.request') as request:
+        request.return_value = MagicMock(
+            status_code=429, headers={'Retry-After': '30'},
+            raise_for_status=MagicMock(side_effect=http_error(429)))
+        pytest.raises(error.RequestError, lavaclient._get, 'clusters')
+
+        # Throttling one endpoint does not delay the other
+        request.return_value = MagicMock(
+            status_code=200, headers={},
+            json=MagicMock(return_value={}))
+        assert other._get('clusters') == {}
+        assert clock.now == 1000.0
+
+    assert limiter.bucket('GET', 'clusters', lavaclient.endpoint).rate == 0.5
+    assert limiter.bucket('GET', 'clusters', other.endpoint).rate == 1
@@ -1,5 +1,7 @@
+import json
 import pytest
 from datetime import datetime
+from mock import patch
 
 from lavaclient.api import response
 
@@ -48,3 +50,36 @@ def test_flavors(flavor):
     assert isinstance(flavor.links, list)
     assert len(flavor.links) == 1
     assert isinstance(flavor.links[0], response.Link)
+
+
+def test_interned_fields(cluster_response, node):
+    # Decode twice so that each object starts with separate string objects
+    first = response.Cluster(json.loads(json.dumps(cluster_response)))
+    second = response.Cluster(json.loads(json.dumps(cluster_response)))
+    assert first.status == second.status == 'ACTIVE'
+    assert first.status is second.status
+    assert first.stack_id is second.stack_id
+    assert first.links[0].rel is second.links[0].rel
+
+    node1 = response.Node(json.loads(json.dumps(node)))
+    node2 = response.Node(json.loads(json.dumps(node)))
+    assert node1.flavor_id is node2.flavor_id
+    assert node1.components == node2.components
+    assert node1.components[0]['name'] is node2.components[0]['name']
+
+    # Values unique to a host are not kept forever
+    uri = node1.components[0]['uri']
+    assert uri == 'http://host'
+    assert uri not in response._INTERNED
+
+
+def test_repr(cluster_response):
+    cluster = response.Cluster(cluster_response)
+    expected = repr(cluster)
+    assert expected.startswith("Cluster(id='cluster_id', "
+                               "name='cluster_name', stack_id")
+
+    # Property names are only collected once per class
+    with patch('lavaclient.api.response._repr_keys') as repr_keys:
+        assert repr(cluster) == expected
+        assert repr_keys.call_count == 0
@@ -0,0 +1,89 @@
+import pytest
+import requests
+from mock import patch, MagicMock
+
+from lavaclient import error, util
+from lavaclient.retries import RetryPolicy, RetryBudget, retry_after
+
+
+def http_error(status, headers=None):
+    return requests.exceptions.HTTPError(
+        response=MagicMock(status_code=status, headers=headers or {}))
+
+
+def test_backoff_delay():
+    policy = RetryPolicy(delay=1, backoff=2, max_delay=5, jitter=False)
+    assert [policy.backoff_delay(n) for n in range(1, 6)] == [1, 2, 4, 5, 5]
+
+    policy = RetryPolicy(delay=1, backoff=2, max_delay=5)
+    assert all(0 <= policy.backoff_delay(4) <= 5 for _ in range(100))
+
+
+def test_retry_after():
+    assert retry_after(MagicMock(headers={'Retry-After': '3'})) == 3
+    assert retry_after(MagicMock(headers={})) is None
+    assert retry_after(MagicMock(headers={
+        'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0
+
+
+def test_next_delay():
+    policy = RetryPolicy(attempts=3, delay=1, jitter=False)
+
+    state = policy.begin('GET')
+    assert state.next_delay(http_error(503)) == 1
+    assert state.next_delay(requests.exceptions.ConnectionError()) == 2
+    assert state.next_delay(http_error(503)) is None
+
+    assert policy.begin('GET').next_delay(http_error(404)) is None
+    assert policy.begin('POST').next_delay(http_error(503)) is None
+    assert policy.begin('GET').next_delay(
+        http_error(429, {'Retry-After': '10'})) == 10
+
+    policy = RetryPolicy(delay=1, jitter=False, deadline=5)
+    assert policy.begin('GET').next_delay(
+        http_error(429, {'Retry-After': '10'})) is None
+
+
+def test_budget():
+    budget = RetryBudget(ratio=0.5, min_per_second=0, window=10)
+    policy = RetryPolicy(delay=0, budget=budget)
+
+    states = [policy.begin('GET') for _ in range(4)]
+    delays = [state.next_delay(http_error(503)) for state in states]
+    assert delays == [0, 0, None, None]
+
+    with pytest.raises(error.InvalidError):
+        RetryBudget(window=0)
+
+
+def test_retry_decorator():
+    func = MagicMock(side_effect=[ValueError, ValueError, 'result'])
+    with patch('time.sleep') as sleep:
+        assert util.retry(attempts=3, delay=1, backoff=3)(func)() == 'result'
+
+    assert [call[0][0] for call in sleep.call_args_list] == [1, 3]
+
+    func = MagicMock(side_effect=KeyError)
+    pytest.raises(KeyError, util.retry(exceptions=[ValueError])(func))
+    assert func.call_count == 1
+
+
+def test_client_retries(lavaclient):
+    lavaclient._retry_policy = RetryPolicy(attempts=3, delay=0.01)
+
+    error_response = MagicMock(raise_for_status=MagicMock(
+        side_effect=http_error(503)))
+    with patch('requests.request') as request:
+        request.side_effect = [
+            requests.exceptions.ConnectionError(),
+            error_response,
+            MagicMock(json=MagicMock(return_value={'key': 'value'})),
+        ]
+        assert lavaclient._get('path') == {'key': 'value'}
+        assert request.call_count == 3
+
+    # Non-idempotent requests are not retried
+    with patch('requests.request') as request:
+        request.return_value = error_response
+        pytest.raises(error.RequestError, lavaclient._post, 'path')
+        assert request.call_count == 1
@@ -0,0 +1,263 @@
+import pytest
+import requests
+import sqlite3
+import time
+from mock import patch, MagicMock
+
+from lavaclient.api import response
+from lavaclient.client import Lava
+from lavaclient.store import Store
+from lavaclient.util import is_stale
+from lavaclient import error
+
+
+@pytest.fixture
+def store():
+    return Store(':memory:', max_age=60)
+
+
+def test_save_load(store, clusters_response, cluster_response, nodes_response,
+                   flavors_response):
+    assert store.load('clusters') is None
+
+    assert store.save('clusters', clusters_response)
+    assert store.save('/clusters/cluster_id', cluster_response)
+    assert store.save('clusters/cluster_id/nodes', nodes_response)
+    assert store.save('flavors', flavors_response)
+    assert not store.save('limits', {'limits': {}})
+
+    assert store.load('clusters') == clusters_response
+    assert store.load('clusters/cluster_id') == cluster_response
+    assert store.load('clusters/cluster_id/nodes') == nodes_response
+    assert store.load('/flavors') == flavors_response
+    assert store.load('clusters/other') is None
+
+    # Removing a cluster from the list removes its details and nodes
+    assert store.save('clusters', {'clusters': []})
+    assert store.load('clusters') == {'clusters': []}
+    assert store.load('clusters/cluster_id') is None
+    assert store.nodes(cluster_id='cluster_id') == []
+
+
+def test_freshness(store, clusters_response):
+    store.save('clusters', clusters_response)
+    assert store.is_fresh('clusters')
+
+    store.invalidate('clusters/cluster_id')
+    assert not store.is_fresh('clusters')
+    assert store.load('clusters') is None
+    assert store.load('clusters', fresh=False) == clusters_response
+
+    store.save('clusters', clusters_response)
+    with patch('time.time', return_value=time.time() + 120):
+        assert not store.is_fresh('clusters')
+
+
+def test_queries(store, cluster, cluster_response, nodes_response,
+                 stacks_response):
+    store.save('clusters', {'clusters': [
+        cluster, dict(cluster, id='other', status='ERROR')]})
+    store.save('clusters/cluster_id', cluster_response)
+    store.save('clusters/cluster_id/nodes', nodes_response)
+    store.save('stacks', stacks_response)
+
+    assert [item.id for item in store.clusters(status='ACTIVE')] == [
+        'cluster_id']
+    assert isinstance(store.cluster('cluster_id'), response.ClusterDetail)
+    assert store.cluster('other') is None
+    assert [group.id for group in store.node_groups('cluster_id')] == ['id']
+
+    nodes = store.nodes(cluster_id='cluster_id', status='ACTIVE')
+    assert len(nodes) == len(nodes_response['nodes'])
+    assert all(isinstance(node, response.Node) for node in nodes)
+    assert store.execute('SELECT public_ip FROM nodes') == [('1.2.3.4',)]
+
+    assert [stack.id for stack in store.stacks()] == ['stack_id']
+    pytest.raises(error.InvalidError, store.clusters, data='x')
+
+
+def test_client_uses_store(lavaclient, store, clusters_response):
+    lavaclient._store = store
+
+    with patch('requests.request') as request:
+        request.return_value = MagicMock(
+            json=MagicMock(return_value=clusters_response))
+
+        assert len(lavaclient.clusters.list()) == 1
+        assert len(lavaclient.clusters.list()) == 1
+        assert request.call_count == 1
+
+        # Mutations invalidate the stored collection
+        lavaclient.clusters.delete('cluster_id')
+        assert len(lavaclient.clusters.list()) == 1
+        assert request.call_count == 3
+
+
+def test_list_after_detail(store, cluster, cluster_response):
+    building = dict(cluster, status='BUILDING')
+    store.save('clusters', {'clusters': [building]})
+    store.save('clusters/cluster_id', {
+        'cluster': dict(cluster_response['cluster'], status='BUILDING')})
+
+    # A list with a new status replaces the older detail
+    store.save('clusters', {'clusters': [cluster]})
+    assert [item.status for item in store.clusters(status='ACTIVE')] == [
+        'ACTIVE']
+    assert store.load('clusters/cluster_id') is None
+
+    # A detail with a new status is kept until the list disagrees with it
+    store.save('clusters/cluster_id', cluster_response)
+    store.save('clusters', {'clusters': [cluster]})
+    assert store.cluster('cluster_id').node_groups
+    store.save('clusters', {'clusters': [building]})
+    assert [item.status for item in store.clusters()] == ['BUILDING']
+
+
+def test_endpoints(store, clusters_response, cluster_response, cluster):
+    dfw = 'https://dfw.example.com/v2/tenant'
+    ord_ = 'https://ord.example.com/v2/tenant'
+    store.save('clusters', clusters_response, endpoint=dfw)
+    store.save('clusters/cluster_id', cluster_response, endpoint=dfw)
+    store.save('clusters', {'clusters': [dict(cluster, id='other')]},
+               endpoint=ord_)
+
+    assert store.load('clusters', endpoint=dfw) == clusters_response
+    assert [item['id'] for item in store.load(
+        'clusters', endpoint=ord_)['clusters']] == ['other']
+    assert store.load('clusters/cluster_id', endpoint=ord_) is None
+    assert store.load('clusters') is None
+
+    # Listing one endpoint's clusters does not remove the other's
+    assert store.cluster('cluster_id', endpoint=dfw).id == 'cluster_id'
+    assert [item.id for item in store.clusters()] == ['cluster_id', 'other']
+    assert [item.id for item in store.clusters(endpoint=ord_)] == ['other']
+
+    store.invalidate('clusters', endpoint=ord_)
+    assert store.is_fresh('clusters', endpoint=dfw)
+    assert not store.is_fresh('clusters', endpoint=ord_)
+
+
+def test_client_endpoints(lavaclient, store, clusters_response, cluster):
+    with patch.object(Lava, '_authenticate'):
+        other = Lava('username', api_key='api_key', region='ORD',
+                     endpoint='https://ord.example.com/v2/tenant',
+                     store=store)
+    lavaclient._store = store
+    responses = {
+        lavaclient.endpoint: clusters_response,
+        other.endpoint: {'clusters': [dict(cluster, id='other')]},
+    }
+
+    with patch('requests.request') as request:
+        request.side_effect = lambda method, url, **kwargs: MagicMock(
+            json=MagicMock(return_value=responses[url.rsplit('/', 1)[0]]))
+
+        for _ in range(2):
+            assert [item.id for item in lavaclient.clusters.list()] == [
+                'cluster_id']
+            assert [item.id for item in other.clusters.list()] == ['other']
+
+        assert request.call_count == 2
+
+
+def test_refresh(store, clusters_response, cluster_response, nodes_response,
+                 stacks_response, flavors_response, scripts_response):
+    responses = {
+        'stacks': stacks_response,
+        'flavors': flavors_response,
+        'scripts': scripts_response,
+        'clusters': clusters_response,
+        'clusters/cluster_id': cluster_response,
+        'clusters/cluster_id/nodes': nodes_response,
+    }
+    client = MagicMock(endpoint='https://dfw.example.com/v2/tenant')
+    client._request.side_effect = lambda method, path, **kwargs: (
+        responses[path])
+
+    store.refresh(client, wait=False).result(timeout=5)
+
+    assert client._request.call_count == len(responses)
+    for path, data in responses.items():
+        assert store.load(path, endpoint=client.endpoint) == data
+        assert store.load(path) is None
+
+
+def test_stale_while_revalidate(lavaclient, store, clusters_response,
+                                cluster):
+    lavaclient._store = store
+    lavaclient._stale_while_revalidate = True
+    store.save('clusters', clusters_response, endpoint=lavaclient.endpoint)
+
+    updated = {'clusters': [dict(cluster, name='renamed')]}
+    with patch('requests.request') as request:
+        request.return_value = MagicMock(
+            json=MagicMock(return_value=updated))
+
+        # Fresh data is not marked stale
+        clusters = lavaclient.clusters.list()
+        assert not is_stale(clusters)
+
+        with patch('time.time', return_value=time.time() + 120):
+            clusters = lavaclient.clusters.list()
+            lavaclient.wait_for_revalidation(timeout=5)
+
+        assert is_stale(clusters) and is_stale(clusters[0])
+        assert clusters[0].name == 'cluster_name'
+        assert 'clusters' in lavaclient.served_stale
+        assert request.call_count == 1
+
+        assert store.load('clusters', endpoint=lavaclient.endpoint) == updated
+        assert lavaclient.clusters.list()[0].name == 'renamed'
+
+
+def test_stale_while_revalidate_error(lavaclient, store, clusters_response):
+    lavaclient._store = store
+    lavaclient._stale_while_revalidate = True
+    store.save('clusters', clusters_response, endpoint=lavaclient.endpoint)
+
+    locked = sqlite3.OperationalError('database is locked')
+    with patch('requests.request') as request:
+        request.return_value = MagicMock(
+            json=MagicMock(return_value=clusters_response))
+
+        with patch('time.time', return_value=time.time() + 120):
+            with patch.object(store, 'save', side_effect=locked):
+                clusters = lavaclient.clusters.list()
+                assert lavaclient.wait_for_revalidation(timeout=5) == \
+                    ['clusters']
+
+        assert is_stale(clusters)
+        assert 'clusters' in lavaclient.served_stale
+        assert lavaclient.wait_for_revalidation(timeout=5) == []
+
+
+def test_stale_on_error(lavaclient, store, cluster_response):
+    lavaclient._store = store
+    store.save('clusters/cluster_id', cluster_response,
+               endpoint=lavaclient.endpoint)
+    store.invalidate('clusters/cluster_id', endpoint=lavaclient.endpoint)
+
+    with patch('requests.request') as request:
+        request.side_effect = requests.exceptions.ConnectionError
+        cluster = lavaclient.clusters.get('cluster_id')
+        assert is_stale(cluster)
+        assert cluster.id == 'cluster_id'
+
+        pytest.raises(error.RequestError, lavaclient.clusters.get, 'other')
+
+
+def test_schema_version(tmpdir, clusters_response):
+    path = str(tmpdir.join('lava.db'))
+    conn = sqlite3.connect(path)
+    conn.executescript('CREATE TABLE fetched (path TEXT PRIMARY KEY, '
+                       'fetched_at REAL NOT NULL);'
+                       "INSERT INTO fetched VALUES ('clusters', 1);")
+    conn.close()
+
+    # Stores in an older format are emptied
+    store = Store(path)
+    assert store.fetched_at('clusters') is None
+    assert store.save('clusters', clusters_response)
+    store.close()
+
+    assert Store(path).load('clusters') == clusters_response
@@ -0,0 +1,81 @@
+import json
+import pytest
+from mock import patch, MagicMock
+
+from lavaclient import error, tracing
+from lavaclient.concurrency import background
+
+
+def test_span_nesting():
+    tracer = tracing.Tracer()
+
+    with tracer.span('outer') as outer:
+        with tracing.span('inner', tracing.HTTP, key='value'):
+            pass
+
+    with pytest.raises(ValueError):
+        with tracer.span('failed'):
+            raise ValueError('oops')
+
+    with tracing.span('untraced') as span:
+        span.set('key', 'value')
+
+    spans = dict((span.name, span) for span in tracer.spans)
+    assert sorted(spans) == ['failed', 'inner', 'outer']
+    assert spans['inner'].parent_id == outer.span_id
+    assert spans['inner'].attributes == {'key': 'value'}
+    assert spans['outer'].parent_id is None
+    assert spans['failed'].error == 'ValueError: oops'
+
+
+def test_propagate():
+    tracer = tracing.Tracer()
+
+    def work():
+        with tracing.span('work'):
+            pass
+
+    with tracer.span('outer') as outer:
+        background(work).result(5)
+
+    work = next(span for span in tracer.spans if span.name == 'work')
+    assert work.parent_id == outer.span_id
+
+
+def test_resource_spans(lavaclient, cluster_response, tmpdir):
+    lavaclient.tracer = tracer = tracing.Tracer()
+
+    with patch('requests.request') as request:
+        request.return_value = MagicMock(
+            status_code=200, json=MagicMock(return_value=cluster_response))
+        lavaclient.clusters.get('cluster_id')
+
+    get, http, parse = sorted(tracer.spans, key=lambda span: span.start)
+    assert get.name == 'clusters.get'
+    assert http.name == 'GET /clusters/{id}'
+    assert http.parent_id == get.span_id
+    assert http.attributes['status_code'] == 200
+    assert parse.name == 'parse ClusterResponse'
+    assert parse.parent_id == get.span_id
+
+    headers = request.call_args[1]['headers']
+    assert (http.attributes['client_request_id'] ==
+            headers['Client-Request-ID'])
+
+    chrome = tmpdir.join('chrome.json')
+    tracer.export(str(chrome))
+    events = json.loads(chrome.read())['traceEvents']
+    assert [event['name'] for event in events] == [get.name, http.name,
+                                                   parse.name]
+    assert events[1]['args']['parent_id'] == get.span_id
+
+    otlp = tmpdir.join('otlp.json')
+    tracer.export(str(otlp), fmt='otlp')
+    (resource_spans,) = json.loads(otlp.read())['resourceSpans']
+    spans = resource_spans['scopeSpans'][0]['spans']
+    assert set(span['traceId'] for span in spans) == set([tracer.trace_id])
+    assert [span.get('parentSpanId') for span in spans] == [
+        get.span_id, get.span_id, None]
+
+    with pytest.raises(error.InvalidError):
+        tracer.export(str(otlp), fmt='xml')
@@ -1,9 +1,11 @@
+import json
 import pytest
 import six
 from mock import patch
 from figgis import Config, Field, ListField
 
 from lavaclient import util
+from lavaclient.api.clusters import BatchResult
 
 
 def test_b64encode():
@@ -153,3 +155,174 @@ def test_inject_client():
     assert all(item.foo._client is client for item in conf.two)
     assert all(all(subitem._client is client for subitem in item.bar)
                for item in conf.two)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 1024])
+def test_iter_json_list(chunk_size):
+    document = json.dumps({
+        'links': [{'rel': 'self', 'href': 'href'}],
+        'items': [{'id': 1, 'name': u'\u00e9'}, 12345, 'two', None],
+        'count': 4,
+    }).encode('utf-8')
+    chunks = [document[i:i + chunk_size]
+              for i in range(0, len(document), chunk_size)]
+
+    assert list(util.iter_json_list(chunks, 'items')) == [
+        {'id': 1, 'name': u'\u00e9'}, 12345, 'two', None]
+
+
+def test_iter_json_list_empty():
+    assert list(util.iter_json_list([six.b('{"items": [ ]}')], 'items')) == []
+
+    with pytest.raises(ValueError):
+        list(util.iter_json_list([six.b('{}')], 'items'))
+
+    with pytest.raises(ValueError):
+        list(util.iter_json_list([six.b('{"items": [{"id": 1}')], 'items'))
+
+
+def test_memoized_metadata():
+    class Response(Config):
+        name = Field(six.text_type)
+        id = Field(six.text_type)
+        node_count = Field(int)
+
+    class Resource(object):
+        def method(self, required, optional=None):
+            pass
+
+    resource = Resource()
+    with patch('lavaclient.util._function_arguments',
+               wraps=util._function_arguments) as compute:
+        for _ in range(3):
+            assert util.get_function_arguments(resource.method) == (
+                ['required'], ['optional'])
+        assert util.get_function_arguments(Resource.method) == (
+            ['required'], ['optional'])
+        assert compute.call_count == 1
+
+    with patch('lavaclient.util._table_attributes',
+               wraps=util._table_attributes) as compute:
+        for _ in range(3):
+            data, header = util.table_data(
+                [Response(id='1', name='a', node_count=2)], Response)
+            assert list(data) == [['1', 'a', 2]]
+            assert header == ['ID', 'Name', 'Node count']
+        assert compute.call_count == 1
+
+
+def test_print_table_wide():
+    strio = six.StringIO()
+    with patch('sys.stdout', strio):
+        util.print_table([[u'\u65e5\u672c', 'a\tb'], ['abc', 'x']],
+                         ['foo', 'bar'])
+
+    assert strio.getvalue() == u"""\
++------+-----------+
+| foo  |    bar    |
++------+-----------+
+| \u65e5\u672c | a       b |
+| abc  |     x     |
++------+-----------+
+"""
+
+
+@pytest.mark.parametrize('fmt,result,output', [
+    ('jsonl', [{'id': '1'}, {'id': '2'}], '{"id": "1"}\n{"id": "2"}\n'),
+    ('json', [{'id': '1'}, {'id': '2'}], '[\n{"id": "1"},\n{"id": "2"}\n]\n'),
+    ('json', [], '[]\n'),
+    ('json', {'id': '1'}, '{"id": "1"}\n'),
+    ('csv', [{'id': '1', 'name': 'a,b'}], 'id,name\n1,"a,b"\n'),
+    ('tsv', [{'id': '1', 'name': None}], 'id\tname\n1\t\n'),
+    ('csv', None, ''),
+])
+def test_write_records(fmt, result, output):
+    strio = six.StringIO()
+    with patch('sys.stdout', strio):
+        util.write_records(result, fmt)
+
+    assert strio.getvalue() == output
+
+
+def test_write_records_columns():
+    class Response(Config):
+        table_columns = ('id', 'name')
+        table_header = ('ID', 'Name')
+
+        id = Field(six.text_type)
+        name = Field(six.text_type)
+        node_count = Field(int)
+
+    items = [Response(id='1', name='a', node_count=2)]
+
+    strio = six.StringIO()
+    with patch('sys.stdout', strio):
+        util.write_records(items, 'csv', Response)
+        util.write_records(items, 'jsonl')
+
+    lines = strio.getvalue().splitlines()
+    assert lines[:2] == ['id,name', '1,a']
+    assert json.loads(lines[2]) == {'id': '1', 'name': 'a', 'node_count': 2}
+
+    with pytest.raises(util.error.InvalidError):
+        util.write_records(items, 'xml')
+
+
+def test_write_records_batch():
+    result = BatchResult(
+        succeeded=[({'name': 'one'}, {'id': '1', 'status': 'ACTIVE'})],
+        failed=[({'name': 'two'}, util.error.RequestError('Quota exceeded'))])
+
+    strio = six.StringIO()
+    with patch('sys.stdout', strio):
+        util.write_records(result, 'jsonl')
+        util.write_records(result, 'csv')
+
+    lines = strio.getvalue().splitlines()
+    assert [json.loads(line) for line in lines[:2]] == [
+        {'item': {'name': 'one'}, 'outcome': 'succeeded',
+         'result': {'id': '1', 'status': 'ACTIVE'}, 'error': None},
+        {'item': {'name': 'two'}, 'outcome': 'failed', 'result': None,
+         'error': 'Quota exceeded'}]
+    assert lines[2:] == [
+        'error,item,outcome,result',
+        ',"{""name"": ""one""}",succeeded,'
+        '"{""id"": ""1"", ""status"": ""ACTIVE""}"',
+        'Quota exceeded,"{""name"": ""two""}",failed,']
+
+
+def test_project():
+    class Child(Config):
+        value = Field(int, required=True)
+        other = Field(int, required=True)
+
+    class Parent(Config):
+        field_dependencies = {'total': ('child.value', 'count')}
+
+        id = Field(six.text_type, required=True)
+        count = Field(int, required=True)
+        child = Field(Child, required=True)
+        children = ListField(Child)
+
+        @property
+        def total(self):
+            return self.child.value + self.count
+
+    projected = util.project(Parent, ['id', 'children.value'])
+    assert projected is util.project(Parent, ['id', 'children.value'])
+    assert issubclass(projected, Parent)
+    assert projected.table_columns == ('id', 'children.value')
+
+    item = projected({'id': 'a', 'children': [{'value': 1}]})
+    assert item.id == 'a'
+    assert item.children[0].value == 1
+    assert isinstance(item.children[0], Child)
+    with pytest.raises(AttributeError):
+        item.count
+
+    item = util.project(Parent, ['total'])({'count': 2, 'child': {'value': 3}})
+    assert item.total == 5
+    assert item.to_dict() == {'count': 2, 'child': {'value': 3}}
+
+    with pytest.raises(util.error.InvalidError):
+        util.project(Parent, ['missing'])